@@ -0,0 +1,152 @@
+import logging
+
+import numpy as np
+from pmdarima import auto_arima
+from statsmodels.stats.diagnostic import acorr_ljungbox
+
+
+def fit_auto_arima(history):
+    """
+    Run the stepwise ARIMA order search used for live predictions.
+
+    Args:
+        history (array-like): The closing prices to fit on.
+
+    Returns:
+        pmdarima.arima.ARIMA: The fitted model.
+    """
+    return auto_arima(history, start_p=1, start_q=1, max_p=3, max_q=3, d=1,
+                      trace=False, error_action='ignore', suppress_warnings=True)
+
+
+def forecast_full(history):
+    """
+    Forecast the next value with a fresh order search (the "full" ARIMA mode).
+
+    Args:
+        history (array-like): The closing prices to fit on.
+
+    Returns:
+        float: The one-step-ahead forecast.
+    """
+    return float(fit_auto_arima(history).predict(n_periods=1)[0])
+
+
+class IncrementalArima:
+    """
+    ARIMA forecaster that keeps its fitted model between candles.
+
+    The order search runs once; afterwards every new closing price is fed to the
+    fitted ``pmdarima.arima.ARIMA`` with ``update``. The order search is repeated
+    every ``research_every`` candles, or earlier when the Ljung-Box test shows
+    autocorrelation left in the recent residuals.
+    """
+
+    def __init__(self, update_every=1, research_every=288, ljung_box_pvalue=0.01,
+                 ljung_box_lags=5, diagnostic_window=50):
+        """
+        Initialize the forecaster.
+
+        Args:
+            update_every (int): Feed observations to the model in groups of this many candles.
+            research_every (int): Re-run the order search after this many candles.
+            ljung_box_pvalue (float): Re-run the order search when the Ljung-Box p-value drops below this.
+            ljung_box_lags (int): The number of lags tested by the Ljung-Box test.
+            diagnostic_window (int): The number of most recent residuals used for the test.
+        """
+        self.update_every = max(1, update_every)
+        self.research_every = research_every
+        self.ljung_box_pvalue = ljung_box_pvalue
+        self.ljung_box_lags = ljung_box_lags
+        self.diagnostic_window = diagnostic_window
+
+        self.model = None
+        self.searches = 0
+        self._pending = []
+        self._candles_since_search = 0
+
+    def predict(self, history, new_observations=1):
+        """
+        Incorporate the newest closing prices and forecast the next one.
+
+        Args:
+            history (array-like): The closing-price window ending with the newest close.
+            new_observations (int): How many closes at the end of ``history`` the model has
+                not seen yet (more than one when earlier windows were dropped).
+
+        Returns:
+            float: The one-step-ahead forecast.
+        """
+        if self.model is None or new_observations > len(history) or self._needs_search():
+            self._search(history)
+        elif new_observations > 0:
+            self._pending.extend(float(price) for price in history[-new_observations:])
+            self._candles_since_search += new_observations
+            if len(self._pending) >= self.update_every:
+                self.model.update(self._pending)
+                self._pending = []
+
+        # Pending observations are not in the model yet, so forecast past them
+        forecast = self.model.predict(n_periods=len(self._pending) + 1)
+        return float(np.asarray(forecast)[-1])
+
+    def _search(self, history):
+        self.model = fit_auto_arima(history)
+        self.searches += 1
+        self._pending = []
+        self._candles_since_search = 0
+        logging.info(f"ARIMA order search #{self.searches}: order={self.model.order}")
+
+    def _needs_search(self):
+        if self.research_every and self._candles_since_search >= self.research_every:
+            return True
+        # Only run diagnostics right after an update, when the residuals are current
+        if self._pending or self._candles_since_search < self.diagnostic_window // 2:
+            return False
+        return self._residuals_degraded()
+
+    def _residuals_degraded(self):
+        residuals = np.asarray(self.model.resid())[-self.diagnostic_window:]
+        lags = min(self.ljung_box_lags, len(residuals) - 1)
+        if lags < 1:
+            return False
+        try:
+            pvalue = float(acorr_ljungbox(residuals, lags=[lags])["lb_pvalue"].iloc[0])
+        except Exception as e:
+            logging.warning(f"Ljung-Box test failed: {e}")
+            return False
+        if pvalue < self.ljung_box_pvalue:
+            logging.info(f"ARIMA residuals degraded (Ljung-Box p={pvalue:.4f}), re-running order search")
+            return True
+        return False
+
+
+# ARIMA state of the streams pinned to this worker process
+_worker_models = {}
+_worker_sequences = {}
+
+
+def predict_in_worker(key, history, sequence, mode="incremental", options=None):
+    """
+    Forecast the next close of a stream inside an ARIMA worker process.
+
+    Args:
+        key (str): The stream key.
+        history (np.ndarray): The closing-price window ending with the newest close.
+        sequence (int): The number of candles the stream has closed so far; the gap to
+            the previous call tells how many closes are new to the model.
+        mode (str): "incremental" or "full".
+        options (dict): Keyword arguments for ``IncrementalArima``.
+
+    Returns:
+        float: The one-step-ahead forecast.
+    """
+    if mode == "full":
+        return forecast_full(history)
+
+    model = _worker_models.get(key)
+    if model is None:
+        model = _worker_models[key] = IncrementalArima(**(options or {}))
+    new_observations = sequence - _worker_sequences.get(key, sequence - 1)
+    _worker_sequences[key] = sequence
+    return model.predict(history, new_observations)
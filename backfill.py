@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+# Milliseconds per Bybit kline interval ("M" has no fixed length and is not supported)
+INTERVAL_MS = {
+    **{str(minutes): minutes * 60_000 for minutes in (1, 3, 5, 15, 30, 60, 120, 240, 360, 720)},
+    "D": 86_400_000,
+    "W": 7 * 86_400_000,
+}
+
+
+def interval_ms(interval):
+    """
+    Return the length of a kline interval in milliseconds.
+
+    Args:
+        interval (str): The Bybit kline interval.
+
+    Returns:
+        int: The interval length.
+
+    Raises:
+        ValueError: If the interval has no fixed length.
+    """
+    try:
+        return INTERVAL_MS[str(interval)]
+    except KeyError:
+        raise ValueError(f"Unsupported interval for backfill: {interval}")
+
+
+def find_gap(last_start, new_start, interval):
+    """
+    Find the candles missing between two consecutive kline start timestamps.
+
+    Args:
+        last_start (int): The start of the last candle received (ms).
+        new_start (int): The start of the candle just received (ms).
+        interval (str): The kline interval.
+
+    Returns:
+        tuple: (first missing start, last missing start), or None if there is no gap
+            or the interval has no fixed length.
+    """
+    step = INTERVAL_MS.get(str(interval))
+    if last_start is None or step is None:
+        return None
+    if new_start - last_start <= step:
+        return None
+    return last_start + step, new_start - step
+
+
+def find_holes(starts, first, last, interval):
+    """
+    Find the ranges of candles missing from a set of stored start timestamps.
+
+    Args:
+        starts (array-like): The stored candle starts (ms), in any order, duplicates allowed.
+        first (int): The first candle start that should be present (ms).
+        last (int): The last candle start that should be present (ms).
+        interval (str): The kline interval.
+
+    Returns:
+        list: (first missing start, last missing start) tuples, oldest first.
+    """
+    step = interval_ms(interval)
+    starts = np.unique(np.asarray(starts, dtype=np.int64))
+    starts = starts[(starts >= first) & (starts <= last)]
+    # Sentinels just outside the range turn a missing head and tail into holes too
+    bounds = np.concatenate(([first - step], starts, [last + step]))
+    return [(int(bounds[i]) + step, int(bounds[i + 1]) - step) for i in np.flatnonzero(np.diff(bounds) > step)]
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting requests per second.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float): The sustained number of requests per second.
+            burst (int): The bucket size (defaults to one second worth of requests).
+        """
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RequestsHttpClient:
+    """
+    Default HTTP client for the Bybit REST API.
+
+    Any object with a compatible ``get_json`` method can be passed to
+    ``KlineBackfiller`` instead, e.g. one talking to a local stand-in server.
+    """
+
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def get_json(self, url, params):
+        """
+        Send a GET request and decode the JSON response.
+
+        Args:
+            url (str): The request URL.
+            params (dict): The query parameters.
+
+        Returns:
+            dict: The decoded response body.
+        """
+        response = self._session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class KlineBackfiller:
+    """
+    Fetches historical klines from the Bybit REST API in concurrent pages.
+
+    A range is split into pages of ``page_limit`` candles that are requested in
+    parallel, with the overall request rate bounded by a shared ``RateLimiter``.
+    """
+
+    def __init__(self, http_client=None, base_url="https://api.bybit.com", category="linear",
+                 rate_limit=10.0, max_workers=4, page_limit=1000):
+        """
+        Initialize the backfiller.
+
+        Args:
+            http_client: An object with ``get_json(url, params)`` (defaults to ``RequestsHttpClient``).
+            base_url (str): The REST API base URL.
+            category (str): The Bybit product category.
+            rate_limit (float): The maximum number of requests per second.
+            max_workers (int): The maximum number of concurrent requests.
+            page_limit (int): Candles per request (Bybit allows up to 1000).
+        """
+        self.http_client = http_client or RequestsHttpClient()
+        self.base_url = base_url.rstrip("/")
+        self.category = category
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.max_workers = max_workers
+        self.page_limit = page_limit
+
+    def fetch_range(self, symbol, interval, start, end):
+        """
+        Fetch all closed candles whose start lies in [start, end].
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+            start (int): The first candle start to fetch (ms).
+            end (int): The last candle start to fetch (ms).
+
+        Returns:
+            tuple: (start timestamps as int64 array, OHLCV rows as float64 array of shape (n, 6)),
+                sorted by start time without duplicates.
+        """
+        step = interval_ms(interval)
+        page_span = step * self.page_limit
+        pages = [(page_start, min(end, page_start + page_span - step))
+                 for page_start in range(start, end + 1, page_span)]
+        if not pages:
+            return np.empty(0, dtype=np.int64), np.empty((0, 6))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages))) as executor:
+            results = list(executor.map(lambda page: self._fetch_page(symbol, interval, *page), pages))
+
+        entries = [entry for page in results for entry in page]
+        if not entries:
+            return np.empty(0, dtype=np.int64), np.empty((0, 6))
+        data = np.array(entries, dtype=np.float64)
+        starts = data[:, 0].astype(np.int64)
+        # Pages may repeat a boundary candle; one outside the range would be appended twice by a gap repair
+        starts, unique = np.unique(starts, return_index=True)
+        inside = (starts >= start) & (starts <= end)
+        return starts[inside], data[unique[inside], 1:7]
+
+    def _fetch_page(self, symbol, interval, start, end):
+        self.rate_limiter.acquire()
+        body = self.http_client.get_json(
+            f"{self.base_url}/v5/market/kline",
+            {
+                "category": self.category,
+                "symbol": symbol,
+                "interval": interval,
+                "start": start,
+                "end": end,
+                "limit": self.page_limit,
+            },
+        )
+        if body.get("retCode") != 0:
+            raise RuntimeError(f"Bybit kline request failed: {body.get('retMsg')}")
+        # Entries are [start, open, high, low, close, volume, turnover], newest first
+        entries = body["result"]["list"]
+        logging.debug(f"Fetched {len(entries)} {symbol} {interval} klines from {start} to {end}")
+        return entries
@@ -0,0 +1,171 @@
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from arima_model import forecast_full
+from candle_store import CandleStore
+from config import Config
+from inference import minmax_inverse, minmax_scale
+from ledger import directional_hit
+from logging_config import setup_logging
+from model_registry import load_model_file
+
+
+def build_windows(closes, window_size):
+    """
+    Build every sliding window of a closing-price series at once.
+
+    Args:
+        closes (np.ndarray): The closing prices, oldest first.
+        window_size (int): The number of candles per window.
+
+    Returns:
+        tuple: (windows view of shape (n, window_size), the close following each window).
+    """
+    windows = sliding_window_view(closes, window_size)[:-1]
+    return windows, closes[window_size:]
+
+
+def predict_gru(model, windows, batch_size=4096):
+    """
+    Run the GRU over all windows in large batches, scaled the same way as live predictions.
+
+    Args:
+        model: A model with a Keras-style ``predict`` method.
+        windows (np.ndarray): Array of shape (n, window_size).
+        batch_size (int): Windows per forward pass.
+
+    Returns:
+        np.ndarray: The predicted next closes, shape (n,).
+    """
+    scaled, mins, ranges = minmax_scale(np.asarray(windows, dtype=np.float64))
+    X = scaled.reshape(scaled.shape[0], scaled.shape[1], 1)
+    predicted = model.predict(X, batch_size=batch_size, verbose=0)
+    return minmax_inverse(np.asarray(predicted).reshape(-1, 1), mins, ranges)
+
+
+def predict_arima(windows, workers=None, chunksize=64):
+    """
+    Run the full ARIMA order search on every window across a process pool.
+
+    Args:
+        windows (np.ndarray): Array of shape (n, window_size).
+        workers (int): The number of worker processes (defaults to the CPU count).
+        chunksize (int): Windows handed to a worker at a time.
+
+    Returns:
+        np.ndarray: The predicted next closes, shape (n,).
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return np.fromiter(executor.map(forecast_full, np.asarray(windows), chunksize=chunksize),
+                           dtype=np.float64, count=len(windows))
+
+
+def score(predicted, windows, actual, tolerance=0.001):
+    """
+    Compute accuracy metrics of next-close predictions.
+
+    Args:
+        predicted (np.ndarray): Predicted next closes.
+        windows (np.ndarray): The input windows; their last close is the reference price.
+        actual (np.ndarray): The actual next closes.
+        tolerance (float): The largest relative error counted as accurate (0.001 = 0.1%).
+
+    Returns:
+        dict: within_tolerance (share of predictions within ``tolerance`` of the actual close),
+            mae and directional_accuracy (the share the ledger reports as its hit rate).
+    """
+    current = windows[:, -1]
+    error = np.abs(predicted - actual)
+    return {
+        "within_tolerance": float(np.mean(error <= tolerance * np.abs(actual))),
+        "mae": float(np.mean(error)),
+        "directional_accuracy": float(np.mean(directional_hit(predicted, current, actual))),
+    }
+
+
+def run_backtest(closes, window_size, model_paths=(), arima=True, arima_workers=None,
+                 tolerance=0.001, batch_size=4096):
+    """
+    Replay a closing-price series through the GRU models and ARIMA.
+
+    Args:
+        closes (np.ndarray): The closing prices, oldest first.
+        window_size (int): The number of candles per window.
+        model_paths (iterable): Keras model files or exported .npz weights to evaluate.
+        arima (bool): Whether to evaluate ARIMA too.
+        arima_workers (int): ARIMA worker processes.
+        tolerance (float): The largest relative error counted as accurate.
+        batch_size (int): GRU windows per forward pass.
+
+    Returns:
+        dict: Metrics and throughput per model name.
+    """
+    windows, actual = build_windows(np.asarray(closes, dtype=np.float64), window_size)
+    results = {"windows": len(windows)}
+    if len(windows) == 0:
+        return results
+
+    for path in model_paths:
+        model = load_model_file(path)
+        started = time.perf_counter()
+        predicted = predict_gru(model, windows, batch_size)
+        elapsed = time.perf_counter() - started
+        results[os.path.basename(path)] = {
+            **score(predicted, windows, actual, tolerance),
+            "windows_per_sec": len(windows) / elapsed,
+        }
+
+    if arima:
+        started = time.perf_counter()
+        predicted = predict_arima(windows, arima_workers)
+        elapsed = time.perf_counter() - started
+        results["arima"] = {
+            **score(predicted, windows, actual, tolerance),
+            "windows_per_sec": len(windows) / elapsed,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the GRU and ARIMA models on stored candles.")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--interval", default="5")
+    parser.add_argument("--start", type=int, help="First candle start timestamp (ms)")
+    parser.add_argument("--end", type=int, help="Last candle start timestamp (ms)")
+    parser.add_argument("--model", action="append", dest="models",
+                        help="Keras model file or exported .npz weights; repeat to compare models "
+                             "(defaults to the configured model)")
+    parser.add_argument("--no-arima", action="store_true", help="Skip the ARIMA backtest")
+    parser.add_argument("--arima-workers", type=int)
+    parser.add_argument("--tolerance", type=float, default=0.001,
+                        help="Largest relative error counted as within tolerance")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    config = Config()
+    setup_logging("backtest.log", config)
+    store = CandleStore(config.candle_store_path)
+    closes = store.read(args.symbol, args.interval, args.start, args.end)["close"]
+    logging.info(f"Backtesting {args.symbol} {args.interval} on {len(closes)} candles")
+
+    results = run_backtest(
+        closes,
+        config.get("window_size", 14),
+        model_paths=args.models or [config.model_path],
+        arima=not args.no_arima,
+        arima_workers=args.arima_workers,
+        tolerance=args.tolerance,
+        batch_size=args.batch_size,
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
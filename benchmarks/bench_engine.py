@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import (
+    histogram_delta, load_gru_model, process_usage, summarize, thread_cpu_seconds, write_results,
+)
+from feed import SYNTHETIC_START, interval_step
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Feed server did not start on port {port}")
+
+
+def prefill(stream, window_size, price=100.0):
+    """
+    Fill a stream's window with candles just before the feed's first one.
+
+    Lets predictions start on the first closed candle instead of after
+    ``window_size`` candles of warm-up.
+    """
+    step = interval_step(stream.topic)
+    for i in range(window_size, 0, -1):
+        start = SYNTHETIC_START - i * step
+        stream.append_candle({"start": start, "open": price, "high": price, "low": price,
+                              "close": price, "volume": 0.0, "turnover": 0.0})
+    stream.last_kline_start = SYNTHETIC_START - step
+
+
+async def run_engine(engine, conn, warmup, duration):
+    task = asyncio.create_task(conn.run())
+    await asyncio.sleep(warmup)
+
+    counters = (engine.tick_messages.value, engine.closed_messages.value)
+    snapshots = {name: histogram.snapshot() for name, histogram in engine_histograms(engine).items()}
+    cpu_before = process_usage()
+    started = time.perf_counter()
+
+    await asyncio.sleep(duration)
+
+    elapsed = time.perf_counter() - started
+    cpu_after = process_usage()
+    ticks = engine.tick_messages.value - counters[0]
+    closed = engine.closed_messages.value - counters[1]
+    await conn.stop()
+    await task
+    return {
+        "elapsed_s": elapsed,
+        "messages": ticks + closed,
+        "closed_candles": closed,
+        "messages_per_sec": (ticks + closed) / elapsed,
+        "engine_cpu_seconds": (cpu_after["cpu_seconds"] - cpu_before["cpu_seconds"]) if cpu_after else None,
+        "histograms": {name: histogram_delta(histogram, snapshots[name])
+                       for name, histogram in engine_histograms(engine).items()},
+    }
+
+
+def engine_histograms(engine):
+    from inference import gru_model_time, gru_queue_wait
+    from pipeline import arima_model_time, arima_queue_wait
+
+    return {
+        "exchange_lag": engine.exchange_lag,
+        "parse": engine.parse_time,
+        "prediction_gru": engine.prediction_time["GRU"],
+        "prediction_arima": engine.prediction_time["ARIMA"],
+        "queue_wait_gru": gru_queue_wait,
+        "queue_wait_arima": arima_queue_wait,
+        "model_gru": gru_model_time,
+        "model_arima": arima_model_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end engine benchmark against a local kline feed.")
+    parser.add_argument("--symbols", type=int, default=10, help="Number of synthetic symbols")
+    parser.add_argument("--intervals", default="1,5", help="Comma-separated interval mix")
+    parser.add_argument("--rate", type=float, default=5.0, help="Frames per second per stream")
+    parser.add_argument("--ticks-per-candle", type=int, default=10)
+    parser.add_argument("--recording", help="Replay frames recorded with feed.py record")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--window-size", type=int, default=14)
+    parser.add_argument("--gru-model", default=None,
+                        help="Keras model file, .npz weights or 'persistence' (defaults to the configured model)")
+    parser.add_argument("--arima-workers", type=int, default=2)
+    parser.add_argument("--arima-mode", default="incremental", choices=("incremental", "full"))
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/)")
+    args = parser.parse_args()
+
+    # Imported here so that spawned ARIMA workers do not import the engine
+    import websocketBybit as engine
+    from candle_store import CandleStore
+    from inference import InferenceScheduler
+    from ledger import PredictionLedger
+    from model_registry import ModelRegistry, model_name
+    from pipeline import ArimaPool
+
+    logging.getLogger().setLevel(logging.WARNING)
+    args.gru_model = args.gru_model or engine.config.model_path
+
+    port = free_port()
+    feed_command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "feed.py"),
+                    "serve", "--port", str(port), "--rate", str(args.rate),
+                    "--ticks-per-candle", str(args.ticks_per_candle)]
+    if args.recording:
+        feed_command += ["--recording", args.recording]
+    feed = subprocess.Popen(feed_command)
+
+    workdir = tempfile.mkdtemp(prefix="bench-engine-")
+    try:
+        wait_for_port(port)
+
+        # Same wiring as websocketBybit.start(), minus backfill and the servers
+        engine.window_size = args.window_size
+        engine.streams.clear()
+        for i in range(args.symbols):
+            for interval in args.intervals.split(","):
+                stream = engine.StreamState(f"SYM{i:03d}USDT", interval.strip())
+                prefill(stream, args.window_size)
+                engine.streams[stream.topic] = stream
+        engine.ledger = PredictionLedger(os.path.join(workdir, "ledger.bin"))
+        engine.candle_store = CandleStore(os.path.join(workdir, "candles"))
+        # Served through a registry like in the engine, so GRU forecasts reach the ledger too
+        name = model_name(args.gru_model)
+        engine.model_registry = ModelRegistry({name: args.gru_model}, args.window_size, loader=load_gru_model)
+        engine.model_registry.start(name)
+        engine.scheduler = InferenceScheduler(engine.model_registry)
+        engine.scheduler.start()
+        engine.arima_pool = ArimaPool(workers=args.arima_workers, mode=args.arima_mode)
+        conn = engine.SocketConn(f"ws://127.0.0.1:{port}", list(engine.streams))
+
+        run = asyncio.run(run_engine(engine, conn, args.warmup, args.duration))
+        # Let forecasts of the last candles finish before reading the workers
+        time.sleep(1.0)
+
+        components = {
+            "engine": process_usage(),
+            "feed": process_usage(feed.pid),
+            "gru_scheduler_cpu_seconds": thread_cpu_seconds(engine.scheduler._thread.native_id),
+            "arima_workers": [process_usage(pid) for pid in engine.arima_pool.pids()],
+        }
+        if components["engine"] is not None and run["engine_cpu_seconds"] is not None:
+            components["engine"]["cpu_percent_during_run"] = 100 * run["engine_cpu_seconds"] / run["elapsed_s"]
+
+        results = {
+            "streams": len(engine.streams),
+            "offered_messages_per_sec": args.rate * len(engine.streams),
+            "messages": run["messages"],
+            "closed_candles": run["closed_candles"],
+            "messages_per_sec": run["messages_per_sec"],
+            "latency": {name: summarize(histogram) for name, histogram in run["histograms"].items()},
+            "model_calls": {
+                "gru_batches": engine.scheduler.batches,
+                "gru_predictions": engine.scheduler.predictions,
+                "gru_dropped": engine.scheduler.dropped,
+                "arima_fits": run["histograms"]["model_arima"].count,
+                "arima_dropped": engine.arima_pool.dropped,
+            },
+            "components": components,
+        }
+        engine.scheduler.stop()
+        engine.arima_pool.shutdown()
+    finally:
+        feed.terminate()
+        feed.wait()
+
+    path = write_results("engine", results, args, args.output)
+    print(f"{results['messages_per_sec']:.0f} msg/s, GRU p99 "
+          f"{results['latency']['prediction_gru']['p99_ms']} ms, results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+from collections import deque
+
+import numpy as np
+
+from common import load_gru_model, measure, write_results
+from arima_model import IncrementalArima, fit_auto_arima
+from inference import minmax_scale
+from ring_buffer import CANDLE_COLUMNS, CandleRingBuffer
+
+
+def bench_window_update(window_size):
+    row = {"start": 0, "open": 100.0, "high": 101.0, "low": 99.0, "close": 100.5,
+           "volume": 1.0, "turnover": 100.5}
+    close = CANDLE_COLUMNS.index("close")
+    buffer = CandleRingBuffer(window_size)
+    rows = deque(maxlen=window_size)
+    for _ in range(window_size):
+        buffer.append(row)
+        rows.append([float(row[name]) for name in CANDLE_COLUMNS])
+
+    # Both keep every OHLCV column of a candle and return the close window as an array
+    def ring_buffer():
+        buffer.append(row)
+        buffer.window("close")
+
+    def deque_copy():
+        rows.append([float(row[name]) for name in CANDLE_COLUMNS])
+        np.array(rows)[:, close]
+
+    return {"ring_buffer": measure(ring_buffer, 10000), "deque_copy": measure(deque_copy, 10000)}
+
+
+def bench_scaler(window_size, batch_size):
+    rng = np.random.default_rng(0)
+    window = rng.random((1, window_size)) + 100
+    batch = rng.random((batch_size, window_size)) + 100
+    results = {
+        "minmax_scale_1": measure(lambda: minmax_scale(window), 10000),
+        f"minmax_scale_{batch_size}": measure(lambda: minmax_scale(batch), 1000),
+    }
+    try:
+        from sklearn.preprocessing import MinMaxScaler
+    except ImportError:
+        return results
+
+    def sklearn_per_window():
+        for row in batch:
+            MinMaxScaler(feature_range=(0, 1)).fit_transform(row.reshape(-1, 1))
+
+    results[f"sklearn_loop_{batch_size}"] = measure(sklearn_per_window, 10, 3)
+    return results
+
+
+def bench_gru(spec, window_size, batch_sizes):
+    try:
+        model = load_gru_model(spec)
+    except Exception as e:
+        return {"skipped": f"could not load {spec}: {e}"}
+    rng = np.random.default_rng(0)
+    results = {}
+    for batch_size in batch_sizes:
+        X = rng.random((batch_size, window_size, 1))
+        model.predict(X, verbose=0)  # Warm up graph tracing
+        results[f"batch_{batch_size}"] = measure(lambda: model.predict(X, verbose=0), 20, 3)
+    return results
+
+
+def bench_arima(window_size, history_size):
+    rng = np.random.default_rng(0)
+    closes = np.cumsum(rng.normal(0, 0.5, history_size + 100)) + 100
+    results = {
+        f"auto_arima_{window_size}": measure(lambda: fit_auto_arima(closes[:window_size]), 3, 3),
+        f"auto_arima_{history_size}": measure(lambda: fit_auto_arima(closes[:history_size]), 1, 3),
+    }
+
+    model = IncrementalArima(research_every=10 ** 9)
+    model.predict(closes[:history_size])
+    position = [history_size]
+
+    def update():
+        position[0] += 1
+        model.predict(closes[position[0] - history_size:position[0]])
+
+    results[f"incremental_update_{history_size}"] = measure(update, 20, 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the prediction hot path.")
+    parser.add_argument("--window-size", type=int, default=14)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--arima-history", type=int, default=100)
+    parser.add_argument("--gru-model", default="persistence",
+                        help="Keras model file, .npz weights or 'persistence'")
+    parser.add_argument("--skip-arima", action="store_true")
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/)")
+    args = parser.parse_args()
+
+    results = {
+        "window_update": bench_window_update(args.window_size),
+        "scaler": bench_scaler(args.window_size, args.batch_size),
+        "gru_step": bench_gru(args.gru_model, args.window_size, (1, args.batch_size)),
+    }
+    if not args.skip_arima:
+        results["arima"] = bench_arima(args.window_size, args.arima_history)
+
+    path = write_results("micro", results, args, args.output)
+    for group, entries in results.items():
+        for name, entry in entries.items():
+            if isinstance(entry, dict):
+                print(f"{group}.{name}: {entry['best_us']:.1f} us")
+            else:
+                print(f"{group}.{name}: {entry}")
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
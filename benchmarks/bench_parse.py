@@ -0,0 +1,63 @@
+import argparse
+import json
+import time
+
+from common import write_results
+from feed import SyntheticKlines
+from kline_parser import is_confirmed, loads, parse_klines, peek_topic
+
+
+def make_frames(count, ticks_per_candle=10, topic="kline.5.BTCUSDT"):
+    source = SyntheticKlines(topic, ticks_per_candle)
+    return [source.next_frame(source.start + i) for i in range(count)]
+
+
+def naive(frames):
+    closed = 0
+    for frame in frames:
+        data = json.loads(frame)
+        for kline in data["data"]:
+            closed += kline["confirm"]
+    return closed
+
+
+def fast_path(frames):
+    closed = 0
+    for frame in frames:
+        # In-progress ticks are kept as raw frames, never decoded
+        if peek_topic(frame) is not None and not is_confirmed(frame):
+            continue
+        for kline in parse_klines(frame):
+            closed += kline["confirm"]
+    return closed
+
+
+def full_decode(frames):
+    closed = 0
+    for frame in frames:
+        for kline in loads(frame)["data"]:
+            closed += kline["confirm"]
+    return closed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kline frame parsing.")
+    parser.add_argument("--frames", type=int, default=200_000)
+    parser.add_argument("--ticks-per-candle", type=int, default=10)
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/)")
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.ticks_per_candle)
+    results = {}
+    for name, func in (("json.loads", naive), ("decoder", full_decode), ("fast_path", fast_path)):
+        started = time.perf_counter()
+        closed = func(frames)
+        elapsed = time.perf_counter() - started
+        results[name] = {"frames_per_sec": round(len(frames) / elapsed), "closed": closed}
+    results["decoder_name"] = loads.__module__
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results('parse', results, args, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
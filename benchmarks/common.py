@@ -0,0 +1,195 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Benchmarks import the project modules from the repository root
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from metrics import Histogram  # noqa: E402
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class PersistenceModel:
+    """
+    Baseline "model" that predicts the last close of every window.
+
+    Used with ``--gru-model persistence`` to measure the pipeline without model cost.
+    """
+
+    def predict(self, X, batch_size=None, verbose=0):
+        return X[:, -1, :]
+
+
+def load_gru_model(spec):
+    """
+    Load the GRU model a benchmark should run.
+
+    Args:
+        spec (str): "persistence" for the baseline, exported .npz weights for the
+            NumPy backend, otherwise a Keras model file.
+
+    Returns:
+        A model with a Keras-style ``predict`` method.
+    """
+    if spec == "persistence":
+        return PersistenceModel()
+    from model_registry import load_model_file
+
+    return load_model_file(spec)
+
+
+def measure(func, number=1000, repeat=5):
+    """
+    Time a callable.
+
+    Args:
+        func (callable): The code to time, called without arguments.
+        number (int): Calls per repetition.
+        repeat (int): Repetitions; the best one is reported along with the median.
+
+    Returns:
+        dict: best_us and median_us per call, and the number of calls.
+    """
+    per_call = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - started) / number * 1e6)
+    per_call.sort()
+    return {
+        "best_us": round(per_call[0], 3),
+        "median_us": round(per_call[len(per_call) // 2], 3),
+        "calls": number * repeat,
+    }
+
+
+def histogram_delta(histogram, before):
+    """
+    Return the observations a histogram received since a snapshot.
+
+    Args:
+        histogram (Histogram): The live histogram.
+        before (tuple): An earlier ``histogram.snapshot()``.
+
+    Returns:
+        Histogram: A histogram holding only the new observations.
+    """
+    counts, total, count = histogram.snapshot()
+    delta = Histogram(histogram.buckets)
+    delta.counts = [now - then for now, then in zip(counts, before[0])]
+    delta.sum = total - before[1]
+    delta.count = count - before[2]
+    return delta
+
+
+def summarize(histogram, quantiles=(0.5, 0.95, 0.99)):
+    """
+    Summarize a histogram in milliseconds.
+
+    Args:
+        histogram (Histogram): The histogram.
+        quantiles (tuple): The quantiles to report.
+
+    Returns:
+        dict: count, mean_ms and p50_ms, p95_ms, ...
+    """
+    summary = {"count": histogram.count}
+    summary["mean_ms"] = histogram.sum / histogram.count * 1000 if histogram.count else None
+    for q in quantiles:
+        value = histogram.percentile(q)
+        summary[f"p{round(q * 100)}_ms"] = value * 1000 if value is not None else None
+    return summary
+
+
+def process_usage(pid="self"):
+    """
+    Read the CPU time and memory of a process from /proc.
+
+    Args:
+        pid: The process id, or "self".
+
+    Returns:
+        dict: cpu_seconds, rss_mb and peak_rss_mb, or None where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            # Fields after the parenthesized command name; utime and stime are 14th and 15th
+            fields = file.read().rsplit(")", 1)[1].split()
+        memory = {}
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    memory[key] = int(value.split()[0]) / 1024
+    except OSError:
+        return None
+    return {
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS,
+        "rss_mb": memory.get("VmRSS"),
+        "peak_rss_mb": memory.get("VmHWM"),
+    }
+
+
+def thread_cpu_seconds(native_id):
+    """
+    Read the CPU time of one thread of this process from /proc.
+
+    Args:
+        native_id (int): The thread's ``native_id``.
+
+    Returns:
+        float: CPU seconds, or None where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/self/task/{native_id}/stat") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+
+
+def write_results(name, results, args, output=None):
+    """
+    Write benchmark results with the metadata needed to compare runs.
+
+    Args:
+        name (str): The benchmark name.
+        results (dict): The measurements.
+        args (argparse.Namespace): The benchmark arguments.
+        output (str): The output file (defaults to benchmarks/results/<name>-<time>.json).
+
+    Returns:
+        str: The path written.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    document = {
+        "benchmark": name,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as file:
+        json.dump(document, file, indent=2)
+    return output
@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+
+import websockets
+
+# First candle start of synthetic streams (ms); aligned to every interval up to a day
+SYNTHETIC_START = 1_700_006_400_000
+
+
+def interval_step(topic):
+    """
+    Return the candle length of a kline topic in milliseconds.
+
+    Args:
+        topic (str): A topic like "kline.5.BTCUSDT".
+
+    Returns:
+        int: The candle length.
+    """
+    interval = topic.split(".")[1]
+    return {"D": 86_400_000, "W": 7 * 86_400_000}.get(interval) or int(interval) * 60_000
+
+
+def kline_frame(topic, start, price, confirm, ts, volume=12.345):
+    """
+    Build one kline push frame in the exact layout Bybit sends.
+
+    Args:
+        topic (str): The kline topic.
+        start (int): The candle start (ms).
+        price (float): The close.
+        confirm (bool): Whether the candle is closed.
+        ts (int): The frame timestamp (ms).
+        volume (float): The candle volume.
+
+    Returns:
+        str: The frame as text.
+    """
+    kline = {
+        "start": start, "end": start + interval_step(topic) - 1, "interval": topic.split(".")[1],
+        "open": f"{price:.2f}", "close": f"{price:.2f}",
+        "high": f"{price * 1.0005:.2f}", "low": f"{price * 0.9995:.2f}",
+        "volume": f"{volume:.3f}", "turnover": f"{volume * price:.2f}",
+        "confirm": confirm, "timestamp": ts,
+    }
+    return json.dumps({"topic": topic, "data": [kline], "ts": ts, "type": "snapshot"}, separators=(",", ":"))
+
+
+class SyntheticKlines:
+    """
+    Random-walk kline frames for one topic.
+
+    Every ``ticks_per_candle``-th frame closes the candle, and the next frame
+    opens the following one, so consecutive candles never leave a gap.
+    """
+
+    def __init__(self, topic, ticks_per_candle=10, price=100.0, start=SYNTHETIC_START, seed=None):
+        """
+        Initialize the generator.
+
+        Args:
+            topic (str): The kline topic.
+            ticks_per_candle (int): Frames per candle, the last of which is confirmed.
+            price (float): The starting price.
+            start (int): The first candle start (ms).
+            seed (int): Random seed (defaults to a hash of the topic, so runs are reproducible).
+        """
+        self.topic = topic
+        self.ticks_per_candle = ticks_per_candle
+        self.price = price
+        self.start = start
+        self.step = interval_step(topic)
+        self.tick = 0
+        self._random = random.Random(seed if seed is not None else zlib.crc32(topic.encode()))
+
+    def next_frame(self, ts=None):
+        self.price *= 1 + self._random.gauss(0, 0.0005)
+        self.tick += 1
+        confirm = self.tick % self.ticks_per_candle == 0
+        frame = kline_frame(self.topic, self.start, self.price, confirm,
+                            ts if ts is not None else int(time.time() * 1000))
+        if confirm:
+            self.start += self.step
+        return frame
+
+
+class RecordedKlines:
+    """
+    Replays recorded frames of one topic in a loop.
+
+    Candle starts are shifted forward on every pass, so the engine sees a
+    continuous series instead of the same candles again.
+    """
+
+    def __init__(self, topic, frames):
+        """
+        Initialize the replay.
+
+        Args:
+            topic (str): The kline topic.
+            frames (list): Decoded frames of that topic, in the recorded order.
+        """
+        self.topic = topic
+        self.frames = frames
+        starts = [kline["start"] for frame in frames for kline in frame["data"]]
+        self.span = max(starts) - min(starts) + interval_step(topic)
+        self.position = 0
+
+    def next_frame(self, ts=None):
+        frame = self.frames[self.position % len(self.frames)]
+        offset = self.span * (self.position // len(self.frames))
+        self.position += 1
+        ts = ts if ts is not None else int(time.time() * 1000)
+        data = [dict(kline, start=kline["start"] + offset, end=kline["end"] + offset) for kline in frame["data"]]
+        return json.dumps({**frame, "data": data, "ts": ts}, separators=(",", ":"))
+
+
+def load_recording(path):
+    """
+    Load a recording written by ``feed.py record``.
+
+    Args:
+        path (str): A file with one raw Bybit frame per line.
+
+    Returns:
+        dict: Topic to its decoded kline frames.
+    """
+    frames = {}
+    with open(path) as file:
+        for line in file:
+            frame = json.loads(line)
+            if frame.get("topic", "").startswith("kline"):
+                frames.setdefault(frame["topic"], []).append(frame)
+    return frames
+
+
+class FeedServer:
+    """
+    Local stand-in for the Bybit public WebSocket.
+
+    Answers subscribe and ping requests like Bybit and pushes ``rate`` frames
+    per second for every subscribed topic, from a recording when one has the
+    topic and synthetic data otherwise.
+    """
+
+    def __init__(self, rate=5.0, ticks_per_candle=10, recording=None):
+        """
+        Initialize the server.
+
+        Args:
+            rate (float): Frames per second per topic.
+            ticks_per_candle (int): Frames per synthetic candle.
+            recording (dict): Optional output of ``load_recording``.
+        """
+        self.rate = rate
+        self.ticks_per_candle = ticks_per_candle
+        self.recording = recording or {}
+        self.sent = 0
+
+    def _source(self, topic):
+        if topic in self.recording:
+            return RecordedKlines(topic, self.recording[topic])
+        return SyntheticKlines(topic, self.ticks_per_candle)
+
+    async def handler(self, ws):
+        sources = {}
+        sender = None
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                op = request.get("op")
+                if op == "ping":
+                    await ws.send(json.dumps({"success": True, "ret_msg": "pong", "op": "ping"}))
+                elif op == "subscribe":
+                    for topic in request.get("args", []):
+                        sources.setdefault(topic, self._source(topic))
+                    await ws.send(json.dumps({"success": True, "ret_msg": "", "op": "subscribe"}))
+                    if sender is None:
+                        sender = asyncio.create_task(self._send(ws, sources))
+                elif op == "unsubscribe":
+                    for topic in request.get("args", []):
+                        sources.pop(topic, None)
+                    await ws.send(json.dumps({"success": True, "ret_msg": "", "op": "unsubscribe"}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if sender is not None:
+                sender.cancel()
+
+    async def _send(self, ws, sources):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        rounds = 0
+        while True:
+            # Send every round that is due; a slow client gets bursts instead of a lower rate
+            due = int((loop.time() - started) * self.rate) - rounds
+            if due <= 0:
+                await asyncio.sleep((rounds + 1) / self.rate - (loop.time() - started))
+                continue
+            for _ in range(due):
+                ts = int(time.time() * 1000)
+                for source in list(sources.values()):
+                    await ws.send(source.next_frame(ts))
+                    self.sent += 1
+            rounds += due
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        async with websockets.serve(self.handler, host, port, ping_interval=None, max_queue=None):
+            await asyncio.Future()
+
+
+async def record(url, topics, output, duration):
+    """
+    Record raw frames from a live Bybit WebSocket for later replay.
+
+    Args:
+        url (str): The WebSocket URL.
+        topics (list): The topics to record.
+        output (str): The output file, one frame per line.
+        duration (float): Seconds to record.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    async with websockets.connect(url) as ws:
+        await ws.send(json.dumps({"op": "subscribe", "args": topics}))
+        with open(output, "w") as file:
+            while loop.time() < deadline:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                if message.startswith('{"topic"'):
+                    file.write(message + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic or recorded Bybit kline feed.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve kline frames on a local WebSocket")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--rate", type=float, default=5.0, help="Frames per second per topic")
+    serve.add_argument("--ticks-per-candle", type=int, default=10)
+    serve.add_argument("--recording", help="Replay frames recorded with the record command")
+
+    rec = commands.add_parser("record", help="Record frames from Bybit")
+    rec.add_argument("--url", default="wss://stream.bybit.com/v5/public/linear")
+    rec.add_argument("--topic", action="append", dest="topics", required=True)
+    rec.add_argument("--duration", type=float, default=600)
+    rec.add_argument("--output", required=True)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        recording = load_recording(args.recording) if args.recording else None
+        server = FeedServer(args.rate, args.ticks_per_candle, recording)
+        asyncio.run(server.serve(args.host, args.port))
+    else:
+        asyncio.run(record(args.url, args.topics, args.output, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import timedelta
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+
+def _seconds(retry_after):
+    # python-telegram-bot reports retry_after as int seconds or as a timedelta, depending on settings
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class Broadcaster:
+    """
+    Delivers push messages to many chats within Telegram's flood limits.
+
+    Messages wait in a heap ordered by the time they may be sent. A single
+    dispatcher paces all sends to ``rate`` (Telegram allows a bot about 30
+    messages per second) and keeps at least ``chat_interval`` between messages
+    to the same private chat and ``group_interval`` in groups (about 20 messages
+    per minute), then hands each message to a bounded pool of send tasks. A
+    newer message for the same chat and key replaces one that has not been
+    sent yet, so a backlog never delivers stale forecasts. On a 429 only the
+    chat that hit the limit waits for the ``retry_after`` Telegram asks for;
+    network errors are retried with exponential backoff.
+    """
+
+    def __init__(self, rate=25.0, chat_interval=1.0, group_interval=3.0, max_concurrent=16, max_retries=3,
+                 retry_delay=1.0, max_pending=100000, on_forbidden=None):
+        """
+        Initialize the broadcaster.
+
+        Args:
+            rate (float): Messages per second across all chats.
+            chat_interval (float): Minimum seconds between two messages to one private chat.
+            group_interval (float): Minimum seconds between two messages to one group (negative chat id).
+            max_concurrent (int): Maximum number of messages in flight.
+            max_retries (int): Attempts after the first one before a message is dropped.
+            retry_delay (float): Backoff of the first retry after a network error, doubled for each next one.
+            max_pending (int): Messages queued before new ones are dropped.
+            on_forbidden (callable): Called with the chat id when the bot was blocked or removed from a chat.
+        """
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_pending = max_pending
+        self.on_forbidden = on_forbidden
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.dropped = 0
+        self._bot = None
+        self._heap = []
+        self._pending = {}
+        self._next_send = {}
+        self._sequence = itertools.count()
+        self._tokens = 1.0
+        self._updated = None
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._wakeup = asyncio.Event()
+        self._sends = set()
+        self._task = None
+
+    def start(self, bot):
+        """
+        Start dispatching on the running event loop.
+
+        Args:
+            bot (telegram.Bot): The bot sending the messages.
+        """
+        self._bot = bot
+        self._updated = asyncio.get_running_loop().time()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+
+    def publish(self, chat_ids, key, text):
+        """
+        Queue one message for a number of chats.
+
+        Args:
+            chat_ids (iterable): The recipients.
+            key (str): What the message is about, e.g. a kline topic; an unsent message
+                with the same chat and key is replaced.
+            text (str): The rendered message, shared by every recipient.
+        """
+        now = asyncio.get_running_loop().time()
+        for chat_id in chat_ids:
+            self._enqueue(chat_id, key, text, 0, now)
+        self._wakeup.set()
+
+    def _enqueue(self, chat_id, key, text, attempt, due):
+        entry = (chat_id, key)
+        if entry in self._pending:
+            self._pending[entry] = (text, attempt)
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending[entry] = (text, attempt)
+        heapq.heappush(self._heap, (due, next(self._sequence), chat_id, key))
+
+    def _take_token(self, now):
+        # Bucket of a single token refilled at ``rate``: sends are spaced evenly, without bursts
+        # that could exceed the limit within one second; returns how long to wait for the token
+        self._tokens = min(1.0, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def _sleep_or_wakeup(self, delay):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, chat_id, key = self._heap[0]
+            now = loop.time()
+            wait = due - now
+            if wait > 0:
+                # New messages may be due earlier, so a publish cuts the wait short
+                await self._sleep_or_wakeup(wait)
+                continue
+
+            # Too soon for this chat: come back when it may receive again
+            chat_ready = self._next_send.get(chat_id, 0.0)
+            if chat_ready > now:
+                heapq.heapreplace(self._heap, (chat_ready, next(self._sequence), chat_id, key))
+                continue
+
+            wait = self._take_token(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            heapq.heappop(self._heap)
+            text, attempt = self._pending.pop((chat_id, key))
+            self._next_send[chat_id] = now + (self.group_interval if chat_id < 0 else self.chat_interval)
+            if len(self._next_send) > 2 * self.max_pending:
+                self._next_send = {chat: ready for chat, ready in self._next_send.items() if ready > now}
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._send(chat_id, key, text, attempt))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, chat_id, key, text, attempt):
+        loop = asyncio.get_running_loop()
+        try:
+            await self._bot.send_message(chat_id, text)
+            self.sent += 1
+        except RetryAfter as e:
+            delay = _seconds(e.retry_after)
+            logging.warning(f"Flood limit hit sending to {chat_id}, pausing pushes to it for {delay:.0f} s")
+            # Limits are mostly per chat, so the other chats keep receiving
+            ready = loop.time() + delay
+            self._next_send[chat_id] = max(self._next_send.get(chat_id, 0.0), ready)
+            self._retry(chat_id, key, text, attempt, ready)
+        except Forbidden as e:
+            self.failed += 1
+            logging.info(f"Chat {chat_id} no longer accepts messages: {e}")
+            if self.on_forbidden is not None:
+                self.on_forbidden(chat_id)
+        except BadRequest as e:
+            self.failed += 1
+            logging.error(f"Push to {chat_id} rejected: {e}")
+        except NetworkError as e:
+            delay = self.retry_delay * 2 ** attempt
+            logging.warning(f"Push to {chat_id} failed, retrying in {delay:.0f} s: {e}")
+            self._retry(chat_id, key, text, attempt, loop.time() + delay)
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Error pushing to {chat_id}: {e}")
+        finally:
+            self._slots.release()
+
+    def _retry(self, chat_id, key, text, attempt, due):
+        if attempt >= self.max_retries:
+            self.failed += 1
+            logging.error(f"Giving up on push to {chat_id} after {attempt + 1} attempts")
+            return
+        # A newer message queued meanwhile supersedes this one
+        if (chat_id, key) in self._pending:
+            return
+        self.retried += 1
+        self._enqueue(chat_id, key, text, attempt + 1, due)
+        self._wakeup.set()
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import random
+import time
+
+import websockets
+
+from kline_parser import is_confirmed, peek_topic
+
+# Bybit accepts at most this many topics per subscribe request
+SUBSCRIBE_CHUNK = 10
+
+
+class BybitStream:
+    """
+    asyncio client for the Bybit public WebSocket API.
+
+    Holds any number of topics on one connection, sends the application-level
+    ``{"op": "ping"}`` heartbeat Bybit expects, reconnects with jittered
+    exponential backoff and resubscribes every topic after a reconnect. Topics
+    can be added and removed while the connection is up. ``run`` is a plain
+    coroutine, so the client can share an event loop with other components.
+
+    While the handler is behind, an in-progress kline tick replaces the tick of
+    the same topic still waiting in the queue instead of being queued after it, so
+    the backlog grows with the number of topics rather than the tick rate.
+    """
+
+    def __init__(self, url, topics=(), on_message=None, ping_interval=20.0, pong_timeout=10.0,
+                 backoff_min=1.0, backoff_max=60.0):
+        """
+        Initialize the client.
+
+        Args:
+            url (str): The WebSocket URL.
+            topics (iterable): Topics to subscribe to on connect.
+            on_message (callable): Coroutine function called with every data frame (as text).
+            ping_interval (float): Seconds between heartbeats.
+            pong_timeout (float): Reconnect when a heartbeat is not answered within this many seconds.
+            backoff_min (float): The base reconnect delay in seconds.
+            backoff_max (float): The maximum reconnect delay in seconds.
+        """
+        self.url = url
+        self.topics = set(topics)
+        self.on_message = on_message
+        self.ping_interval = ping_interval
+        self.pong_timeout = pong_timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+
+        self.reconnects = 0
+        self.coalesced = 0
+        self.connected = asyncio.Event()
+        self._ws = None
+        self._last_pong = 0.0
+        self._stopping = False
+        self._stopped = asyncio.Event()
+        # When the handler started on the frame it is working on, None while it waits for one
+        self._handling_since = None
+        # Topic to the queued [topic, frame] slot of its latest in-progress tick
+        self._ticks = {}
+
+    async def run(self):
+        """
+        Connect and process messages until ``stop`` is called, reconnecting on failures.
+
+        Data frames are handed to ``on_message`` in order by a separate task, so a
+        slow handler never keeps the read loop from processing heartbeat replies;
+        only the latest of the in-progress ticks queued for a topic is handed over.
+        """
+        frames = asyncio.Queue()
+        consumer = asyncio.create_task(self._consume(frames))
+        attempt = 0
+        try:
+            while not self._stopping:
+                try:
+                    async with websockets.connect(self.url, ping_interval=None, max_queue=None) as ws:
+                        self._ws = ws
+                        logging.info("WebSocket connection opened.")
+                        await self._send_topics("subscribe", sorted(self.topics))
+                        self.connected.set()
+                        attempt = 0
+                        heartbeat = asyncio.create_task(self._heartbeat(ws))
+                        try:
+                            async for message in ws:
+                                if not self._control(message):
+                                    self._enqueue(frames, message)
+                        finally:
+                            heartbeat.cancel()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"WebSocket error: {e}")
+                finally:
+                    self._ws = None
+                    self.connected.clear()
+
+                if self._stopping:
+                    break
+                logging.info("WebSocket connection closed.")
+
+                # Full jitter keeps many clients from reconnecting in lockstep
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_min * 2 ** attempt))
+                attempt += 1
+                self.reconnects += 1
+                logging.info(f"Reconnecting in {delay:.1f} s (attempt {attempt})")
+                # Cut short by stop(), so a shutdown never waits out the backoff
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            # Frames received before the stop are still handled
+            frames.put_nowait(None)
+            await consumer
+        finally:
+            consumer.cancel()
+
+    async def stop(self):
+        self._stopping = True
+        self._stopped.set()
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def subscribe(self, topics):
+        """
+        Add topics; they are subscribed immediately if connected and on every reconnect.
+
+        Args:
+            topics (iterable): The topics to add.
+        """
+        new_topics = sorted(set(topics) - self.topics)
+        self.topics.update(new_topics)
+        if self._ws is not None:
+            await self._send_topics("subscribe", new_topics)
+
+    async def unsubscribe(self, topics):
+        """
+        Remove topics.
+
+        Args:
+            topics (iterable): The topics to remove.
+        """
+        removed = sorted(self.topics & set(topics))
+        self.topics.difference_update(removed)
+        if self._ws is not None:
+            await self._send_topics("unsubscribe", removed)
+
+    async def _send_topics(self, op, topics):
+        for i in range(0, len(topics), SUBSCRIBE_CHUNK):
+            await self._ws.send(json.dumps({"op": op, "args": topics[i:i + SUBSCRIBE_CHUNK]}))
+
+    async def _heartbeat(self, ws):
+        loop = asyncio.get_running_loop()
+        self._last_pong = loop.time()
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if loop.time() - self._last_pong > self.ping_interval + self.pong_timeout:
+                logging.warning("Heartbeat timed out, closing the connection")
+                await ws.close()
+                return
+            await ws.send(json.dumps({"op": "ping"}))
+
+    def handler_age(self):
+        """
+        Return how long the handler has been working on the current data frame.
+
+        Safe to call from other threads, e.g. to report liveness.
+
+        Returns:
+            float: Seconds, 0 while the handler waits for a frame.
+        """
+        since = self._handling_since
+        return 0.0 if since is None else time.monotonic() - since
+
+    async def run_in_thread(self, func, *args):
+        """
+        Run a blocking call in a worker thread from the handler.
+
+        The time spent waiting for the thread does not count towards ``handler_age``:
+        the event loop keeps running meanwhile, and a long REST call must not make a
+        healthy handler look wedged.
+
+        Args:
+            func (callable): The blocking function.
+            *args: Its arguments.
+
+        Returns:
+            The value returned by ``func``.
+        """
+        since = self._handling_since
+        self._handling_since = None
+        started = time.monotonic()
+        try:
+            return await asyncio.to_thread(func, *args)
+        finally:
+            if since is not None:
+                self._handling_since = since + (time.monotonic() - started)
+
+    def _control(self, message):
+        # Control frames carry "op" and are short, so check them without a full parse
+        if '"op"' not in message[:64] and '"success"' not in message[:64]:
+            return False
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return False
+        op = data.get("op")
+        if op in ("ping", "pong") or data.get("ret_msg") == "pong":
+            self._last_pong = asyncio.get_running_loop().time()
+            return True
+        if op in ("subscribe", "unsubscribe"):
+            if not data.get("success", True):
+                logging.error(f"Bybit {op} failed: {data.get('ret_msg')}")
+            return True
+        return False
+
+    def _enqueue(self, frames, message):
+        topic = peek_topic(message)
+        if topic is None or not topic.startswith("kline."):
+            frames.put_nowait(message)
+            return
+        slot = self._ticks.get(topic)
+        if not is_confirmed(message):
+            if slot is None:
+                slot = self._ticks[topic] = [topic, message]
+                frames.put_nowait(slot)
+            else:
+                slot[1] = message
+                self.coalesced += 1
+            return
+        # A closed candle supersedes the queued tick of its topic; a later tick gets a new slot
+        # behind this frame, so the handler never sees a tick before the candle it follows
+        if slot is not None:
+            del self._ticks[topic]
+            slot[1] = None
+            self.coalesced += 1
+        frames.put_nowait(message)
+
+    async def _consume(self, frames):
+        while True:
+            message = await frames.get()
+            if message is None:
+                return
+            if isinstance(message, list):
+                slot = message
+                topic, message = slot
+                # Ticks arriving from now on need a new slot
+                if self._ticks.get(topic) is slot:
+                    del self._ticks[topic]
+                if message is None:
+                    continue
+            if self.on_message is None:
+                continue
+            self._handling_since = time.monotonic()
+            try:
+                await self.on_message(message)
+            except Exception as e:
+                logging.error(f"Error handling WebSocket frame: {e}")
+            finally:
+                self._handling_since = None
@@ -0,0 +1,278 @@
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from ring_buffer import CANDLE_COLUMNS
+
+# Candle start timestamps (ms) are kept next to the OHLCV columns
+TIMESTAMP_COLUMN = "start"
+_DTYPES = {TIMESTAMP_COLUMN: np.dtype("<i8"), **{name: np.dtype("<f8") for name in CANDLE_COLUMNS}}
+
+
+class _Partition:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.files = {}
+        self.appended = 0
+        self.repaired = False
+
+
+class CandleStore:
+    """
+    Append-only, columnar candle store partitioned by symbol and interval.
+
+    Every partition is a directory with one raw little-endian file per column
+    (``start.i64``, ``close.f64``, ...). Closed candles are appended row by row;
+    reads memory-map the column files, so range reads return zero-copy views.
+    Compaction sorts the rows by start time, removes duplicates (e.g. candles
+    fetched again after a reconnect) and drops rows older than the retention.
+    """
+
+    def __init__(self, root, retention_days=None):
+        """
+        Initialize the store.
+
+        Args:
+            root (str): The directory that holds the partitions.
+            retention_days (float): Drop candles older than this on compaction (None keeps everything).
+        """
+        self.root = root
+        self.retention_days = retention_days
+        self._partitions = {}
+        self._lock = threading.Lock()
+        self._maintenance_thread = None
+        self._stop = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+    def _partition(self, symbol, interval):
+        key = (symbol, str(interval))
+        with self._lock:
+            partition = self._partitions.get(key)
+            if partition is None:
+                path = os.path.join(self.root, symbol, str(interval))
+                os.makedirs(path, exist_ok=True)
+                partition = self._partitions[key] = _Partition(path)
+            return partition
+
+    @staticmethod
+    def _column_path(partition, column):
+        suffix = "i64" if column == TIMESTAMP_COLUMN else "f64"
+        return os.path.join(partition.path, f"{column}.{suffix}")
+
+    def _rows(self, partition):
+        return min(
+            os.path.getsize(path) // _DTYPES[column].itemsize if os.path.exists(path) else 0
+            for column, path in ((c, self._column_path(partition, c)) for c in _DTYPES)
+        )
+
+    def _repair(self, partition):
+        # A crash between column writes leaves columns of different lengths. Only the writing
+        # process repairs, before its first append: a reader in another process could otherwise
+        # truncate a column the writer is in the middle of appending to. Reads clamp to the
+        # shortest column instead.
+        partition.repaired = True
+        rows = self._rows(partition)
+        for column, dtype in _DTYPES.items():
+            path = self._column_path(partition, column)
+            if os.path.exists(path) and os.path.getsize(path) != rows * dtype.itemsize:
+                logging.warning(f"Truncating torn column {path} to {rows} rows")
+                with open(path, "r+b") as file:
+                    file.truncate(rows * dtype.itemsize)
+
+    def _close_files(self, partition):
+        for file in partition.files.values():
+            file.close()
+        partition.files = {}
+
+    def append(self, symbol, interval, start, values):
+        """
+        Append one closed candle.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+            start (int): The candle start timestamp in milliseconds.
+            values: A mapping with the OHLCV columns (strings as in Bybit payloads are accepted).
+        """
+        self.append_many(symbol, interval, [start], [[float(values[name]) for name in CANDLE_COLUMNS]])
+
+    def append_many(self, symbol, interval, starts, rows):
+        """
+        Append several closed candles.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+            starts (array-like): Candle start timestamps in milliseconds.
+            rows (array-like): Array of shape (len(starts), len(CANDLE_COLUMNS)) with OHLCV values.
+        """
+        if len(starts) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.float64).reshape(len(starts), len(CANDLE_COLUMNS))
+        columns = {TIMESTAMP_COLUMN: np.asarray(starts, dtype=np.int64)}
+        columns.update({name: rows[:, i] for i, name in enumerate(CANDLE_COLUMNS)})
+
+        partition = self._partition(symbol, interval)
+        with partition.lock:
+            if not partition.repaired:
+                self._repair(partition)
+            for column, dtype in _DTYPES.items():
+                file = partition.files.get(column)
+                if file is None:
+                    file = partition.files[column] = open(self._column_path(partition, column), "ab")
+                file.write(np.ascontiguousarray(columns[column], dtype=dtype).tobytes())
+                file.flush()
+            partition.appended += len(starts)
+
+    def read(self, symbol, interval, start=None, end=None):
+        """
+        Read a range of candles as zero-copy, memory-mapped column views.
+
+        The range lookup assumes sorted rows, which holds for live appends and
+        is restored by ``compact`` after out-of-order backfills.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+            start (int): The first candle start timestamp to include (ms).
+            end (int): The last candle start timestamp to include (ms).
+
+        Returns:
+            dict: Column name to read-only array, including the "start" column.
+        """
+        partition = self._partition(symbol, interval)
+        with partition.lock:
+            columns = self._map(partition)
+        starts = columns[TIMESTAMP_COLUMN]
+        first = 0 if start is None else int(np.searchsorted(starts, start, side="left"))
+        last = len(starts) if end is None else int(np.searchsorted(starts, end, side="right"))
+        return {name: values[first:last] for name, values in columns.items()}
+
+    def tail(self, symbol, interval, n):
+        """
+        Read the most recent ``n`` candles as zero-copy column views.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+            n (int): The number of candles.
+
+        Returns:
+            dict: Column name to read-only array, including the "start" column.
+        """
+        partition = self._partition(symbol, interval)
+        with partition.lock:
+            columns = self._map(partition)
+        return {name: values[max(0, len(values) - n):] for name, values in columns.items()}
+
+    def _map(self, partition):
+        rows = self._rows(partition)
+        columns = {}
+        for column, dtype in _DTYPES.items():
+            if rows == 0:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(self._column_path(partition, column), dtype=dtype, mode="r", shape=(rows,))
+        return columns
+
+    def compact(self, symbol, interval):
+        """
+        Sort, deduplicate and apply retention to one partition.
+
+        The compacted columns are written to a sibling directory that replaces
+        the partition with renames, so readers never see a half-written partition.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+        """
+        partition = self._partition(symbol, interval)
+        with partition.lock:
+            self._close_files(partition)
+            columns = {name: np.array(values) for name, values in self._map(partition).items()}
+            total = len(columns[TIMESTAMP_COLUMN])
+
+            # Keep the last written copy of every candle, ordered by start time
+            starts = columns[TIMESTAMP_COLUMN]
+            order = np.argsort(starts, kind="stable")[::-1]
+            _, unique = np.unique(starts[order], return_index=True)
+            keep = order[unique]
+            if self.retention_days is not None:
+                cutoff = int((time.time() - self.retention_days * 86400) * 1000)
+                keep = keep[starts[keep] >= cutoff]
+
+            if len(keep) == total and np.all(keep == np.arange(total)):
+                partition.appended = 0
+                return
+
+            staging = partition.path + ".compact"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for column, dtype in _DTYPES.items():
+                path = os.path.join(staging, os.path.basename(self._column_path(partition, column)))
+                columns[column][keep].astype(dtype).tofile(path)
+
+            previous = partition.path + ".old"
+            shutil.rmtree(previous, ignore_errors=True)
+            os.rename(partition.path, previous)
+            os.rename(staging, partition.path)
+            shutil.rmtree(previous, ignore_errors=True)
+            # The rewritten columns all have the same length
+            partition.repaired = True
+            partition.appended = 0
+            logging.info(f"Compacted {symbol}/{interval}: {total} -> {len(keep)} candles")
+
+    def partitions(self):
+        """
+        List the stored partitions.
+
+        Returns:
+            list: (symbol, interval) tuples.
+        """
+        result = []
+        for symbol in sorted(os.listdir(self.root)):
+            symbol_path = os.path.join(self.root, symbol)
+            if not os.path.isdir(symbol_path):
+                continue
+            for interval in sorted(os.listdir(symbol_path)):
+                if os.path.isdir(os.path.join(symbol_path, interval)) and "." not in interval:
+                    result.append((symbol, interval))
+        return result
+
+    def compact_all(self, partitions=None):
+        for symbol, interval in partitions if partitions is not None else self.partitions():
+            try:
+                self.compact(symbol, interval)
+            except Exception as e:
+                logging.error(f"Error compacting {symbol}/{interval}: {e}")
+
+    def start_maintenance(self, every_seconds=3600, partitions=None):
+        """
+        Compact all partitions now and then every ``every_seconds`` in a background thread.
+
+        Args:
+            every_seconds (float): Seconds between compactions.
+            partitions (callable): Returns the (symbol, interval) tuples to compact, for processes
+                sharing the store that must only compact their own streams (defaults to all partitions).
+        """
+        def run():
+            while True:
+                self.compact_all(partitions() if partitions is not None else None)
+                if self._stop.wait(every_seconds):
+                    return
+
+        self._maintenance_thread = threading.Thread(target=run, name="CandleStoreMaintenance", daemon=True)
+        self._maintenance_thread.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            partitions = list(self._partitions.values())
+        for partition in partitions:
+            with partition.lock:
+                self._close_files(partition)
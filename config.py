@@ -2,6 +2,12 @@ import json
 import os
 
 
+def _as_list(value):
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [str(value)]
+
+
 class Config:
     def __init__(self, config_file="config.json"):
         """
@@ -26,11 +32,22 @@ class Config:
         except json.JSONDecodeError as e:
             raise Exception(f"Error reading JSON file: {e}")
 
+        # Configured symbols and intervals; every combination is one stream
+        self.symbols = _as_list(self._config.get("symbols", self._config.get("symbol", "BTCUSDT")))
+        self.intervals = _as_list(self._config.get("intervals", self._config.get("interval", "5")))
+
         # Define base path and other paths
         self.base_dir = base_dir
-        self.model_path = os.path.join(base_dir, "model", "gru_model_v3.keras")
+        self.model_dir = self._config.get("model_dir", os.path.join(base_dir, "model"))
+        self.model_path = self._config.get("model_path", os.path.join(self.model_dir, "gru_model_v3.keras"))
+        self.model_registry_path = self._config.get("model_registry_path", os.path.join(base_dir, "data", "models.json"))
+        self.gru_weights_path = self._config.get("gru_weights_path", os.path.join(self.model_dir, "gru_model_v3.npz"))
         self.websocket_path = os.path.join(base_dir, "websocketBybit.py")
         self.tg_bot_path = os.path.join(base_dir, "tg_bot.py")
+        self.candle_store_path = self._config.get("candle_store_path", os.path.join(base_dir, "data", "candles"))
+        self.ledger_path = self._config.get("ledger_path", os.path.join(base_dir, "data", "ledger.bin"))
+        self.subscriptions_path = self._config.get("subscriptions_path", os.path.join(base_dir, "data", "subscriptions.json"))
+        self.ipc_socket_path = self._config.get("ipc_socket_path", os.path.join(base_dir, "engine.sock"))
 
     def get(self, key, default=None):
         """
@@ -0,0 +1,223 @@
+import argparse
+import json
+
+import numpy as np
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "tanh": np.tanh,
+    # Same as 1 / (1 + exp(-x)) without overflowing for large negative inputs
+    "sigmoid": lambda x: 0.5 * (np.tanh(0.5 * x) + 1.0),
+    "relu": lambda x: np.maximum(x, 0.0),
+    # Keras 3 definition: relu6(x + 3) / 6
+    "hard_sigmoid": lambda x: np.clip(x / 6.0 + 0.5, 0.0, 1.0),
+}
+
+# Layers that do nothing at inference time
+_PASSTHROUGH_LAYERS = ("InputLayer", "Dropout")
+
+
+def _activation(name):
+    try:
+        return ACTIVATIONS[name]
+    except KeyError:
+        raise ValueError(f"Unsupported activation: {name}")
+
+
+def export_weights(model, path):
+    """
+    Export the weights of a Keras GRU model for ``NumpyGRUModel``.
+
+    Args:
+        model: A loaded Keras Sequential model of GRU layers followed by Dense layers.
+        path (str): The output .npz file.
+
+    Raises:
+        ValueError: If the model contains a layer or option the NumPy backend does not support.
+    """
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+        if kind in _PASSTHROUGH_LAYERS:
+            continue
+        index = len(layers)
+        if kind == "GRU":
+            if config.get("go_backwards") or config.get("stateful"):
+                raise ValueError(f"Unsupported GRU option in layer {layer.name}")
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            layers.append({
+                "type": "gru",
+                "units": config["units"],
+                "reset_after": config.get("reset_after", True),
+                "activation": config.get("activation", "tanh"),
+                "recurrent_activation": config.get("recurrent_activation", "sigmoid"),
+                "return_sequences": config.get("return_sequences", False),
+            })
+            arrays[f"{index}_kernel"] = kernel
+            arrays[f"{index}_recurrent_kernel"] = recurrent_kernel
+            arrays[f"{index}_bias"] = bias
+        elif kind == "Dense":
+            kernel, bias = layer.get_weights()
+            layers.append({"type": "dense", "activation": config.get("activation", "linear")})
+            arrays[f"{index}_kernel"] = kernel
+            arrays[f"{index}_bias"] = bias
+        else:
+            raise ValueError(f"Unsupported layer {layer.name} ({kind})")
+
+    np.savez(path, layers=np.array(json.dumps(layers)), **arrays)
+
+
+class NumpyGRUModel:
+    """
+    Pure-NumPy forward pass of an exported GRU model.
+
+    Mirrors Keras' GRU (gate order update, reset, candidate; both ``reset_after``
+    variants) and Dense layers. The input projections of every time step are
+    computed in one matrix product, so only the recurrent part loops over the
+    window. Exposes the ``predict`` signature the scheduler and the backtest use.
+    """
+
+    def __init__(self, layers, arrays, dtype=np.float32):
+        """
+        Initialize the model.
+
+        Args:
+            layers (list): Layer descriptions written by ``export_weights``.
+            arrays (dict): The weight arrays, keyed "<layer index>_<name>".
+            dtype: The compute dtype; float32 matches Keras.
+        """
+        self.dtype = dtype
+        self.layers = []
+        for index, spec in enumerate(layers):
+            weights = {
+                name: np.asarray(arrays[f"{index}_{name}"], dtype=dtype)
+                for name in ("kernel", "recurrent_kernel", "bias")
+                if f"{index}_{name}" in arrays
+            }
+            self.layers.append((spec, weights))
+
+    @classmethod
+    def load(cls, path, dtype=np.float32):
+        """
+        Load a model exported with ``export_weights``.
+
+        Args:
+            path (str): The .npz file.
+            dtype: The compute dtype.
+
+        Returns:
+            NumpyGRUModel: The model.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files if name != "layers"}
+            layers = json.loads(str(data["layers"]))
+        return cls(layers, arrays, dtype)
+
+    def _gru(self, spec, weights, x):
+        units = spec["units"]
+        activation = _activation(spec["activation"])
+        recurrent_activation = _activation(spec["recurrent_activation"])
+        kernel, recurrent_kernel, bias = weights["kernel"], weights["recurrent_kernel"], weights["bias"]
+        if spec["reset_after"]:
+            input_bias, recurrent_bias = bias[0], bias[1]
+        else:
+            input_bias, recurrent_bias = bias, None
+
+        batch, steps, _ = x.shape
+        projected = x @ kernel + input_bias
+        h = np.zeros((batch, units), dtype=self.dtype)
+        outputs = np.empty((batch, steps, units), dtype=self.dtype) if spec["return_sequences"] else None
+
+        for t in range(steps):
+            step = projected[:, t]
+            if spec["reset_after"]:
+                recurrent = h @ recurrent_kernel
+                recurrent += recurrent_bias
+                # Update and reset gates in one call
+                gates = recurrent_activation(step[:, :2 * units] + recurrent[:, :2 * units])
+                z, r = gates[:, :units], gates[:, units:]
+                candidate = activation(step[:, 2 * units:] + r * recurrent[:, 2 * units:])
+            else:
+                gates = recurrent_activation(step[:, :2 * units] + h @ recurrent_kernel[:, :2 * units])
+                z, r = gates[:, :units], gates[:, units:]
+                candidate = activation(step[:, 2 * units:] + (r * h) @ recurrent_kernel[:, 2 * units:])
+            h = candidate + z * (h - candidate)
+            if outputs is not None:
+                outputs[:, t] = h
+        return outputs if outputs is not None else h
+
+    def predict(self, X, batch_size=None, verbose=0):
+        """
+        Run the forward pass.
+
+        Args:
+            X (np.ndarray): Windows of shape (batch, steps, features).
+            batch_size (int): Windows per pass (defaults to all at once).
+            verbose: Ignored; accepted for compatibility with Keras.
+
+        Returns:
+            np.ndarray: The outputs of the last layer, shape (batch, units).
+        """
+        X = np.asarray(X, dtype=self.dtype)
+        if batch_size is not None and len(X) > batch_size:
+            return np.concatenate([self.predict(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+        x = X
+        for spec, weights in self.layers:
+            if spec["type"] == "gru":
+                x = self._gru(spec, weights, x)
+            else:
+                x = _activation(spec["activation"])(x @ weights["kernel"] + weights["bias"])
+        return x
+
+
+def check_parity(keras_model, numpy_model, window_size=14, windows=1024, seed=0):
+    """
+    Compare the NumPy backend with Keras on random scaled windows.
+
+    Args:
+        keras_model: The Keras model.
+        numpy_model (NumpyGRUModel): The exported model.
+        window_size (int): The number of time steps.
+        windows (int): The number of windows to compare.
+        seed (int): The random seed.
+
+    Returns:
+        float: The maximum absolute difference of the outputs.
+    """
+    rng = np.random.default_rng(seed)
+    # Scaled inputs, like the scheduler feeds: each window spans exactly 0 to 1
+    X = rng.random((windows, window_size))
+    X = (X - X.min(axis=1, keepdims=True)) / np.ptp(X, axis=1, keepdims=True)
+    X = X.reshape(windows, window_size, 1)
+    expected = np.asarray(keras_model.predict(X, verbose=0))
+    actual = numpy_model.predict(X)
+    return float(np.max(np.abs(expected - actual)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a Keras GRU model for the NumPy backend.")
+    parser.add_argument("model", help="Keras model file (.keras or .h5)")
+    parser.add_argument("output", help="Output .npz file")
+    parser.add_argument("--check", action="store_true", help="Compare the export with Keras")
+    parser.add_argument("--tolerance", type=float, default=1e-4)
+    parser.add_argument("--window-size", type=int, default=14)
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+
+    keras_model = load_model(args.model)
+    export_weights(keras_model, args.output)
+    print(f"Exported {args.model} to {args.output}")
+
+    if args.check:
+        difference = check_parity(keras_model, NumpyGRUModel.load(args.output), args.window_size)
+        print(f"Maximum difference from Keras: {difference:.3g}")
+        if difference > args.tolerance:
+            raise SystemExit(f"Parity check failed: {difference:.3g} > {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+import math
+from collections import deque
+
+
+class SMA:
+    """
+    Simple moving average with a running sum.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.value = None
+        self._values = deque()
+        self._sum = 0.0
+
+    def update(self, x):
+        self._values.append(x)
+        self._sum += x
+        if len(self._values) > self.period:
+            self._sum -= self._values.popleft()
+        if len(self._values) == self.period:
+            self.value = self._sum / self.period
+        return self.value
+
+
+class EMA:
+    """
+    Exponential moving average, seeded with the SMA of the first ``period`` values like TradingView.
+    """
+
+    def __init__(self, period, alpha=None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value = None
+        self._count = 0
+        self._seed = 0.0
+
+    def update(self, x):
+        if self.value is None:
+            self._count += 1
+            self._seed += x
+            if self._count == self.period:
+                self.value = self._seed / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RMA(EMA):
+    """
+    Wilder's moving average, used by RSI and ATR.
+    """
+
+    def __init__(self, period):
+        super().__init__(period, alpha=1.0 / period)
+
+
+class RollingMinMax:
+    """
+    Minimum and maximum of the last ``period`` values in amortized O(1).
+
+    Keeps two monotonic deques of (index, value); values that can no longer be
+    the extreme of any future window are dropped as new ones arrive.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self._index = 0
+        self._min = deque()
+        self._max = deque()
+
+    def update(self, x):
+        index = self._index
+        self._index += 1
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((index, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((index, x))
+        cutoff = index - self.period
+        if self._min[0][0] <= cutoff:
+            self._min.popleft()
+        if self._max[0][0] <= cutoff:
+            self._max.popleft()
+
+    @property
+    def ready(self):
+        return self._index >= self.period
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+
+class RollingStd:
+    """
+    Population standard deviation of the last ``period`` values.
+
+    Running sums are taken relative to the first value seen, which keeps the
+    sum of squares well conditioned for prices far from zero.
+    """
+
+    def __init__(self, period):
+        self.period = period
+        self.value = None
+        self._values = deque()
+        self._anchor = None
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def update(self, x):
+        if self._anchor is None:
+            self._anchor = x
+        d = x - self._anchor
+        self._values.append(d)
+        self._sum += d
+        self._sum_sq += d * d
+        if len(self._values) > self.period:
+            old = self._values.popleft()
+            self._sum -= old
+            self._sum_sq -= old * old
+        if len(self._values) == self.period:
+            mean = self._sum / self.period
+            self.value = math.sqrt(max(0.0, self._sum_sq / self.period - mean * mean))
+        return self.value
+
+
+class RSI:
+    def __init__(self, period=14):
+        self.value = None
+        self.previous = None
+        self._gain = RMA(period)
+        self._loss = RMA(period)
+        self._last = None
+
+    def update(self, close):
+        if self._last is not None:
+            change = close - self._last
+            gain = self._gain.update(max(change, 0.0))
+            loss = self._loss.update(max(-change, 0.0))
+            if gain is not None:
+                self.previous = self.value
+                self.value = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+        self._last = close
+        return self.value
+
+
+class MACD:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+        self.value = None
+        self.signal = None
+        self.histogram = None
+
+    def update(self, close):
+        fast = self._fast.update(close)
+        slow = self._slow.update(close)
+        if fast is not None and slow is not None:
+            self.value = fast - slow
+            self.signal = self._signal.update(self.value)
+            if self.signal is not None:
+                self.histogram = self.value - self.signal
+        return self.value
+
+
+class ATR:
+    def __init__(self, period=14):
+        self._rma = RMA(period)
+        self._last_close = None
+        self.value = None
+
+    def update(self, high, low, close):
+        if self._last_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self._last_close), abs(low - self._last_close))
+        self._last_close = close
+        self.value = self._rma.update(true_range)
+        return self.value
+
+
+class BollingerBands:
+    def __init__(self, period=20, width=2.0):
+        self.width = width
+        self._sma = SMA(period)
+        self._std = RollingStd(period)
+        self.middle = None
+        self.upper = None
+        self.lower = None
+
+    def update(self, close):
+        self.middle = self._sma.update(close)
+        std = self._std.update(close)
+        if self.middle is not None:
+            self.upper = self.middle + self.width * std
+            self.lower = self.middle - self.width * std
+        return self.middle
+
+
+class Stochastic:
+    def __init__(self, period=14, smooth_k=3, smooth_d=3):
+        self._high = RollingMinMax(period)
+        self._low = RollingMinMax(period)
+        self._k = SMA(smooth_k)
+        self._d = SMA(smooth_d)
+        self.k = None
+        self.d = None
+        self.williams_r = None
+
+    def update(self, high, low, close):
+        self._high.update(high)
+        self._low.update(low)
+        if not self._high.ready:
+            return self.k
+        highest, lowest = self._high.max, self._low.min
+        span = highest - lowest
+        raw_k = 100.0 * (close - lowest) / span if span else 50.0
+        self.williams_r = raw_k - 100.0
+        self.k = self._k.update(raw_k)
+        if self.k is not None:
+            self.d = self._d.update(self.k)
+        return self.k
+
+
+class Momentum:
+    def __init__(self, period=10):
+        self.value = None
+        self.previous = None
+        self._closes = deque(maxlen=period + 1)
+
+    def update(self, close):
+        self._closes.append(close)
+        if len(self._closes) == self._closes.maxlen:
+            self.previous = self.value
+            self.value = close - self._closes[0]
+        return self.value
+
+
+# Moving averages voting in the summary, as on TradingView
+MA_PERIODS = (10, 20, 30, 50, 100, 200)
+
+# Candles needed before every indicator has a value
+WARMUP_CANDLES = max(MA_PERIODS)
+
+# Names of the values exposed as model features, in order
+FEATURE_NAMES = (
+    "ema_10", "ema_20", "ema_50", "sma_20", "sma_50", "rsi", "macd", "macd_signal", "macd_histogram",
+    "atr", "bb_upper", "bb_middle", "bb_lower", "stoch_k", "stoch_d", "williams_r", "momentum",
+    "volume_sma", "relative_volume",
+)
+
+
+def _vote(buy, sell):
+    if buy:
+        return 1
+    if sell:
+        return -1
+    return 0
+
+
+def recommendation(rating):
+    """
+    Map an average rating between -1 and 1 to TradingView's recommendation labels.
+
+    Args:
+        rating (float): The average of +1 (buy), -1 (sell) and 0 (neutral) votes.
+
+    Returns:
+        str: STRONG_SELL, SELL, NEUTRAL, BUY or STRONG_BUY.
+    """
+    if rating < -0.5:
+        return "STRONG_SELL"
+    if rating < -0.1:
+        return "SELL"
+    if rating <= 0.1:
+        return "NEUTRAL"
+    if rating <= 0.5:
+        return "BUY"
+    return "STRONG_BUY"
+
+
+class IndicatorSet:
+    """
+    Technical indicators of one candle stream, updated in O(1) per closed candle.
+
+    Produces the indicator values, a window of them as model features, and a
+    TradingView-style BUY/SELL/NEUTRAL summary computed from the same moving
+    average and oscillator rules.
+    """
+
+    def __init__(self):
+        self.ema = {period: EMA(period) for period in MA_PERIODS}
+        self.sma = {period: SMA(period) for period in MA_PERIODS}
+        self.rsi = RSI(14)
+        self.macd = MACD(12, 26, 9)
+        self.atr = ATR(14)
+        self.bollinger = BollingerBands(20, 2.0)
+        self.stochastic = Stochastic(14, 3, 3)
+        self.momentum = Momentum(10)
+        self.volume_sma = SMA(20)
+        self.close = None
+        self.volume = None
+        self.count = 0
+
+    def update(self, open_, high, low, close, volume):
+        """
+        Feed one closed candle.
+
+        Args:
+            open_ (float): The open.
+            high (float): The high.
+            low (float): The low.
+            close (float): The close.
+            volume (float): The volume.
+        """
+        for average in self.ema.values():
+            average.update(close)
+        for average in self.sma.values():
+            average.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.atr.update(high, low, close)
+        self.bollinger.update(close)
+        self.stochastic.update(high, low, close)
+        self.momentum.update(close)
+        self.volume_sma.update(volume)
+        self.close = close
+        self.volume = volume
+        self.count += 1
+
+    def values(self):
+        """
+        Return the current indicator values.
+
+        Returns:
+            dict: Name to value (None until the indicator has enough candles).
+        """
+        volume_sma = self.volume_sma.value
+        return {
+            **{f"ema_{period}": average.value for period, average in self.ema.items()},
+            **{f"sma_{period}": average.value for period, average in self.sma.items()},
+            "rsi": self.rsi.value,
+            "macd": self.macd.value,
+            "macd_signal": self.macd.signal,
+            "macd_histogram": self.macd.histogram,
+            "atr": self.atr.value,
+            "bb_upper": self.bollinger.upper,
+            "bb_middle": self.bollinger.middle,
+            "bb_lower": self.bollinger.lower,
+            "stoch_k": self.stochastic.k,
+            "stoch_d": self.stochastic.d,
+            "williams_r": self.stochastic.williams_r,
+            "momentum": self.momentum.value,
+            "volume_sma": volume_sma,
+            "relative_volume": self.volume / volume_sma if volume_sma else None,
+        }
+
+    def features(self, names=FEATURE_NAMES):
+        """
+        Return selected indicator values as a feature row.
+
+        Args:
+            names (tuple): The feature names, see ``FEATURE_NAMES``.
+
+        Returns:
+            list: The values in order, NaN where an indicator is not ready yet.
+        """
+        values = self.values()
+        return [math.nan if values[name] is None else values[name] for name in names]
+
+    def summary(self):
+        """
+        Rate the stream like TradingView's technical analysis summary.
+
+        Moving averages vote BUY when the close is above them and SELL when
+        below. Oscillators vote with TradingView's rules: RSI under 30 and
+        rising / over 70 and falling, Stochastic %K and %D under 20 with %K
+        above %D / over 80 with %K below %D, MACD above / below its signal,
+        rising / falling momentum, Williams %R under -80 / over -20.
+
+        Returns:
+            dict: RECOMMENDATION, BUY, SELL and NEUTRAL counts, like
+                ``Analysis.summary`` of tradingview_ta, or None until every indicator is
+                ready, so a partial vote is never presented in its place.
+        """
+        if self.count < WARMUP_CANDLES:
+            return None
+        close = self.close
+        votes = []
+        for average in (*self.ema.values(), *self.sma.values()):
+            if average.value is not None:
+                votes.append(_vote(close > average.value, close < average.value))
+
+        rsi = self.rsi
+        if rsi.value is not None and rsi.previous is not None:
+            votes.append(_vote(rsi.value < 30 and rsi.value > rsi.previous,
+                               rsi.value > 70 and rsi.value < rsi.previous))
+        stochastic = self.stochastic
+        if stochastic.k is not None and stochastic.d is not None:
+            votes.append(_vote(stochastic.k < 20 and stochastic.d < 20 and stochastic.k > stochastic.d,
+                               stochastic.k > 80 and stochastic.d > 80 and stochastic.k < stochastic.d))
+        if self.macd.signal is not None:
+            votes.append(_vote(self.macd.value > self.macd.signal, self.macd.value < self.macd.signal))
+        momentum = self.momentum
+        if momentum.value is not None and momentum.previous is not None:
+            votes.append(_vote(momentum.value > momentum.previous, momentum.value < momentum.previous))
+        if stochastic.williams_r is not None:
+            votes.append(_vote(stochastic.williams_r < -80, stochastic.williams_r > -20))
+
+        if not votes:
+            return None
+        return {
+            "RECOMMENDATION": recommendation(sum(votes) / len(votes)),
+            "BUY": votes.count(1),
+            "SELL": votes.count(-1),
+            "NEUTRAL": votes.count(0),
+        }
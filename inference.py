@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+from metrics import REGISTRY
+from model_registry import ModelRegistry
+from pipeline import LatestWindowQueue
+
+gru_queue_wait = REGISTRY.histogram(
+    "engine_queue_wait_seconds", "Time a window waits before its model starts on it", model="gru"
+)
+gru_model_time = REGISTRY.histogram("engine_model_seconds", "Time spent in one model run", model="gru")
+shadow_model_time = REGISTRY.histogram("engine_model_seconds", "Time spent in one model run", model="gru_shadow")
+
+
+def minmax_scale(windows, mins=None, maxs=None):
+    """
+    Scale every window to the (0, 1) range independently.
+
+    Row-wise equivalent of fitting ``MinMaxScaler(feature_range=(0, 1))`` on each
+    window, including its handling of constant windows (a zero range is treated as 1).
+
+    Args:
+        windows (np.ndarray): Array of shape (batch, window_size).
+        mins (np.ndarray): Optional per-window minimums of shape (batch, 1), e.g. kept
+            by a running min/max; computed from the windows when omitted.
+        maxs (np.ndarray): Per-window maximums, required together with ``mins``.
+
+    Returns:
+        tuple: (scaled windows, per-window minimums, per-window ranges).
+    """
+    if mins is None:
+        mins = windows.min(axis=1, keepdims=True)
+        maxs = windows.max(axis=1, keepdims=True)
+    ranges = maxs - mins
+    ranges[ranges == 0] = 1.0
+    return (windows - mins) / ranges, mins, ranges
+
+
+def minmax_inverse(scaled, mins, ranges):
+    """
+    Undo ``minmax_scale`` for model outputs.
+
+    Args:
+        scaled (np.ndarray): Scaled values of shape (batch, 1).
+        mins (np.ndarray): Per-window minimums returned by ``minmax_scale``.
+        ranges (np.ndarray): Per-window ranges returned by ``minmax_scale``.
+
+    Returns:
+        np.ndarray: Values in price units, shape (batch,).
+    """
+    return (scaled * ranges + mins)[:, 0]
+
+
+class InferenceScheduler:
+    """
+    Collects GRU prediction requests and runs them as a single batch.
+
+    Streams whose windows become ready within ``batch_window`` seconds of the
+    first pending request are stacked into one batch, scaled, passed through the
+    model in one forward pass and the results are scattered back to each
+    request's callback on the scheduler thread, which is the dedicated GRU worker.
+    Requests wait in a ``LatestWindowQueue``, so a stream that closes again before
+    its previous window was predicted only keeps its latest window. When the
+    model is a ``ModelRegistry``, its shadow models run on the same scaled batch
+    after the live forecasts have been delivered, and every forecast is passed to
+    the record callbacks with the name of the model that made it.
+    """
+
+    def __init__(self, model, batch_window=0.05, max_batch_size=256, max_pending=1024):
+        """
+        Initialize the scheduler.
+
+        Args:
+            model: A model with a Keras-style ``predict`` method, or a ``ModelRegistry``.
+            batch_window (float): Seconds to wait for more requests after the first one.
+            max_batch_size (int): The maximum number of windows in one forward pass.
+            max_pending (int): The maximum number of streams waiting for a batch.
+        """
+        self.model = model
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+
+        self.last_batch_size = 0
+        self.last_batch_latency = 0.0
+        self.batches = 0
+        self.predictions = 0
+
+        self._queue = LatestWindowQueue(max_pending)
+        self._thread = None
+
+    @property
+    def dropped(self):
+        return self._queue.dropped
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="InferenceScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def submit(self, key, window, callback, bounds=None, record_callback=None):
+        """
+        Queue a window for the next batch.
+
+        Args:
+            key: An identifier of the request, passed back to the callback.
+            window (np.ndarray): The closing-price window; it is copied, so views are safe.
+            callback (callable): Called as ``callback(key, predicted_price)`` after the batch runs.
+            bounds (tuple): Optional (min, max) of the window, if the caller already tracks them.
+            record_callback (callable): Called as ``record_callback(key, model_name, predicted_price)``
+                for the active model and every shadow model of a ``ModelRegistry``.
+        """
+        self._queue.put(
+            key, (np.array(window, dtype=np.float64), callback, time.perf_counter(), bounds, record_callback)
+        )
+
+    def _run(self):
+        while self._queue.wait():
+            # Give streams closing on the same boundary a chance to join the batch
+            time.sleep(self.batch_window)
+
+            items = self._queue.get_batch(self.max_batch_size)
+            if not items:
+                continue
+            started = time.perf_counter()
+            batch = []
+            bounds = []
+            record_callbacks = []
+            for key, (window, callback, queued, window_bounds, record_callback) in items:
+                gru_queue_wait.observe(started - queued)
+                batch.append((key, window, callback))
+                bounds.append(window_bounds)
+                record_callbacks.append(record_callback)
+            try:
+                self.run_batch(batch, None if None in bounds else bounds, record_callbacks)
+            except Exception as e:
+                logging.error(f"Error in batched GRU inference: {e}")
+
+    def run_batch(self, batch, bounds=None, record_callbacks=None):
+        """
+        Run one forward pass over a list of queued requests.
+
+        Args:
+            batch (list): (key, window, callback) tuples with equally sized windows.
+            bounds (list): Optional (min, max) of every window, in batch order.
+            record_callbacks (list): Optional record callback of every window, in batch order.
+        """
+        started = time.perf_counter()
+
+        windows = np.stack([window for _, window, _ in batch])
+        if bounds is None:
+            scaled, mins, ranges = minmax_scale(windows)
+        else:
+            limits = np.array(bounds, dtype=np.float64)
+            scaled, mins, ranges = minmax_scale(windows, limits[:, :1], limits[:, 1:])
+        X = scaled.reshape(scaled.shape[0], scaled.shape[1], 1)
+        registry = isinstance(self.model, ModelRegistry)
+        # Read once, so the batch is recorded under the model that ran it even if a swap follows
+        name, model = self.model.active if registry else (None, self.model)
+        predicted = model.predict(X, verbose=0)
+        prices = minmax_inverse(np.asarray(predicted).reshape(-1, 1), mins, ranges)
+
+        self.last_batch_latency = time.perf_counter() - started
+        gru_model_time.observe(self.last_batch_latency)
+        self.last_batch_size = len(batch)
+        self.batches += 1
+        self.predictions += len(batch)
+        logging.debug("GRU batch: size=%d, latency=%.1f ms", self.last_batch_size, self.last_batch_latency * 1000)
+
+        for (key, _, callback), price in zip(batch, prices):
+            try:
+                callback(key, float(price))
+            except Exception as e:
+                logging.error(f"Error in GRU prediction callback for {key}: {e}")
+
+        if registry and record_callbacks and any(record_callbacks):
+            self.record(batch, name, prices, record_callbacks)
+            self.run_shadows(batch, X, mins, ranges, record_callbacks, name)
+
+    def record(self, batch, name, prices, record_callbacks):
+        """
+        Pass the forecasts of one model for a batch to the record callbacks.
+        """
+        for (key, _, _), record_callback, price in zip(batch, record_callbacks, prices):
+            if record_callback is None:
+                continue
+            try:
+                record_callback(key, name, float(price))
+            except Exception as e:
+                logging.error(f"Error in record callback of {name} for {key}: {e}")
+
+    def run_shadows(self, batch, X, mins, ranges, record_callbacks, active):
+        """
+        Run the registry's shadow models on a batch the active model has already answered.
+
+        ``active`` is the name of the model that answered; after a promotion during the
+        batch it is a shadow itself and is not run or recorded a second time.
+        """
+        for name, model in self.model.shadows.items():
+            if name == active:
+                continue
+            started = time.perf_counter()
+            try:
+                predicted = model.predict(X, verbose=0)
+            except Exception as e:
+                logging.error(f"Error in shadow GRU model {name}: {e}")
+                continue
+            prices = minmax_inverse(np.asarray(predicted).reshape(-1, 1), mins, ranges)
+            shadow_model_time.observe(time.perf_counter() - started)
+            self.record(batch, name, prices, record_callbacks)
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+
+
+class EngineUnavailable(ConnectionError):
+    """Raised when the engine socket cannot be reached."""
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("op") == "watch":
+                    self.watch()
+                    return
+                response = self.server.handler(request)
+            except Exception as e:
+                logging.error(f"Error handling IPC request: {e}")
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+    def watch(self):
+        # The connection becomes a one-way stream of published events
+        events = self.server.snapshot_server._add_watcher()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                self.wfile.write(event)
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.snapshot_server._remove_watcher(events)
+
+
+def _offer(events, item):
+    # Makes room by discarding the oldest item; returns how many were discarded
+    dropped = 0
+    while True:
+        try:
+            events.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                events.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SnapshotServer:
+    """
+    Serves engine snapshots on a Unix socket from a background thread.
+
+    The protocol is one JSON request and one JSON response per line. A "watch"
+    request instead turns the connection into a stream of the events passed to
+    ``publish``. Only the standard library is used here, so front-ends can
+    import this module without pulling in NumPy or TensorFlow.
+    """
+
+    def __init__(self, path, handler, watch_queue_size=1024):
+        """
+        Initialize the server.
+
+        Args:
+            path (str): The filesystem path of the Unix socket.
+            handler (callable): Called with each request dict; returns a JSON-serializable dict.
+            watch_queue_size (int): Events buffered per watcher before the oldest are dropped.
+        """
+        self.path = path
+        self.handler = handler
+        self.watch_queue_size = watch_queue_size
+        self.dropped_events = 0
+        self._watchers = set()
+        self._watchers_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        # A socket file left behind by a previous run would make bind() fail
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = _ThreadingUnixServer(self.path, _RequestHandler)
+        self._server.handler = self.handler
+        self._server.snapshot_server = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="SnapshotServer", daemon=True)
+        self._thread.start()
+        logging.info(f"Snapshot server listening on {self.path}")
+
+    def publish(self, event):
+        """
+        Send an event to every watching connection without blocking.
+
+        The event is encoded once; a watcher that does not keep up loses its
+        oldest events rather than holding up the caller.
+
+        Args:
+            event (dict): The JSON-serializable event.
+        """
+        with self._watchers_lock:
+            watchers = list(self._watchers)
+        if not watchers:
+            return
+        line = json.dumps(event).encode() + b"\n"
+        for events in watchers:
+            self.dropped_events += _offer(events, line)
+
+    def _add_watcher(self):
+        events = queue.Queue(self.watch_queue_size)
+        with self._watchers_lock:
+            self._watchers.add(events)
+        logging.info(f"Watcher connected ({len(self._watchers)} total)")
+        return events
+
+    def _remove_watcher(self, events):
+        with self._watchers_lock:
+            self._watchers.discard(events)
+        logging.info(f"Watcher disconnected ({len(self._watchers)} total)")
+
+    def stop(self):
+        with self._watchers_lock:
+            watchers = list(self._watchers)
+        for events in watchers:
+            _offer(events, None)
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class EngineClient:
+    """
+    asyncio client for the engine's snapshot server.
+    """
+
+    def __init__(self, path, timeout=2.0):
+        """
+        Initialize the client.
+
+        Args:
+            path (str): The filesystem path of the engine's Unix socket.
+            timeout (float): Seconds to wait for a response.
+        """
+        self.path = path
+        self.timeout = timeout
+
+    async def request(self, op, **params):
+        """
+        Send one request to the engine and wait for its response.
+
+        Args:
+            op (str): The operation, e.g. "predict", "current" or "stats".
+            **params: Operation parameters such as symbol and interval.
+
+        Returns:
+            dict: The decoded response.
+
+        Raises:
+            EngineUnavailable: If the engine is not running or does not answer in time.
+        """
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.path), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise EngineUnavailable(f"Engine is not reachable at {self.path}: {e}")
+
+        try:
+            writer.write(json.dumps({"op": op, **params}).encode() + b"\n")
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise EngineUnavailable(f"Engine did not answer: {e}")
+        finally:
+            writer.close()
+
+        if not line:
+            raise EngineUnavailable("Engine closed the connection")
+        return json.loads(line)
+
+    async def watch(self, retry_delay=1.0, max_retry_delay=30.0):
+        """
+        Stream the events the engine publishes, reconnecting while it is down.
+
+        Args:
+            retry_delay (float): Seconds before the first reconnect attempt.
+            max_retry_delay (float): Upper bound of the doubling reconnect delay.
+
+        Yields:
+            dict: The decoded events.
+        """
+        delay = retry_delay
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logging.warning(f"Engine event stream unavailable, retrying in {delay:.0f} s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_retry_delay)
+                continue
+
+            try:
+                writer.write(json.dumps({"op": "watch"}).encode() + b"\n")
+                await writer.drain()
+                logging.info(f"Watching engine events on {self.path}")
+                delay = retry_delay
+                async for line in reader:
+                    yield json.loads(line)
+            except OSError as e:
+                logging.warning(f"Engine event stream interrupted: {e}")
+            finally:
+                writer.close()
+            await asyncio.sleep(delay)
@@ -0,0 +1,84 @@
+import json
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:  # orjson is optional; the standard decoder gives the same result, only slower
+    loads = json.loads
+
+_TOPIC_PREFIX = '{"topic":"'
+_CONFIRMED = '"confirm":true'
+_TIMESTAMP = '"ts":'
+
+
+def peek_topic(msg):
+    """
+    Read the topic of a Bybit push frame without decoding it.
+
+    Bybit puts "topic" first in every push frame, so it can be sliced out of
+    the raw text.
+
+    Args:
+        msg (str): The raw frame.
+
+    Returns:
+        str: The topic, or None if the frame does not start with one.
+    """
+    if not msg.startswith(_TOPIC_PREFIX):
+        return None
+    end = msg.find('"', len(_TOPIC_PREFIX))
+    if end < 0:
+        return None
+    return msg[len(_TOPIC_PREFIX):end]
+
+
+def peek_timestamp(msg):
+    """
+    Read the exchange timestamp of a push frame without decoding it.
+
+    The frame-level "ts" follows the "data" list, so it is searched from the end.
+
+    Args:
+        msg (str): The raw frame.
+
+    Returns:
+        int: The timestamp in milliseconds, or None if the frame has none.
+    """
+    start = msg.rfind(_TIMESTAMP)
+    if start < 0:
+        return None
+    start += len(_TIMESTAMP)
+    end = msg.find(",", start)
+    if end < 0:
+        end = msg.find("}", start)
+    try:
+        return int(msg[start:end])
+    except ValueError:
+        return None
+
+
+def is_confirmed(msg):
+    """
+    Check whether a kline frame contains a closed candle without decoding it.
+
+    Args:
+        msg (str): The raw frame.
+
+    Returns:
+        bool: True if any candle in the frame has ``confirm: true``.
+    """
+    return _CONFIRMED in msg
+
+
+def parse_klines(msg):
+    """
+    Decode the candles of a kline frame.
+
+    Args:
+        msg (str): The raw frame.
+
+    Returns:
+        list: The kline dicts from the frame's "data" list.
+    """
+    return loads(msg).get("data", [])
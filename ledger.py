@@ -0,0 +1,390 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# One fixed-size record per prediction and one more once it has been scored; scored
+# records carry the actual close and use "timestamp" for the scoring time
+RECORD_DTYPE = np.dtype([
+    ("stream", "S32"),
+    ("model", "S16"),
+    ("timestamp", "<i8"),
+    ("reference_start", "<i8"),
+    ("predicted", "<f8"),
+    ("reference", "<f8"),
+    ("actual", "<f8"),
+])
+
+# Stream keys (kline topics) and model names must fit their fixed-size fields
+MAX_STREAM_LENGTH = RECORD_DTYPE["stream"].itemsize
+MAX_MODEL_LENGTH = RECORD_DTYPE["model"].itemsize
+
+# Rolling accuracy windows reported by /stats
+ROLLING_WINDOWS = {"1h": 3_600_000, "24h": 86_400_000, "7d": 7 * 86_400_000}
+
+# Raw records are kept for the longest rolling window; older ones only count towards "all"
+RETENTION_MS = max(ROLLING_WINDOWS.values())
+
+# Recent closes kept per stream to score predictions recorded after their candle closed
+LATE_SCORING_CANDLES = 64
+
+
+def directional_hit(predicted, reference, actual):
+    """
+    Tell whether predictions got the direction of the move from the reference close right.
+
+    A candle that closes flat has no direction to get right, so it counts as a
+    miss for every prediction, including a flat one; otherwise a flat forecast
+    would score a hit on every unchanged candle of an illiquid stream.
+
+    Args:
+        predicted: The predicted closes (float or np.ndarray).
+        reference: The closes the predictions were made on.
+        actual: The closes the predictions are scored against.
+
+    Returns:
+        bool or np.ndarray: True where the prediction moved the same way as the price.
+    """
+    return (predicted - reference) * (actual - reference) > 0
+
+
+class RollingStats:
+    """
+    Accuracy aggregates over a sliding time window.
+
+    Scored predictions are kept in a deque with running sums, so adding one and
+    reading the aggregates are amortized O(1) regardless of the history size.
+    """
+
+    def __init__(self, span_ms=None):
+        """
+        Initialize the aggregates.
+
+        Args:
+            span_ms (int): The window length in milliseconds (None aggregates everything).
+        """
+        self.span_ms = span_ms
+        self.count = 0
+        self.hits = 0
+        self.error_sum = 0.0
+        self._events = deque()
+
+    def add(self, timestamp, hit, error):
+        self.count += 1
+        self.hits += hit
+        self.error_sum += error
+        if self.span_ms is not None:
+            self._events.append((timestamp, hit, error))
+
+    def restore(self, count, hits, error_sum):
+        # Totals of records that are no longer replayed, only meaningful without a window
+        self.count += count
+        self.hits += hits
+        self.error_sum += error_sum
+
+    def evict(self, now):
+        if self.span_ms is None:
+            return
+        cutoff = now - self.span_ms
+        while self._events and self._events[0][0] < cutoff:
+            _, hit, error = self._events.popleft()
+            self.count -= 1
+            self.hits -= hit
+            self.error_sum -= error
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.count if self.count else None,
+            "mae": self.error_sum / self.count if self.count else None,
+        }
+
+
+class PredictionLedger:
+    """
+    Append-only ledger of predictions with deferred scoring.
+
+    A prediction is recorded with the close of the candle it was made on (the
+    reference) and scored against the close of the candle right after it: it
+    is a hit when it got the direction of the move from the reference to that
+    close right, see ``directional_hit``. Rolling aggregates per stream and
+    model are updated as predictions are scored.
+
+    The file only keeps the records of the longest rolling window. Compaction
+    folds older scored records into the all-time totals of a JSON checkpoint
+    next to the ledger, so startup replays a bounded number of records.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the ledger, compact and replay the existing file.
+
+        Args:
+            path (str): The ledger file.
+        """
+        self.path = path
+        self.checkpoint_path = f"{os.path.splitext(path)[0]}.checkpoint.json"
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._stats = {}
+        # Per stream, reference start -> close of the candle after it, for predictions recorded late
+        self._closes = {}
+        self._file = None
+        self._maintenance_thread = None
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._checkpoint = self._read_checkpoint()
+        self.compact()
+        self._replay()
+        self._file = open(path, "ab")
+
+    def _aggregates(self, stream, model):
+        models = self._stats.setdefault(stream, {})
+        aggregates = models.get(model)
+        if aggregates is None:
+            aggregates = {name: RollingStats(span) for name, span in ROLLING_WINDOWS.items()}
+            aggregates["all"] = RollingStats()
+            models[model] = aggregates
+        return aggregates
+
+    def _replay(self):
+        for stream, models in self._checkpoint["all"].items():
+            for model, totals in models.items():
+                self._aggregates(stream, model)["all"].restore(**totals)
+        size = self._size()
+        if size == 0:
+            return
+        records = np.fromfile(self.path, dtype=RECORD_DTYPE, count=size)
+        scored = set()
+        for record in records[~np.isnan(records["actual"])].tolist():
+            stream, model, timestamp, reference_start, predicted, reference, actual = record
+            stream, model = stream.decode(), model.decode()
+            scored.add((stream, model, reference_start))
+            self._add_score(stream, model, timestamp, predicted, reference, actual)
+        for record in records[np.isnan(records["actual"])].tolist():
+            stream, model, timestamp, reference_start, predicted, reference, _ = record
+            stream, model = stream.decode(), model.decode()
+            if (stream, model, reference_start) not in scored:
+                self._pending.setdefault(stream, []).append((model, timestamp, reference_start, predicted, reference))
+        logging.info(f"Prediction ledger replayed: {len(records)} records, "
+                     f"{sum(len(p) for p in self._pending.values())} pending")
+
+    def _size(self):
+        if not os.path.exists(self.path):
+            return 0
+        return os.path.getsize(self.path) // RECORD_DTYPE.itemsize
+
+    def _read_checkpoint(self):
+        checkpoint = {"cutoff": 0, "all": {}}
+        if not os.path.exists(self.checkpoint_path):
+            return checkpoint
+        try:
+            with open(self.checkpoint_path, "r") as file:
+                checkpoint.update(json.load(file))
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Could not read ledger checkpoint from {self.checkpoint_path}: {e}")
+        return checkpoint
+
+    def _write_checkpoint(self, checkpoint):
+        # Written to a temporary file first so a crash never leaves a truncated checkpoint
+        temporary = f"{self.checkpoint_path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary, self.checkpoint_path)
+
+    def compact(self, now=None):
+        """
+        Fold the scored records older than the retention into the checkpoint and drop them.
+
+        The file is rewritten with the scored records of the retention window
+        and the predictions still waiting for their candle. Records appended
+        while the file is read are copied over before it is replaced. The
+        checkpoint is replaced first and records older than its cutoff are
+        never counted again, so a crash in between loses nothing.
+
+        Args:
+            now (int): The current time (ms, defaults to now).
+        """
+        now = now if now is not None else int(time.time() * 1000)
+        cutoff = max(now - RETENTION_MS, self._checkpoint["cutoff"])
+        with self._lock:
+            size = self._size()
+        if size == 0:
+            return
+        records = np.fromfile(self.path, dtype=RECORD_DTYPE, count=size)
+        scored = ~np.isnan(records["actual"])
+        expired = records["timestamp"] < cutoff
+        if not expired.any():
+            return
+
+        # Records older than the previous cutoff were folded already by a compaction that crashed
+        folded = records[scored & expired & (records["timestamp"] >= self._checkpoint["cutoff"])]
+        totals = {stream: {model: dict(t) for model, t in models.items()}
+                  for stream, models in self._checkpoint["all"].items()}
+        hits = directional_hit(folded["predicted"], folded["reference"], folded["actual"])
+        errors = np.abs(folded["predicted"] - folded["actual"])
+        for (stream, model), hit, error in zip(folded[["stream", "model"]].tolist(), hits.tolist(), errors.tolist()):
+            total = totals.setdefault(stream.decode(), {}).setdefault(
+                model.decode(), {"count": 0, "hits": 0, "error_sum": 0.0}
+            )
+            total["count"] += 1
+            total["hits"] += int(hit)
+            total["error_sum"] += error
+
+        # Pending records are redundant once scored, and never scored once expired
+        keep = scored & ~expired
+        keys = records[["stream", "model", "reference_start"]].tolist()
+        done = {keys[i] for i in np.flatnonzero(keep)}
+        for i in np.flatnonzero(~scored & ~expired):
+            keep[i] = keys[i] not in done
+
+        temporary = f"{self.path}.tmp"
+        with self._lock:
+            appended = np.fromfile(self.path, dtype=RECORD_DTYPE, count=self._size() - size,
+                                   offset=size * RECORD_DTYPE.itemsize)
+            with open(temporary, "wb") as file:
+                file.write(records[keep].tobytes())
+                file.write(appended.tobytes())
+            checkpoint = {"cutoff": cutoff, "all": totals}
+            self._write_checkpoint(checkpoint)
+            os.replace(temporary, self.path)
+            self._checkpoint = checkpoint
+            if self._file is not None and not self._file.closed:
+                self._file.close()
+                self._file = open(self.path, "ab")
+        logging.info(f"Compacted prediction ledger {self.path}: {size} -> {int(keep.sum())} records")
+
+    def start_maintenance(self, every_seconds=3600):
+        """
+        Compact the ledger every ``every_seconds`` in a background thread.
+
+        Args:
+            every_seconds (float): Seconds between compactions.
+        """
+        def run():
+            while not self._stop.wait(every_seconds):
+                try:
+                    self.compact()
+                except Exception as e:
+                    logging.error(f"Error compacting the prediction ledger: {e}")
+
+        self._maintenance_thread = threading.Thread(target=run, name="LedgerMaintenance", daemon=True)
+        self._maintenance_thread.start()
+
+    def _add_score(self, stream, model, timestamp, predicted, reference, actual):
+        hit = int(directional_hit(predicted, reference, actual))
+        error = abs(predicted - actual)
+        for aggregate in self._aggregates(stream, model).values():
+            aggregate.add(timestamp, hit, error)
+        return hit
+
+    def _write(self, stream, model, timestamp, reference_start, predicted, reference, actual):
+        record = np.array(
+            [(stream.encode(), model.encode(), timestamp, reference_start, predicted, reference, actual)],
+            dtype=RECORD_DTYPE,
+        )
+        self._file.write(record.tobytes())
+        self._file.flush()
+
+    def record(self, stream, model, reference_start, reference, predicted, timestamp=None):
+        """
+        Record a new prediction.
+
+        Args:
+            stream (str): The stream key (kline topic).
+            model (str): The model name, e.g. "gru_model_v3" or "arima".
+            reference_start (int): The start of the candle the prediction was made on (ms).
+            reference (float): The close of that candle.
+            predicted (float): The predicted next close.
+            timestamp (int): When the prediction was made (ms, defaults to now).
+
+        Raises:
+            ValueError: If the stream key or the model name does not fit a record.
+        """
+        # numpy would silently truncate them, and the replayed keys would no longer match
+        if len(stream.encode()) > MAX_STREAM_LENGTH:
+            raise ValueError(f"Stream key {stream} is longer than {MAX_STREAM_LENGTH} bytes")
+        if len(model.encode()) > MAX_MODEL_LENGTH:
+            raise ValueError(f"Model name {model} is longer than {MAX_MODEL_LENGTH} bytes")
+        timestamp = timestamp if timestamp is not None else int(time.time() * 1000)
+        entry = (model, timestamp, int(reference_start), float(predicted), float(reference))
+        with self._lock:
+            self._write(stream, *entry, np.nan)
+            # The candle it is scored against may have closed already, e.g. after a slow ARIMA fit
+            close = self._closes.get(stream, {}).get(entry[2])
+            if close is None:
+                self._pending.setdefault(stream, []).append(entry)
+            else:
+                self._score_entry(stream, entry, close, timestamp)
+
+    def score(self, stream, reference_start, close, timestamp=None):
+        """
+        Score the pending predictions made on a candle against the close of the next one.
+
+        Pending predictions made on an earlier candle can no longer be scored,
+        as the candle after their reference was never seen (e.g. it was lost in
+        a gap that could not be repaired), and are dropped.
+
+        Args:
+            stream (str): The stream key.
+            reference_start (int): The start of the candle before the one that just closed (ms).
+            close (float): The closing price of the candle that just closed.
+            timestamp (int): The scoring time (ms, defaults to now).
+
+        Returns:
+            dict: Model name to 1 (hit) or 0 (miss) for the predictions scored.
+        """
+        now = timestamp if timestamp is not None else int(time.time() * 1000)
+        reference_start = int(reference_start)
+        close = float(close)
+        results = {}
+        with self._lock:
+            closes = self._closes.setdefault(stream, {})
+            closes[reference_start] = close
+            while len(closes) > LATE_SCORING_CANDLES:
+                del closes[next(iter(closes))]
+
+            remaining = []
+            for entry in self._pending.get(stream, []):
+                if entry[2] == reference_start:
+                    results[entry[0]] = self._score_entry(stream, entry, close, now)
+                elif entry[2] > reference_start:
+                    remaining.append(entry)
+            self._pending[stream] = remaining
+        return results
+
+    def _score_entry(self, stream, entry, close, now):
+        # Called with the lock held
+        model, _, reference_start, predicted, reference = entry
+        self._write(stream, model, now, reference_start, predicted, reference, close)
+        return self._add_score(stream, model, now, predicted, reference, close)
+
+    def stats(self, stream, now=None):
+        """
+        Return the accuracy aggregates of every model of a stream.
+
+        Args:
+            stream (str): The stream key.
+            now (int): The current time (ms, defaults to now).
+
+        Returns:
+            dict: Model name to {window name: {count, hits, hit_rate, mae}}.
+        """
+        now = now if now is not None else int(time.time() * 1000)
+        result = {}
+        with self._lock:
+            for model, aggregates in self._stats.get(stream, {}).items():
+                for aggregate in aggregates.values():
+                    aggregate.evict(now)
+                result[model] = {name: aggregate.summary() for name, aggregate in aggregates.items()}
+        return result
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._file.close()
@@ -1,27 +1,145 @@
+import atexit
+import json
 import logging
+import multiprocessing
 import os
+import queue
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener = None
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """
+    File handler that rotates when the file reaches ``maxBytes`` or every ``rotate_seconds``.
+
+    Backups are numbered like RotatingFileHandler's (app.log.1, app.log.2, ...),
+    so a size rollover and a time rollover never collide.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=0, rotate_seconds=None, encoding="utf-8"):
+        """
+        Initialize the handler.
+
+        Args:
+            filename (str): The log file.
+            max_bytes (int): Rotate when the file would grow past this size (0 disables it).
+            backup_count (int): The number of rotated files to keep.
+            rotate_seconds (float): Rotate at this interval (None disables it).
+            encoding (str): The file encoding.
+        """
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.rotate_seconds = rotate_seconds
+        self.rollover_at = time.time() + rotate_seconds if rotate_seconds else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rotate_seconds:
+            self.rollover_at = time.time() + self.rotate_seconds
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # The queue stays in-process, so the record is passed as is and the message
+    # is formatted on the listener thread instead of the logging one
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(log_file="app.log", config=None):
+    """
+    Route the root logger through a queue to a background listener thread.
+
+    Logging calls only enqueue the record; formatting, the rotating file write
+    and the console output happen on the listener thread. Each process should
+    pass its own ``log_file``, since rotation is not safe across processes.
+
+    Args:
+        log_file (str): The file name inside the log directory.
+        config (Config): Optional configuration with the ``log_*`` settings.
+
+    Returns:
+        logging.Logger: The root logger.
+    """
+    global _listener
 
-def setup_logging(log_file="app.log"):
-    # Создаем папку logs, если она не существует
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    
-    # Полный путь к файлу логов
-    log_path = os.path.join('logs', log_file)
-    
     logger = logging.getLogger()
-    
+
     # Проверяем наличие обработчиков, чтобы не добавлять их несколько раз
-    if not logger.handlers:
-        file_handler = logging.FileHandler(log_path)
-        stream_handler = logging.StreamHandler()
-        
-        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-        file_handler.setFormatter(formatter)
-        stream_handler.setFormatter(formatter)
-        
-        logger.setLevel(logging.INFO)
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
-    
+    if logger.handlers:
+        return logger
+
+    def option(key, default):
+        return config.get(key, default) if config is not None else default
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [stream_handler]
+
+    # Spawned worker processes re-import the entry module; only the parent owns the
+    # file, since rotating one file from several processes is not safe
+    if multiprocessing.parent_process() is None:
+        log_dir = option("log_dir", "logs")
+        os.makedirs(log_dir, exist_ok=True)
+
+        file_handler = SizeAndTimeRotatingFileHandler(
+            os.path.join(log_dir, log_file),
+            max_bytes=option("log_max_bytes", 10 * 1024 * 1024),
+            backup_count=option("log_backup_count", 10),
+            rotate_seconds=option("log_rotate_hours", 24) * 3600 or None,
+        )
+        if option("log_json", False):
+            file_handler.setFormatter(JsonFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(file_handler)
+
+    logger.setLevel(option("log_level", "INFO").upper())
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(_DeferredQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # Flush the queue on interpreter exit so the last records are not lost
+    atexit.register(stop_logging)
+
     return logger
+
+
+def stop_logging():
+    """
+    Stop the listener thread after it has written every queued record.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
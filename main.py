@@ -1,41 +1,190 @@
+import asyncio
 import logging
-import subprocess
-import threading
+import os
+import signal
+import sys
+import time
 
 from config import Config
+from ipc import EngineClient, EngineUnavailable
 from logging_config import setup_logging
+from sharding import assign_shards, shard_path
 
 # Load configuration
 config = Config()
 
 # Set up logging
-setup_logging("main.log")
+setup_logging("main.log", config)
 
-def run_script(script_path, script_name):
-    try:
-        # Run the script as a separate process
-        subprocess.run(["python", script_path], check=True)
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Error running {script_name}: {e}")
-    except Exception as e:
-        logging.error(f"Error starting {script_name}: {e}")
+# Supervision settings
+heartbeat_interval = config.get("heartbeat_interval", 5.0)
+heartbeat_timeout = config.get("heartbeat_timeout", 2.0)
+heartbeat_failures = config.get("heartbeat_failures", 3)
+# Engines answer pings from a separate thread, so they also report whether their event loop
+# and frame handler still make progress; a heartbeat fails when either is stuck this long
+heartbeat_stale_after = config.get("heartbeat_stale_after", 60.0)
+# Engines answer heartbeats only once their model is loaded and the history replayed
+startup_grace = config.get("heartbeat_startup_grace", 120.0)
+restart_backoff = config.get("restart_backoff_initial", 1.0)
+restart_backoff_max = config.get("restart_backoff_max", 60.0)
+# A worker that ran this long before failing restarts with the initial backoff again
+stable_after = config.get("restart_stable_after", 300.0)
+drain_timeout = config.get("drain_timeout", 30.0)
 
-def run_telegram_bot():
-    run_script(config.tg_bot_path, "tg_bot.py")
 
-def run_websocket():
-    run_script(config.websocket_path, "websocketBybit.py")
+class Worker:
+    """
+    A supervised child process.
+
+    The process is restarted with exponential backoff when it exits, or when
+    it has a socket and misses ``heartbeat_failures`` IPC pings in a row; a
+    ping reporting a stuck event loop or frame handler counts as missed. On
+    shutdown it gets SIGTERM and ``drain_timeout`` seconds to finish its work
+    before it is killed.
+    """
+
+    def __init__(self, name, script_path, env=None, socket_path=None):
+        """
+        Initialize the worker.
+
+        Args:
+            name (str): The name used in log messages.
+            script_path (str): The script to run with this interpreter.
+            env (dict): Extra environment variables of the process.
+            socket_path (str): The engine socket answering heartbeat pings (None for no heartbeat).
+        """
+        self.name = name
+        self.command = [sys.executable, script_path]
+        self.env = {**os.environ, **(env or {})}
+        self.client = EngineClient(socket_path, timeout=heartbeat_timeout) if socket_path else None
+        self.process = None
+        self.started = None
+        self.restarts = 0
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(*self.command, env=self.env)
+        self.started = time.monotonic()
+        logging.info(f"Started {self.name} (pid {self.process.pid})")
+
+    async def stop(self):
+        """
+        Ask the process to drain and exit, killing it after ``drain_timeout``.
+        """
+        if self.process is None or self.process.returncode is not None:
+            return
+        logging.info(f"Stopping {self.name} (pid {self.process.pid})")
+        self.process.terminate()
+        try:
+            await asyncio.wait_for(self.process.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{self.name} did not stop within {drain_timeout} s, killing it")
+            self.process.kill()
+            await self.process.wait()
+
+    async def heartbeat(self):
+        try:
+            response = await self.client.request("ping")
+        except EngineUnavailable as e:
+            logging.warning(f"Heartbeat of {self.name} failed: {e}")
+            return False
+        if not response.get("ok"):
+            return False
+        loop_age = response.get("loop_age", 0.0)
+        handler_age = response.get("handler_age", 0.0)
+        if max(loop_age, handler_age) > heartbeat_stale_after:
+            logging.warning(f"{self.name} is stuck: event loop stalled for {loop_age:.0f} s, "
+                            f"frame handler busy for {handler_age:.0f} s")
+            return False
+        return True
+
+    async def watch(self, stopping):
+        """
+        Wait until the process exits, stops answering heartbeats or shutdown starts.
+
+        Args:
+            stopping (asyncio.Event): Set on shutdown.
+
+        Returns:
+            str: Why the wait ended, or None on shutdown.
+        """
+        exited = asyncio.ensure_future(self.process.wait())
+        stop = asyncio.ensure_future(stopping.wait())
+        missed = 0
+        try:
+            while True:
+                await asyncio.wait((exited, stop), timeout=heartbeat_interval, return_when=asyncio.FIRST_COMPLETED)
+                if stop.done():
+                    return None
+                if exited.done():
+                    return f"exited with code {self.process.returncode}"
+                if self.client is None or time.monotonic() - self.started < startup_grace:
+                    continue
+                missed = 0 if await self.heartbeat() else missed + 1
+                if missed >= heartbeat_failures:
+                    return f"missed {missed} heartbeats"
+        finally:
+            stop.cancel()
+
+    async def supervise(self, stopping):
+        """
+        Run the process until shutdown, restarting it when it fails.
+
+        Args:
+            stopping (asyncio.Event): Set on shutdown.
+        """
+        backoff = restart_backoff
+        while not stopping.is_set():
+            await self.start()
+            reason = await self.watch(stopping)
+            if reason is None:
+                break
+            await self.stop()
+
+            if time.monotonic() - self.started >= stable_after:
+                backoff = restart_backoff
+            self.restarts += 1
+            logging.error(f"{self.name} {reason}, restarting in {backoff:.0f} s (restart {self.restarts})")
+            try:
+                await asyncio.wait_for(stopping.wait(), backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, restart_backoff_max)
+        await self.stop()
+
+
+def create_workers():
+    """
+    Create one engine worker per shard owning symbols, and the Telegram bot.
+
+    Returns:
+        list: The workers.
+    """
+    shards = config.get("engine_shards", 1)
+    workers = []
+    for shard, symbols in assign_shards(config.symbols, shards).items():
+        name = f"engine-{shard}" if shards > 1 else "engine"
+        logging.info(f"{name} streams {', '.join(symbols)}")
+        workers.append(Worker(
+            name,
+            config.websocket_path,
+            env={"ENGINE_SHARD": str(shard)},
+            socket_path=shard_path(config.ipc_socket_path, shard, shards),
+        ))
+    workers.append(Worker("bot", config.tg_bot_path))
+    return workers
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+
+    # Engines and the bot run as separate processes, each restarted on failure
+    workers = create_workers()
+    await asyncio.gather(*(worker.supervise(stopping) for worker in workers))
+    logging.info("All workers stopped")
+
 
 if __name__ == "__main__":
-    # Start the Telegram bot and WebSocket connection in separate threads
-    threads = []
-    threads.append(threading.Thread(target=run_telegram_bot, name="TelegramBotThread"))
-    threads.append(threading.Thread(target=run_websocket, name="WebSocketThread"))
-
-    # Start the threads
-    for thread in threads:
-        thread.start()
-
-    # Wait for all threads to complete
-    for thread in threads:
-        thread.join()
+    asyncio.run(main())
@@ -0,0 +1,358 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bucket upper bounds for sub-millisecond work such as decoding a frame
+FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+
+class Counter:
+    """
+    Monotonically increasing counter.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class CounterFunc:
+    """
+    Counter whose value is read from a callable when metrics are collected.
+
+    Lets components that already count something (e.g. dropped windows) be
+    exported without touching their hot paths.
+    """
+
+    def __init__(self, func):
+        self._func = func
+
+    @property
+    def value(self):
+        return self._func()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with percentile estimates.
+
+    Observations only increment a bucket counter, so recording is O(log buckets)
+    and memory does not grow with the number of samples. Percentiles are
+    interpolated linearly inside the bucket that contains them.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            buckets (tuple): Sorted bucket upper bounds.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def percentile(self, q):
+        """
+        Estimate a percentile of the observed values.
+
+        Args:
+            q (float): The quantile between 0 and 1.
+
+        Returns:
+            float: The estimate, or None if nothing was observed. Values above the
+                last bucket are reported as the last bucket bound.
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = q * self.count
+            cumulative = 0
+            for i, count in enumerate(self.counts):
+                if count and cumulative + count >= rank:
+                    if i == len(self.buckets):
+                        return self.buckets[-1]
+                    lower = self.buckets[i - 1] if i > 0 else 0.0
+                    return lower + (self.buckets[i] - lower) * (rank - cumulative) / count
+                cumulative += count
+            return self.buckets[-1]
+
+    def snapshot(self):
+        """
+        Return a consistent copy of the bucket counts, sum and count.
+
+        Returns:
+            tuple: (per-bucket counts including the overflow bucket, sum, count).
+        """
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Named metric families with labels, rendered in the Prometheus text format.
+
+    Metrics are created once (usually at import time) and then updated
+    directly, so recording a value never touches the registry.
+    """
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _child(self, name, kind, help_text, labels, factory):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = {"kind": kind, "help": help_text, "children": {}}
+            elif family["kind"] != kind:
+                raise ValueError(f"Metric {name} is already registered as a {family['kind']}")
+            child = family["children"].get(key)
+            if child is None:
+                child = family["children"][key] = factory()
+            return child
+
+    def counter(self, name, help_text, **labels):
+        """
+        Get or create a counter.
+
+        Args:
+            name (str): The metric name, conventionally ending in ``_total``.
+            help_text (str): The HELP line of the family.
+            **labels: Label values of this child.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self._child(name, "counter", help_text, labels, Counter)
+
+    def counter_func(self, name, help_text, func, **labels):
+        """
+        Register a counter whose value is read from ``func`` at collection time.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): The HELP line of the family.
+            func (callable): Returns the current value.
+            **labels: Label values of this child.
+
+        Returns:
+            CounterFunc: The counter.
+        """
+        child = self._child(name, "counter", help_text, labels, lambda: CounterFunc(func))
+        # Re-registering (e.g. after a component was recreated) points the child at the new source
+        child._func = func
+        return child
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Get or create a histogram.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): The HELP line of the family.
+            buckets (tuple): Sorted bucket upper bounds.
+            **labels: Label values of this child.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self._child(name, "histogram", help_text, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        with self._lock:
+            families = [(name, family["kind"], family["help"], list(family["children"].items()))
+                        for name, family in sorted(self._families.items())]
+
+        lines = []
+        for name, kind, help_text, children in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in children:
+                if kind == "histogram":
+                    counts, total, count = metric.snapshot()
+                    cumulative = 0
+                    for bound, bucket_count in zip(metric.buckets + (float("inf"),), counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+                else:
+                    try:
+                        value = metric.value
+                    except Exception as e:
+                        logging.error(f"Error collecting metric {name}: {e}")
+                        continue
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served by MetricsServer
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """
+    Serves a registry on ``/metrics`` from a background HTTP thread.
+    """
+
+    def __init__(self, registry=REGISTRY, host="127.0.0.1", port=9101):
+        """
+        Initialize the server.
+
+        Args:
+            registry (MetricsRegistry): The metrics to serve.
+            host (str): The interface to bind; keep it local unless a scraper needs more.
+            port (int): The TCP port.
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes would otherwise flood the log every few seconds
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+        self._thread.start()
+        logging.info(f"Metrics server listening on http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class LatencyTracker:
+    """
+    A set of named latency histograms, e.g. one per bot command.
+
+    With a registry, every histogram is also exported as a child of the
+    ``metric`` family, labelled with its name.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, registry=None, metric=None, help_text="", label="name"):
+        """
+        Initialize the tracker.
+
+        Args:
+            buckets (tuple): Sorted bucket upper bounds.
+            registry (MetricsRegistry): Optional registry to export the histograms to.
+            metric (str): The family name in the registry.
+            help_text (str): The HELP line of the family.
+            label (str): The label holding the histogram name.
+        """
+        self.buckets = buckets
+        self.registry = registry
+        self.metric = metric
+        self.help_text = help_text
+        self.label = label
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                if self.registry is not None:
+                    histogram = self.registry.histogram(
+                        self.metric, self.help_text, self.buckets, **{self.label: name}
+                    )
+                else:
+                    histogram = Histogram(self.buckets)
+                self._histograms[name] = histogram
+            return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    @contextmanager
+    def time(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        """
+        Summarize every histogram.
+
+        Args:
+            quantiles (tuple): The quantiles to report.
+
+        Returns:
+            dict: Name to {"count": n, "p50": seconds, ...}.
+        """
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {
+            name: {
+                "count": histogram.count,
+                **{f"p{round(q * 100)}": histogram.percentile(q) for q in quantiles},
+            }
+            for name, histogram in sorted(histograms.items())
+        }
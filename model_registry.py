@@ -0,0 +1,298 @@
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from gru_numpy import NumpyGRUModel
+from ledger import RECORD_DTYPE
+
+# Model files the registry can load, in order of preference, by GRU backend; the NumPy
+# backend only lists exported weights so it never imports TensorFlow
+MODEL_EXTENSIONS = {
+    "keras": (".keras", ".h5", ".npz"),
+    "numpy": (".npz",),
+}
+
+# Forecasts are recorded under the model name, which must fit the ledger
+MAX_NAME_LENGTH = RECORD_DTYPE["model"].itemsize
+
+
+def load_model_file(path):
+    """
+    Load a GRU model from a Keras model file or exported .npz weights.
+
+    Args:
+        path (str): The model file.
+
+    Returns:
+        A model with a Keras-style ``predict`` method.
+    """
+    if path.endswith(".npz"):
+        return NumpyGRUModel.load(path)
+    # Imported here so that ARIMA workers and the NumPy backend never load TensorFlow
+    from tensorflow.keras.models import load_model
+
+    return load_model(path)
+
+
+def discover_models(model_dir, backend="keras"):
+    """
+    List the model files of a directory by name.
+
+    Args:
+        model_dir (str): The directory to scan.
+        backend (str): "numpy" lists exported .npz weights only, "keras" also lists
+            Keras model files and prefers them when a name exists in several formats.
+
+    Returns:
+        dict: Model name (file name without extension) to path.
+    """
+    extensions = MODEL_EXTENSIONS[backend]
+    found = {}
+    try:
+        files = sorted(os.listdir(model_dir))
+    except FileNotFoundError:
+        return found
+    for extension in reversed(extensions):
+        for file_name in files:
+            name, ext = os.path.splitext(file_name)
+            if ext == extension:
+                found[name] = os.path.join(model_dir, file_name)
+    return found
+
+
+def model_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+class ModelRegistry:
+    """
+    GRU models available to the inference scheduler, loaded and swapped at runtime.
+
+    One model is active and answers for the streams; any number of shadow
+    models run on the same batches. Every model's forecasts are recorded under
+    its own name, so a candidate can be compared with the active model before
+    it is promoted and keeps its history across promotions.
+    Models are loaded and warmed up with a dummy batch on a background thread.
+    The active model and the shadow set are swapped by replacing a single
+    attribute, so the scheduler never pauses and never sees a half-loaded model.
+    """
+
+    def __init__(self, models, window_size, state_path=None, warmup_batch=32, loader=load_model_file):
+        """
+        Initialize the registry.
+
+        Args:
+            models (dict): Model name to file, see ``discover_models``.
+            window_size (int): The number of time steps of the warm-up batch.
+            state_path (str): JSON file remembering the active and shadow models across restarts.
+            warmup_batch (int): Windows in the warm-up batch.
+            loader (callable): Loads a model from a file.
+        """
+        self.models = {}
+        for name, path in models.items():
+            if len(name.encode()) > MAX_NAME_LENGTH:
+                logging.warning(f"Ignoring model {path}: names are limited to {MAX_NAME_LENGTH} bytes")
+                continue
+            self.models[name] = path
+        self.window_size = window_size
+        self.state_path = state_path
+        self.warmup_batch = warmup_batch
+        self.loader = loader
+        self.active = (None, None)
+        self.shadows = {}
+        self.loading = set()
+        # Models promoted while loading, activated instead of shadowing once warm
+        self._activate_on_load = set()
+        # Shadow loads unloaded before they finished, dropped once warm
+        self._cancelled = set()
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def predict(self, X, batch_size=None, verbose=0):
+        """
+        Run the active model; the scheduler calls this like a Keras model's ``predict``.
+        """
+        _, model = self.active
+        return model.predict(X, batch_size=batch_size, verbose=verbose)
+
+    @property
+    def active_name(self):
+        return self.active[0]
+
+    def start(self, default):
+        """
+        Load the active model and start loading the shadow models.
+
+        The active model is the one saved by the last promotion, if its file
+        still exists, otherwise ``default``. It is loaded before this returns
+        so the scheduler always has a model.
+
+        Args:
+            default (str): The name of the model to activate without saved state.
+        """
+        state = self._read_state()
+        active = state.get("active") if state.get("active") in self.models else default
+        self.active = (active, self._load_and_warm(active))
+        logging.info(f"Active GRU model: {active}")
+        for name in state.get("shadows", []):
+            if name in self.models and name != active:
+                self.load(name)
+
+    def load(self, name):
+        """
+        Load a model in the background and run it as a shadow once warm.
+
+        Args:
+            name (str): The model name.
+
+        Raises:
+            KeyError: If there is no model file with that name.
+        """
+        self._check(name)
+        with self._lock:
+            if name != self.active_name:
+                self._start_loading(name)
+
+    def promote(self, name):
+        """
+        Make a model active; the previously active model keeps running as a shadow.
+
+        A model that is already shadowing is swapped in at once, any other is
+        loaded and warmed up first, including one that is already loading as a
+        shadow. Promoting the active model does nothing.
+
+        Args:
+            name (str): The model name.
+
+        Raises:
+            KeyError: If there is no model file with that name.
+        """
+        self._check(name)
+        with self._lock:
+            if name == self.active_name:
+                return
+            model = self.shadows.get(name)
+            if model is not None:
+                self._activate(name, model)
+                return
+            self._activate_on_load.add(name)
+            self._start_loading(name)
+
+    def unload(self, name):
+        """
+        Stop running a shadow model, or cancel loading one.
+
+        A model loading to be promoted is not affected.
+
+        Args:
+            name (str): The model name.
+
+        Returns:
+            bool: False if the model was neither shadowing nor loading as a shadow.
+        """
+        with self._lock:
+            if name in self.loading and name not in self._activate_on_load:
+                self._cancelled.add(name)
+                logging.info(f"Loading shadow GRU model {name} cancelled")
+                return True
+            if name not in self.shadows:
+                return False
+            self.shadows = {other: model for other, model in self.shadows.items() if other != name}
+            self._write_state()
+        logging.info(f"Shadow GRU model {name} unloaded")
+        return True
+
+    def status(self):
+        """
+        Describe the registry.
+
+        Returns:
+            dict: active name, shadow names, names still loading, load errors and available names.
+        """
+        return {
+            "active": self.active_name,
+            "shadows": sorted(self.shadows),
+            "loading": sorted(self.loading - self._cancelled),
+            "errors": dict(self.errors),
+            "available": sorted(self.models),
+        }
+
+    def _check(self, name):
+        if name not in self.models:
+            raise KeyError(f"Unknown model: {name}")
+
+    def _start_loading(self, name):
+        # Called with the lock held; a model already loading is picked up by its loader thread
+        self._cancelled.discard(name)
+        if name in self.loading:
+            return
+        self.loading.add(name)
+        self.errors.pop(name, None)
+        threading.Thread(target=self._load_in_background, args=(name,), name=f"ModelLoader-{name}",
+                         daemon=True).start()
+
+    def _load_and_warm(self, name):
+        model = self.loader(self.models[name])
+        # The first call traces the graph (Keras) or allocates buffers; do it before live batches
+        model.predict(np.random.default_rng(0).random((self.warmup_batch, self.window_size, 1)), verbose=0)
+        return model
+
+    def _load_in_background(self, name):
+        try:
+            model = self._load_and_warm(name)
+        except Exception as e:
+            logging.error(f"Loading GRU model {name} failed: {e}")
+            with self._lock:
+                self.errors[name] = str(e)
+                self.loading.discard(name)
+                self._activate_on_load.discard(name)
+                self._cancelled.discard(name)
+            return
+
+        with self._lock:
+            self.loading.discard(name)
+            if name in self._cancelled:
+                self._cancelled.discard(name)
+            elif name in self._activate_on_load:
+                self._activate_on_load.discard(name)
+                self._activate(name, model)
+            elif name != self.active_name:
+                self.shadows = {**self.shadows, name: model}
+                self._write_state()
+                logging.info(f"Shadow GRU model {name} loaded")
+
+    def _activate(self, name, model):
+        # Called with the lock held
+        previous_name, previous_model = self.active
+        shadows = {other: shadow for other, shadow in self.shadows.items() if other != name}
+        if previous_name is not None and previous_name != name:
+            shadows[previous_name] = previous_model
+        self.active = (name, model)
+        self.shadows = shadows
+        self._write_state()
+        logging.info(f"Active GRU model: {name} (was {previous_name})")
+
+    def _read_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Could not read model registry state from {self.state_path}: {e}")
+            return {}
+
+    def _write_state(self):
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Engine shards share the file, so each writes its own temporary file
+        temporary = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"active": self.active_name, "shadows": sorted(self.shadows)}, file)
+        os.replace(temporary, self.state_path)
@@ -0,0 +1,221 @@
+import logging
+import multiprocessing
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from arima_model import predict_in_worker
+from metrics import REGISTRY
+
+arima_queue_wait = REGISTRY.histogram(
+    "engine_queue_wait_seconds", "Time a window waits before its model starts on it", model="arima"
+)
+arima_model_time = REGISTRY.histogram("engine_model_seconds", "Time spent in one model run", model="arima")
+
+
+def _timed_predict(key, history, sequence, mode, options):
+    # Runs in the worker; wall-clock start so the parent can compute the queue wait
+    started = time.time()
+    forecast = predict_in_worker(key, history, sequence, mode, options)
+    return forecast, started, time.time() - started
+
+
+class LatestWindowQueue:
+    """
+    Bounded queue between ingestion and prediction that keeps only the newest item per key.
+
+    Putting an item for a key that is still pending replaces the older item, and
+    putting a new key into a full queue evicts the oldest pending key. Both cases
+    are counted in ``dropped``, so producers never block when workers fall behind.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        Initialize the queue.
+
+        Args:
+            maxsize (int): The maximum number of pending keys.
+        """
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = OrderedDict()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, key, item):
+        """
+        Queue an item, replacing any pending item with the same key.
+
+        Args:
+            key: The stream key.
+            item: The payload to queue.
+        """
+        with self._condition:
+            if key in self._items:
+                del self._items[key]
+                self.dropped += 1
+            elif len(self._items) >= self.maxsize:
+                dropped_key, _ = self._items.popitem(last=False)
+                self.dropped += 1
+                logging.warning(f"Prediction queue full, dropped pending window of {dropped_key}")
+            self._items[key] = item
+            self._condition.notify()
+
+    def wait(self):
+        """
+        Block until an item is pending or the queue is closed.
+
+        Returns:
+            bool: False once the queue has been closed and the items pending at that point taken.
+        """
+        with self._condition:
+            while not self._items and not self._closed:
+                self._condition.wait()
+            return bool(self._items) or not self._closed
+
+    def get_batch(self, max_items):
+        """
+        Remove and return up to ``max_items`` pending items, oldest first.
+
+        Args:
+            max_items (int): The maximum number of items to return.
+
+        Returns:
+            list: (key, item) tuples.
+        """
+        with self._condition:
+            batch = []
+            while self._items and len(batch) < max_items:
+                batch.append(self._items.popitem(last=False))
+            return batch
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class ArimaPool:
+    """
+    Runs ARIMA forecasts in worker processes, off the ingestion thread.
+
+    Every stream is pinned to one single-process executor by a hash of its key,
+    so the incremental ARIMA state for that stream stays inside one worker.
+    At most one fit per stream is in flight; while it runs only the latest
+    window of that stream is kept and older pending windows are dropped.
+    """
+
+    def __init__(self, workers=2, mode="incremental", options=None):
+        """
+        Initialize the pool.
+
+        Args:
+            workers (int): The number of worker processes.
+            mode (str): "incremental" or "full", see ``arima_model.predict_in_worker``.
+            options (dict): Keyword arguments for ``IncrementalArima``.
+        """
+        self.mode = mode
+        self.options = options or {}
+        self.dropped = 0
+        # Spawn keeps the workers free of the parent's threads and TensorFlow state
+        self._context = multiprocessing.get_context("spawn")
+        self._executors = [self._new_executor() for _ in range(max(1, workers))]
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._pending = {}
+        self._closed = False
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=1, mp_context=self._context)
+
+    def _shard(self, key):
+        return zlib.crc32(key.encode()) % len(self._executors)
+
+    def submit(self, key, history, sequence, callback):
+        """
+        Schedule a forecast for a stream.
+
+        Args:
+            key (str): The stream key.
+            history (np.ndarray): A copy of the closing-price window.
+            sequence (int): The number of candles the stream has closed so far.
+            callback (callable): Called as ``callback(key, forecast)`` when the fit finishes.
+        """
+        with self._lock:
+            if key in self._in_flight:
+                if key in self._pending:
+                    self.dropped += 1
+                self._pending[key] = (history, sequence, callback, time.time())
+                return
+            self._in_flight.add(key)
+        self._dispatch(key, history, sequence, callback)
+
+    def _submit(self, shard, key, history, sequence):
+        try:
+            return self._executors[shard].submit(_timed_predict, key, history, sequence, self.mode, self.options)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._closed:
+                    raise
+                logging.error(f"ARIMA worker {shard} died, restarting it")
+                self._executors[shard] = self._new_executor()
+            return self._executors[shard].submit(_timed_predict, key, history, sequence, self.mode, self.options)
+
+    def _dispatch(self, key, history, sequence, callback, submitted=None):
+        submitted = submitted if submitted is not None else time.time()
+        try:
+            future = self._submit(self._shard(key), key, history, sequence)
+        except Exception as e:
+            # The restarted worker failed too, or the pool was shut down in the meantime: free the
+            # stream so its next window is scheduled instead of waiting behind a fit that never runs
+            logging.error(f"Error scheduling ARIMA prediction for {key}: {e}")
+            with self._lock:
+                self._in_flight.discard(key)
+                self._pending.pop(key, None)
+            return
+        future.add_done_callback(lambda f: self._on_done(key, f, callback, submitted))
+
+    def _on_done(self, key, future, callback, submitted):
+        try:
+            forecast, started, elapsed = future.result()
+            arima_queue_wait.observe(max(0.0, started - submitted))
+            arima_model_time.observe(elapsed)
+            callback(key, forecast)
+        except Exception as e:
+            logging.error(f"Error in ARIMA prediction for {key}: {e}")
+
+        with self._lock:
+            next_job = None if self._closed else self._pending.pop(key, None)
+            if next_job is None:
+                self._in_flight.discard(key)
+        if next_job is not None:
+            self._dispatch(key, *next_job)
+
+    def pids(self):
+        """
+        Return the process ids of the running workers.
+
+        Returns:
+            list: The pids; workers are started lazily, so this is empty before the first submit.
+        """
+        # ProcessPoolExecutor does not expose its processes publicly
+        return [pid for executor in self._executors for pid in (executor._processes or {})]
+
+    def shutdown(self, wait=False):
+        """
+        Stop the workers; windows still waiting for a worker are discarded.
+
+        Args:
+            wait (bool): Block until the fits already running have finished and called back.
+        """
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+        for executor in self._executors:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,121 @@
+import numpy as np
+
+# Default OHLCV columns stored for every kline stream
+CANDLE_COLUMNS = ("open", "high", "low", "close", "volume", "turnover")
+
+
+class CandleRingBuffer:
+    """
+    Fixed-capacity, array-backed ring buffer of candle columns.
+
+    Every row is written twice, at ``head`` and ``head + capacity``, into
+    preallocated arrays of length ``2 * capacity``. The most recent ``n`` rows
+    are therefore always one contiguous slice, so windows are returned as
+    zero-copy NumPy views and appends are O(1) without any reallocation.
+    """
+
+    def __init__(self, capacity, columns=CANDLE_COLUMNS, dtype=np.float64):
+        """
+        Initialize the ring buffer.
+
+        Args:
+            capacity (int): The maximum number of rows kept in the buffer.
+            columns (tuple): The names of the stored columns.
+            dtype: The NumPy dtype of the stored values.
+
+        Raises:
+            ValueError: If the capacity is not positive.
+        """
+        if capacity <= 0:
+            raise ValueError("Capacity must be a positive integer.")
+
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        # One contiguous row per column so that column windows are contiguous too
+        self._data = np.zeros((len(self.columns), 2 * capacity), dtype=dtype)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def full(self):
+        return self._size == self.capacity
+
+    def append(self, values):
+        """
+        Append one row to the buffer, overwriting the oldest row when full.
+
+        Args:
+            values: A sequence ordered like ``columns`` or a mapping keyed by column name.
+                Mapping values may be strings, as in Bybit kline payloads; missing
+                columns are stored as NaN.
+        """
+        if hasattr(values, "get"):
+            values = [float(values.get(name, np.nan)) for name in self.columns]
+
+        head = self._head
+        self._data[:, head] = values
+        self._data[:, head + self.capacity] = values
+
+        self._head = (head + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def window(self, column="close", n=None):
+        """
+        Return the most recent values of a column as a zero-copy view.
+
+        Args:
+            column (str): The column name.
+            n (int): The number of rows to return (defaults to all stored rows).
+
+        Returns:
+            np.ndarray: A read-only contiguous view ordered from oldest to newest.
+        """
+        return self.windows((column,), n)[0]
+
+    def windows(self, columns=None, n=None):
+        """
+        Return the most recent rows of several columns as a zero-copy view.
+
+        Args:
+            columns (tuple): The column names (defaults to all columns).
+            n (int): The number of rows to return (defaults to all stored rows).
+
+        Returns:
+            np.ndarray: A read-only view of shape (len(columns), n).
+        """
+        n = self._size if n is None else min(n, self._size)
+        end = self._head + self.capacity
+        if columns is None:
+            view = self._data[:, end - n:end]
+        elif len(columns) == 1:
+            row = self._index[columns[0]]
+            view = self._data[row:row + 1, end - n:end]
+        else:
+            # Fancy indexing would copy, so only contiguous column ranges stay views
+            rows = [self._index[name] for name in columns]
+            if rows == list(range(rows[0], rows[0] + len(rows))):
+                view = self._data[rows[0]:rows[0] + len(rows), end - n:end]
+            else:
+                view = self._data[rows, end - n:end]
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+    def latest(self, column="close"):
+        """
+        Return the most recent value of a column without copying the window.
+
+        Args:
+            column (str): The column name.
+
+        Returns:
+            float: The latest value, or None if the buffer is empty.
+        """
+        if self._size == 0:
+            return None
+        return float(self._data[self._index[column], self._head + self.capacity - 1])
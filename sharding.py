@@ -0,0 +1,142 @@
+import asyncio
+import os
+import zlib
+
+from ipc import EngineClient, EngineUnavailable
+
+
+def shard_for(symbol, shards):
+    """
+    Return the engine shard that owns a symbol.
+
+    CRC32 is used rather than ``hash`` so every process agrees on the
+    assignment regardless of hash randomization.
+
+    Args:
+        symbol (str): The trading pair symbol.
+        shards (int): The number of engine shards.
+
+    Returns:
+        int: The shard index.
+    """
+    return zlib.crc32(symbol.upper().encode()) % shards
+
+
+def assign_shards(symbols, shards):
+    """
+    Split symbols between shards.
+
+    Args:
+        symbols (list): The configured symbols.
+        shards (int): The number of engine shards.
+
+    Returns:
+        dict: Shard index to its symbols, for the shards that own at least one.
+    """
+    assignment = {}
+    for symbol in symbols:
+        assignment.setdefault(shard_for(symbol, shards), []).append(symbol)
+    return dict(sorted(assignment.items()))
+
+
+def shard_path(path, shard, shards):
+    """
+    Derive a per-shard file name, e.g. "engine.sock" -> "engine-2.sock".
+
+    Args:
+        path (str): The unsharded path.
+        shard (int): The shard index.
+        shards (int): The number of engine shards; with one shard the path is unchanged.
+
+    Returns:
+        str: The shard's path.
+    """
+    if shards <= 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}-{shard}{extension}"
+
+
+class ShardedEngineClient:
+    """
+    Routes engine requests to the shard owning the requested symbol.
+
+    Exposes the same ``request`` and ``watch`` interface as ``EngineClient``, so
+    front-ends do not need to know how many engine processes are running.
+    """
+
+    def __init__(self, path, symbols, shards=1, timeout=2.0):
+        """
+        Initialize the client.
+
+        Args:
+            path (str): The unsharded engine socket path.
+            symbols (list): The configured symbols; the first one is the default stream's.
+            shards (int): The number of engine shards.
+            timeout (float): Seconds to wait for a response.
+        """
+        self.shards = shards
+        self.default_symbol = symbols[0]
+        self.assignment = assign_shards(symbols, shards)
+        self.clients = {shard: EngineClient(shard_path(path, shard, shards), timeout) for shard in self.assignment}
+
+    def client_for(self, symbol=None):
+        """
+        Return the client of the shard owning a symbol.
+
+        Symbols no shard streams are sent to the default symbol's shard, which
+        answers with an unknown_stream error like an unsharded engine would.
+
+        Args:
+            symbol (str): The trading pair symbol (defaults to the first configured symbol).
+
+        Returns:
+            EngineClient: The shard's client.
+        """
+        shard = shard_for(symbol or self.default_symbol, self.shards)
+        if shard not in self.clients:
+            shard = shard_for(self.default_symbol, self.shards)
+        return self.clients[shard]
+
+    async def request(self, op, symbol=None, **params):
+        """
+        Send one request to the shard owning ``symbol``; see ``EngineClient.request``.
+        """
+        return await self.client_for(symbol).request(op, symbol=symbol, **params)
+
+    async def request_all(self, op, **params):
+        """
+        Send the same request to every shard, e.g. to change models everywhere.
+
+        Returns:
+            dict: Shard index to its response; unreachable shards map to an error response.
+        """
+        async def request(client):
+            try:
+                return await client.request(op, **params)
+            except EngineUnavailable as e:
+                return {"error": str(e)}
+
+        responses = await asyncio.gather(*(request(client) for client in self.clients.values()))
+        return dict(zip(self.clients, responses))
+
+    async def watch(self):
+        """
+        Stream the events published by every shard.
+
+        Yields:
+            dict: The decoded events, in arrival order.
+        """
+        events = asyncio.Queue()
+
+        async def forward(client):
+            async for event in client.watch():
+                await events.put(event)
+
+        tasks = [asyncio.create_task(forward(client)) for client in self.clients.values()]
+        try:
+            while True:
+                yield await events.get()
+        finally:
+            for task in tasks:
+                task.cancel()
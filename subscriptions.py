@@ -0,0 +1,114 @@
+import json
+import logging
+import os
+
+
+class SubscriptionRegistry:
+    """
+    Chats subscribed to prediction pushes, grouped by kline topic.
+
+    The registry lives in memory for lookups on every pushed forecast and is
+    written to a JSON file after each change, so subscriptions survive restarts.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the registry and load the saved subscriptions.
+
+        Args:
+            path (str): The JSON file holding the subscriptions.
+        """
+        self.path = path
+        self._chats = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as file:
+                saved = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Could not read subscriptions from {self.path}: {e}")
+            return
+        self._chats = {topic: set(chat_ids) for topic, chat_ids in saved.items() if chat_ids}
+        logging.info(f"Loaded {sum(map(len, self._chats.values()))} subscriptions from {self.path}")
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Written to a temporary file first so a crash never leaves a truncated registry
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({topic: sorted(chat_ids) for topic, chat_ids in self._chats.items()}, file)
+        os.replace(temporary, self.path)
+
+    def subscribe(self, chat_id, topic):
+        """
+        Subscribe a chat to the forecasts of a stream.
+
+        Args:
+            chat_id (int): The Telegram chat id.
+            topic (str): The kline topic, e.g. "kline.5.BTCUSDT".
+
+        Returns:
+            bool: False if the chat was already subscribed.
+        """
+        chat_ids = self._chats.setdefault(topic, set())
+        if chat_id in chat_ids:
+            return False
+        chat_ids.add(chat_id)
+        self._save()
+        return True
+
+    def unsubscribe(self, chat_id, topics=None):
+        """
+        Unsubscribe a chat from some or all of its streams.
+
+        Args:
+            chat_id (int): The Telegram chat id.
+            topics (iterable): The topics to leave (defaults to every subscription of the chat).
+
+        Returns:
+            list: The topics the chat was removed from.
+        """
+        topics = self.topics(chat_id) if topics is None else topics
+        removed = []
+        for topic in topics:
+            chat_ids = self._chats.get(topic)
+            if chat_ids and chat_id in chat_ids:
+                chat_ids.discard(chat_id)
+                if not chat_ids:
+                    del self._chats[topic]
+                removed.append(topic)
+        if removed:
+            self._save()
+        return removed
+
+    def chats(self, topic):
+        """
+        Return the chats subscribed to a stream.
+
+        Args:
+            topic (str): The kline topic.
+
+        Returns:
+            list: The chat ids.
+        """
+        return list(self._chats.get(topic, ()))
+
+    def topics(self, chat_id):
+        """
+        Return the streams a chat is subscribed to.
+
+        Args:
+            chat_id (int): The Telegram chat id.
+
+        Returns:
+            list: The kline topics, sorted.
+        """
+        return sorted(topic for topic, chat_ids in self._chats.items() if chat_id in chat_ids)
+
+    def __len__(self):
+        return sum(map(len, self._chats.values()))
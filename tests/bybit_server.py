@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import websockets
+
+
+def kline_frame(topic, start, close, confirm, ts=None):
+    """
+    Build a kline push frame in the layout Bybit sends.
+
+    Args:
+        topic (str): The kline topic.
+        start (int): The candle start (ms).
+        close (float): The close.
+        confirm (bool): Whether the candle is closed.
+        ts (int): The frame timestamp (ms, defaults to ``start``).
+
+    Returns:
+        str: The frame as text.
+    """
+    kline = {
+        "start": start, "end": start + 59_999, "interval": topic.split(".")[1],
+        "open": f"{close:.2f}", "close": f"{close:.2f}", "high": f"{close:.2f}", "low": f"{close:.2f}",
+        "volume": "1.000", "turnover": f"{close:.2f}", "confirm": confirm, "timestamp": ts or start,
+    }
+    return json.dumps({"topic": topic, "data": [kline], "ts": ts or start, "type": "snapshot"}, separators=(",", ":"))
+
+
+class BybitServer:
+    """
+    Local stand-in for the Bybit public WebSocket, controlled by the test.
+
+    Answers subscribe, unsubscribe and ping requests like Bybit and records
+    them per connection. Tests push frames, drop connections and stop
+    answering pings to exercise the client.
+    """
+
+    def __init__(self):
+        self.answer_pings = True
+        self.connections = []
+        self.requests = []
+        self.url = None
+        self._server = None
+        self._connected = asyncio.Condition()
+
+    async def __aenter__(self):
+        self._server = await websockets.serve(self._handler, "127.0.0.1", 0, ping_interval=None)
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handler(self, ws):
+        requests = []
+        async with self._connected:
+            self.connections.append(ws)
+            self.requests.append(requests)
+            self._connected.notify_all()
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                requests.append(request)
+                op = request.get("op")
+                if op == "ping":
+                    if self.answer_pings:
+                        await ws.send(json.dumps({"success": True, "ret_msg": "pong", "op": "ping"}))
+                elif op in ("subscribe", "unsubscribe"):
+                    await ws.send(json.dumps({"success": True, "ret_msg": "", "op": op}))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def wait_for_connections(self, count, timeout=5.0):
+        async with self._connected:
+            await asyncio.wait_for(self._connected.wait_for(lambda: len(self.connections) >= count), timeout)
+
+    async def wait_for_requests(self, op, count, connection=-1, timeout=5.0):
+        """
+        Wait until a connection has received ``count`` requests of an operation.
+
+        Returns:
+            list: The requests of that operation, in the order received.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            matching = [r for r in self.requests[connection] if r.get("op") == op]
+            if len(matching) >= count:
+                return matching
+            if loop.time() > deadline:
+                raise AssertionError(f"Expected {count} {op} requests, got {matching}")
+            await asyncio.sleep(0.01)
+
+    async def push(self, frame):
+        await self.connections[-1].send(frame)
+
+    async def drop(self):
+        await self.connections[-1].close()
@@ -0,0 +1,177 @@
+import threading
+
+import numpy as np
+import pytest
+
+import backfill
+from backfill import INTERVAL_MS, KlineBackfiller, RateLimiter, find_gap, find_holes, interval_ms
+
+STEP = INTERVAL_MS["5"]
+
+
+class FakeBybit:
+    """
+    Stand-in for the kline endpoint over a fixed set of candles.
+
+    Like Bybit it returns the candles of the requested range newest first, as
+    strings. ``overlap`` also returns the candle just before the range, as a
+    page boundary that is not strictly respected would.
+    """
+
+    def __init__(self, starts, overlap=False, fail=False):
+        self.starts = sorted(starts)
+        self.overlap = overlap
+        self.fail = fail
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get_json(self, url, params):
+        with self._lock:
+            self.requests.append((url, dict(params)))
+        if self.fail:
+            return {"retCode": 10006, "retMsg": "Too many visits!"}
+        start = params["start"] - (STEP if self.overlap else 0)
+        entries = [candle(s) for s in self.starts if start <= s <= params["end"]][:params["limit"] + 1]
+        return {"retCode": 0, "retMsg": "OK", "result": {"list": entries[::-1]}}
+
+
+def candle(start):
+    price = start / STEP
+    return [str(start), str(price), str(price + 1), str(price - 1), str(price + 0.5), "10", str(10 * price)]
+
+
+def test_interval_ms():
+    assert interval_ms(5) == 300_000
+    assert interval_ms("D") == 86_400_000
+    with pytest.raises(ValueError):
+        interval_ms("M")
+
+
+@pytest.mark.parametrize("last, new, expected", [
+    (None, 10 * STEP, None),
+    (10 * STEP, 11 * STEP, None),
+    (10 * STEP, 10 * STEP, None),
+    (10 * STEP, 12 * STEP, (11 * STEP, 11 * STEP)),
+    (10 * STEP, 15 * STEP, (11 * STEP, 14 * STEP)),
+])
+def test_find_gap(last, new, expected):
+    assert find_gap(last, new, "5") == expected
+
+
+def test_find_gap_unsupported_interval():
+    assert find_gap(0, 10 * 86_400_000 * 31, "M") is None
+
+
+@pytest.mark.parametrize("stored, expected", [
+    ([], [(0, 9 * STEP)]),
+    (range(0, 10 * STEP, STEP), []),
+    ([3 * STEP, 4 * STEP, 8 * STEP], [(0, 2 * STEP), (5 * STEP, 7 * STEP), (9 * STEP, 9 * STEP)]),
+    # Duplicates, unsorted rows and candles outside the range are ignored
+    ([5 * STEP, -STEP, 5 * STEP, 0, 12 * STEP, 9 * STEP], [(STEP, 4 * STEP), (6 * STEP, 8 * STEP)]),
+])
+def test_find_holes(stored, expected):
+    assert find_holes(stored, 0, 9 * STEP, "5") == expected
+
+
+@pytest.mark.parametrize("overlap", [False, True])
+def test_fetch_range_stitches_pages(overlap):
+    starts = [i * STEP for i in range(95)]
+    client = FakeBybit(starts, overlap=overlap)
+    backfiller = KlineBackfiller(client, base_url="http://bybit.test/", rate_limit=1000, page_limit=10)
+
+    fetched, rows = backfiller.fetch_range("BTCUSDT", "5", 3 * STEP, 94 * STEP)
+
+    np.testing.assert_array_equal(fetched, starts[3:])
+    assert rows.shape == (92, 6)
+    np.testing.assert_array_equal(rows[:, 0], np.array(starts[3:]) / STEP)
+    np.testing.assert_array_equal(rows[:, 3], np.array(starts[3:]) / STEP + 0.5)
+
+    # Ten pages of at most ten candles, covering the range without overlap
+    pages = sorted((params["start"], params["end"]) for _, params in client.requests)
+    assert len(pages) == 10
+    assert pages[0][0] == 3 * STEP and pages[-1][1] == 94 * STEP
+    assert all(end - start <= 9 * STEP for start, end in pages)
+    assert all(next_start == end + STEP for (_, end), (next_start, _) in zip(pages, pages[1:]))
+    url, params = client.requests[0]
+    assert url == "http://bybit.test/v5/market/kline"
+    assert params["category"] == "linear" and params["symbol"] == "BTCUSDT" and params["limit"] == 10
+
+
+def test_fetch_range_with_missing_candles():
+    client = FakeBybit([0, STEP, 5 * STEP])
+    backfiller = KlineBackfiller(client, rate_limit=1000, page_limit=2)
+
+    fetched, rows = backfiller.fetch_range("BTCUSDT", "5", 0, 7 * STEP)
+
+    np.testing.assert_array_equal(fetched, [0, STEP, 5 * STEP])
+    assert rows.shape == (3, 6)
+
+
+def test_fetch_empty_range():
+    client = FakeBybit([])
+    fetched, rows = KlineBackfiller(client).fetch_range("BTCUSDT", "5", 10 * STEP, 5 * STEP)
+    assert len(fetched) == 0 and rows.shape == (0, 6)
+    assert client.requests == []
+
+
+def test_fetch_error_is_raised():
+    backfiller = KlineBackfiller(FakeBybit([0], fail=True), rate_limit=1000)
+    with pytest.raises(RuntimeError, match="Too many visits"):
+        backfiller.fetch_range("BTCUSDT", "5", 0, 0)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(backfill, "time", clock)
+    return clock
+
+
+def test_rate_limiter_allows_a_burst_then_the_rate(clock):
+    # Rates with exact binary fractions, so the fake clock lands exactly on every refill
+    limiter = RateLimiter(rate=4)
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.sleeps == []
+
+    for _ in range(8):
+        limiter.acquire()
+    assert clock.now - 1000.0 == 2.0
+    assert clock.sleeps == [0.25] * 8
+
+
+def test_rate_limiter_refills_up_to_the_burst(clock):
+    limiter = RateLimiter(rate=2, burst=4)
+    for _ in range(4):
+        limiter.acquire()
+    clock.now += 60
+
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert clock.sleeps == [0.5]
+
+
+def test_fetch_range_respects_the_rate_limit(clock):
+    client = FakeBybit([i * STEP for i in range(50)])
+    backfiller = KlineBackfiller(client, rate_limit=2, max_workers=1, page_limit=5)
+
+    backfiller.fetch_range("BTCUSDT", "5", 0, 49 * STEP)
+
+    # Two requests from the initial bucket, the other eight at two per second
+    assert len(client.requests) == 10
+    assert clock.now - 1000.0 == 4.0
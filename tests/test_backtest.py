@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from backtest import build_windows, score
+
+
+def test_build_windows():
+    windows, actual = build_windows(np.arange(6.0), 3)
+
+    np.testing.assert_array_equal(windows, [[0, 1, 2], [1, 2, 3], [2, 3, 4]])
+    np.testing.assert_array_equal(actual, [3, 4, 5])
+
+
+def test_score_separates_tolerance_from_direction():
+    windows = np.array([[100.0], [100.0], [100.0], [100.0]])
+    actual = np.array([100.05, 101.0, 99.0, 99.0])
+    # Close but on the wrong side, far but in the right direction, exact, far and wrong
+    predicted = np.array([99.98, 110.0, 99.0, 150.0])
+
+    result = score(predicted, windows, actual, tolerance=0.001)
+
+    assert result["within_tolerance"] == pytest.approx(0.5)
+    assert result["directional_accuracy"] == pytest.approx(0.5)
+    assert result["mae"] == pytest.approx((0.07 + 9.0 + 0.0 + 51.0) / 4)
+    assert "hit_rate" not in result
+
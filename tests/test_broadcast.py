@@ -0,0 +1,171 @@
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from broadcast import Broadcaster
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop whose clock jumps to the next timer instead of waiting for it.
+
+    Every jump overshoots by a microsecond, so a timer computed from a float
+    sum is never left a rounding error short of its deadline.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._now = 0.0
+        select = self._selector.select
+
+        def advance(timeout=None):
+            if timeout:
+                self._now += timeout + 1e-6
+            return select(0)
+
+        self._selector.select = advance
+
+    def time(self):
+        return self._now
+
+
+class FakeBot:
+    """
+    Records every message with the loop time it was sent at.
+
+    ``errors`` maps a chat id to exceptions raised by its next sends, in order.
+    """
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = {chat_id: list(raised) for chat_id, raised in (errors or {}).items()}
+
+    async def send_message(self, chat_id, text):
+        errors = self.errors.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append((asyncio.get_running_loop().time(), chat_id, text))
+
+    def times(self, chat_id):
+        return [sent_at for sent_at, chat, _ in self.sent if chat == chat_id]
+
+
+def run(scenario):
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(asyncio.wait_for(scenario(), 3600))
+    finally:
+        loop.close()
+
+
+async def until(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+def test_paces_each_chat_and_the_bot():
+    bot = FakeBot()
+
+    async def scenario():
+        broadcaster = Broadcaster(rate=10, chat_interval=1.0, group_interval=3.0)
+        broadcaster.start(bot)
+        for key in ("a", "b", "c"):
+            broadcaster.publish([1, 2, -100], key, f"text {key}")
+        await until(lambda: len(bot.sent) == 9)
+        await broadcaster.stop()
+        return broadcaster
+
+    broadcaster = run(scenario)
+
+    assert broadcaster.sent == 9
+    for chat_id, interval in ((1, 1.0), (2, 1.0), (-100, 3.0)):
+        times = bot.times(chat_id)
+        assert [text for _, chat, text in bot.sent if chat == chat_id] == ["text a", "text b", "text c"]
+        assert all(b - a >= interval - 1e-9 for a, b in zip(times, times[1:]))
+        assert times[-1] - times[0] < 2 * interval + 0.5
+    # The first message of every chat is spaced by the overall rate only
+    first = sorted(bot.times(chat_id)[0] for chat_id in (1, 2, -100))
+    assert all(b - a == pytest.approx(0.1, abs=1e-3) for a, b in zip(first, first[1:]))
+
+
+def test_newer_message_replaces_unsent_one():
+    bot = FakeBot()
+
+    async def scenario():
+        broadcaster = Broadcaster(rate=10, chat_interval=5.0)
+        broadcaster.start(bot)
+        broadcaster.publish([1], "kline.5.BTCUSDT", "first")
+        broadcaster.publish([1], "kline.1.BTCUSDT", "other")
+        broadcaster.publish([1], "kline.1.BTCUSDT", "newer")
+        await until(lambda: len(bot.sent) == 2)
+        await asyncio.sleep(10)
+        await broadcaster.stop()
+
+    run(scenario)
+
+    assert [text for _, _, text in bot.sent] == ["first", "newer"]
+
+
+def test_retry_after_defers_only_that_chat():
+    bot = FakeBot({1: [RetryAfter(10)]})
+
+    async def scenario():
+        broadcaster = Broadcaster(rate=10, chat_interval=1.0)
+        broadcaster.start(bot)
+        broadcaster.publish([1, 2], "a", "first")
+        await until(lambda: bot.times(2))
+        # Chat 2 keeps receiving while chat 1 waits out its limit
+        await asyncio.sleep(2)
+        broadcaster.publish([1, 2], "b", "second")
+        await until(lambda: len(bot.sent) == 4)
+        await broadcaster.stop()
+        return broadcaster
+
+    broadcaster = run(scenario)
+
+    assert broadcaster.retried == 1
+    assert [text for _, chat, text in bot.sent if chat == 1] == ["first", "second"]
+    chat_1, chat_2 = bot.times(1), bot.times(2)
+    assert chat_1[0] >= 10
+    assert chat_2[0] < 1 and 2 <= chat_2[1] < 3
+    assert chat_1[1] - chat_1[0] >= 1.0 - 1e-9
+
+
+def test_forbidden_unsubscribes_the_chat():
+    forbidden = []
+    bot = FakeBot({7: [Forbidden("bot was blocked by the user")]})
+
+    async def scenario():
+        broadcaster = Broadcaster(rate=10, on_forbidden=forbidden.append)
+        broadcaster.start(bot)
+        broadcaster.publish([7, 8], "a", "text")
+        await until(lambda: forbidden and bot.sent)
+        await asyncio.sleep(60)
+        await broadcaster.stop()
+        return broadcaster
+
+    broadcaster = run(scenario)
+
+    assert forbidden == [7]
+    assert broadcaster.failed == 1 and broadcaster.retried == 0
+    assert [chat for _, chat, _ in bot.sent] == [8]
+
+
+def test_network_errors_back_off_then_give_up():
+    bot = FakeBot({1: [NetworkError("timed out")] * 3, 2: [BadRequest("chat not found")]})
+
+    async def scenario():
+        broadcaster = Broadcaster(rate=10, max_retries=2, retry_delay=1.0)
+        broadcaster.start(bot)
+        broadcaster.publish([1, 2], "a", "text")
+        await until(lambda: broadcaster.failed == 2)
+        await broadcaster.stop()
+        return broadcaster, asyncio.get_running_loop().time()
+
+    broadcaster, finished = run(scenario)
+
+    assert broadcaster.retried == 2
+    assert bot.sent == []
+    # Retries after 1 s and 2 s
+    assert finished >= 3
@@ -0,0 +1,228 @@
+import asyncio
+import threading
+
+from bybit_client import SUBSCRIBE_CHUNK, BybitStream
+from bybit_server import BybitServer, kline_frame
+
+TOPICS = [f"kline.1.SYM{i:02d}USDT" for i in range(25)]
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 20))
+
+
+async def started(client):
+    task = asyncio.create_task(client.run())
+    await asyncio.wait_for(client.connected.wait(), 5)
+    return task
+
+
+async def stopped(client, task):
+    await client.stop()
+    await asyncio.wait_for(task, 5)
+
+
+def test_subscribes_in_chunks_and_at_runtime():
+    async def scenario():
+        async with BybitServer() as server:
+            client = BybitStream(server.url, TOPICS)
+            task = await started(client)
+
+            requests = await server.wait_for_requests("subscribe", 3)
+            assert [len(r["args"]) for r in requests] == [SUBSCRIBE_CHUNK, SUBSCRIBE_CHUNK, 5]
+            assert sorted(topic for r in requests for topic in r["args"]) == sorted(TOPICS)
+
+            # Topics already held are not sent again
+            added = [f"kline.5.NEW{i:02d}USDT" for i in range(12)]
+            await client.subscribe(added + TOPICS[:3])
+            requests = (await server.wait_for_requests("subscribe", 5))[3:]
+            assert [r["args"] for r in requests] == [added[:10], added[10:]]
+
+            await client.unsubscribe(TOPICS[:11] + ["kline.1.UNKNOWNUSDT"])
+            requests = await server.wait_for_requests("unsubscribe", 2)
+            assert [r["args"] for r in requests] == [TOPICS[:10], TOPICS[10:11]]
+            assert client.topics == set(TOPICS[11:]) | set(added)
+
+            await stopped(client, task)
+
+    run(scenario())
+
+
+def test_reconnects_and_resubscribes_current_topics():
+    async def scenario():
+        async with BybitServer() as server:
+            client = BybitStream(server.url, TOPICS[:3], backoff_min=0.01, backoff_max=0.05)
+            task = await started(client)
+            await client.subscribe(["kline.5.ADDEDUSDT"])
+            await client.unsubscribe([TOPICS[0]])
+            await server.wait_for_requests("unsubscribe", 1)
+
+            await server.drop()
+            await server.wait_for_connections(2)
+
+            requests = await server.wait_for_requests("subscribe", 1)
+            assert requests[0]["args"] == sorted(TOPICS[1:3] + ["kline.5.ADDEDUSDT"])
+            assert client.reconnects == 1
+            await asyncio.wait_for(client.connected.wait(), 5)
+
+            await stopped(client, task)
+            assert not client.connected.is_set()
+
+    run(scenario())
+
+
+def test_app_level_ping_keeps_connection_alive():
+    async def scenario():
+        async with BybitServer() as server:
+            client = BybitStream(server.url, TOPICS[:1], ping_interval=0.05, pong_timeout=0.1)
+            task = await started(client)
+
+            await server.wait_for_requests("ping", 5)
+            assert len(server.connections) == 1
+            assert client.reconnects == 0
+
+            await stopped(client, task)
+
+    run(scenario())
+
+
+def test_unanswered_pings_force_a_reconnect():
+    async def scenario():
+        async with BybitServer() as server:
+            server.answer_pings = False
+            client = BybitStream(server.url, TOPICS[:1], ping_interval=0.05, pong_timeout=0.1,
+                                 backoff_min=0.01, backoff_max=0.05)
+            task = await started(client)
+
+            await server.wait_for_connections(2)
+            await server.wait_for_requests("subscribe", 1)
+            assert client.reconnects >= 1
+
+            await stopped(client, task)
+
+    run(scenario())
+
+
+def test_stop_during_backoff_returns_promptly():
+    async def scenario():
+        async with BybitServer() as server:
+            client = BybitStream(server.url, TOPICS[:1], backoff_min=30, backoff_max=30)
+            task = await started(client)
+            await server.drop()
+            while client.connected.is_set():
+                await asyncio.sleep(0.01)
+
+            await stopped(client, task)
+
+    run(scenario())
+
+
+def test_queued_ticks_are_coalesced_per_topic():
+    a, b = "kline.1.AAAUSDT", "kline.1.BBBUSDT"
+    frames = {
+        "tick1a": kline_frame(a, 0, 1.0, False),
+        "tick2a": kline_frame(a, 0, 2.0, False),
+        "tick3a": kline_frame(a, 0, 3.0, False),
+        "tick1b": kline_frame(b, 0, 1.5, False),
+        "closeda": kline_frame(a, 0, 4.0, True),
+        "tick4a": kline_frame(a, 60_000, 5.0, False),
+        "other": '{"type":"other"}',
+    }
+    names = {frame: name for name, frame in frames.items()}
+
+    async def scenario():
+        handled = []
+        gate = asyncio.Event()
+        done = asyncio.Event()
+
+        async def on_message(message):
+            handled.append(names[message])
+            await gate.wait()
+            if len(handled) == 5:
+                done.set()
+
+        async with BybitServer() as server:
+            client = BybitStream(server.url, [a, b], on_message=on_message)
+            task = await started(client)
+
+            # The handler blocks on the first tick while the rest is queued
+            await server.push(frames["tick1a"])
+            while not handled:
+                await asyncio.sleep(0.01)
+            for name in ("tick2a", "tick3a", "tick1b", "closeda", "other", "tick4a"):
+                await server.push(frames[name])
+            while client.coalesced < 2:
+                await asyncio.sleep(0.01)
+            gate.set()
+            await asyncio.wait_for(done.wait(), 5)
+
+            # The tick queued first was superseded by the closed candle of its topic
+            assert handled == ["tick1a", "tick1b", "closeda", "other", "tick4a"]
+            assert client.coalesced == 2
+            assert client._ticks == {}
+
+            await stopped(client, task)
+
+    run(scenario())
+
+
+def test_handler_age_while_handling():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def on_message(message):
+            await gate.wait()
+
+        async with BybitServer() as server:
+            client = BybitStream(server.url, ["kline.1.AAAUSDT"], on_message=on_message)
+            task = await started(client)
+            assert client.handler_age() == 0.0
+
+            await server.push(kline_frame("kline.1.AAAUSDT", 0, 1.0, True))
+            while client.handler_age() == 0.0:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            assert client.handler_age() >= 0.05
+            gate.set()
+            while client.handler_age() != 0.0:
+                await asyncio.sleep(0.01)
+
+            await stopped(client, task)
+
+    run(scenario())
+
+
+def test_handler_age_excludes_work_in_threads():
+    async def scenario():
+        entered = threading.Event()
+        release = threading.Event()
+        done = asyncio.Event()
+
+        def blocking():
+            entered.set()
+            release.wait(5)
+
+        async def on_message(message):
+            await client.run_in_thread(blocking)
+            await asyncio.sleep(0.05)
+            done.set()
+
+        async with BybitServer() as server:
+            client = BybitStream(server.url, ["kline.1.AAAUSDT"], on_message=on_message)
+            task = await started(client)
+
+            await server.push(kline_frame("kline.1.AAAUSDT", 0, 1.0, True))
+            while not entered.is_set():
+                await asyncio.sleep(0.01)
+            # A slow call in a worker thread does not make the handler look stuck
+            await asyncio.sleep(0.2)
+            assert client.handler_age() == 0.0
+            release.set()
+            while client.handler_age() == 0.0:
+                await asyncio.sleep(0.01)
+            assert client.handler_age() < 0.2
+            await asyncio.wait_for(done.wait(), 5)
+
+            await stopped(client, task)
+
+    run(scenario())
@@ -0,0 +1,126 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from candle_store import CandleStore
+from ring_buffer import CANDLE_COLUMNS
+
+MINUTE = 60_000
+
+
+def rows(starts, offset=0.0):
+    return [[start / MINUTE + offset + i for i in range(len(CANDLE_COLUMNS))] for start in starts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CandleStore(str(tmp_path / "candles"))
+    yield store
+    store.close()
+
+
+def now_ms():
+    return int(time.time() * 1000) // MINUTE * MINUTE
+
+
+def test_append_and_range_reads(store):
+    base = now_ms()
+    starts = [base + i * MINUTE for i in range(10)]
+    store.append_many("BTCUSDT", "1", starts, rows(starts))
+    store.append("BTCUSDT", "1", base + 10 * MINUTE, {name: str(i) for i, name in enumerate(CANDLE_COLUMNS)})
+
+    everything = store.read("BTCUSDT", "1")
+    assert len(everything["start"]) == 11
+    assert everything["close"][-1] == CANDLE_COLUMNS.index("close")
+
+    middle = store.read("BTCUSDT", "1", start=base + 2 * MINUTE, end=base + 4 * MINUTE)
+    np.testing.assert_array_equal(middle["start"], starts[2:5])
+    np.testing.assert_array_equal(middle["open"], [s / MINUTE for s in starts[2:5]])
+
+    # Bounds between candles and outside the stored range
+    assert len(store.read("BTCUSDT", "1", start=base + 1, end=base + MINUTE - 1)["start"]) == 0
+    assert len(store.read("BTCUSDT", "1", end=base - 1)["start"]) == 0
+    assert len(store.read("BTCUSDT", "1", start=base + 8 * MINUTE)["start"]) == 3
+
+    tail = store.tail("BTCUSDT", "1", 3)
+    np.testing.assert_array_equal(tail["start"], [base + 8 * MINUTE, base + 9 * MINUTE, base + 10 * MINUTE])
+    assert not tail["close"].flags.writeable
+
+
+def test_empty_partition(store):
+    columns = store.read("ETHUSDT", "5")
+    assert set(columns) == {"start", *CANDLE_COLUMNS}
+    assert all(len(values) == 0 for values in columns.values())
+
+
+def tear(store, symbol, interval, column, extra_bytes):
+    path = os.path.join(store.root, symbol, interval, f"{column}.f64")
+    with open(path, "ab") as file:
+        file.write(b"\x00" * extra_bytes)
+    return path
+
+
+def test_torn_columns_are_clamped_on_read_and_repaired_on_first_append(tmp_path):
+    root = str(tmp_path / "candles")
+    base = now_ms()
+    starts = [base + i * MINUTE for i in range(3)]
+    writer = CandleStore(root)
+    writer.append_many("BTCUSDT", "1", starts, rows(starts))
+    writer.close()
+
+    # A crash between column writes: one full row and a partial one in "close" only
+    path = tear(writer, "BTCUSDT", "1", "close", 8 + 3)
+    torn_size = os.path.getsize(path)
+
+    store = CandleStore(root)
+    assert len(store.read("BTCUSDT", "1")["close"]) == 3
+    # Reads never repair, the writer may be appending in another process
+    assert os.path.getsize(path) == torn_size
+
+    store.append_many("BTCUSDT", "1", [base + 3 * MINUTE], rows([base + 3 * MINUTE]))
+    assert os.path.getsize(path) == 4 * 8
+    columns = store.read("BTCUSDT", "1")
+    np.testing.assert_array_equal(columns["start"], starts + [base + 3 * MINUTE])
+    np.testing.assert_array_equal(columns["open"], [s / MINUTE for s in columns["start"]])
+
+    # Only the first append repairs
+    tear(store, "BTCUSDT", "1", "close", 8)
+    store.append_many("BTCUSDT", "1", [base + 4 * MINUTE], rows([base + 4 * MINUTE]))
+    assert os.path.getsize(path) == 6 * 8
+    store.close()
+
+
+def test_compaction_sorts_and_keeps_last_copy(store):
+    base = now_ms()
+    starts = [base + i * MINUTE for i in range(5)]
+    store.append_many("BTCUSDT", "1", starts, rows(starts))
+    # A backfill writes older candles again and out of order, with corrected values
+    again = [base + 3 * MINUTE, base + MINUTE, base - MINUTE]
+    store.append_many("BTCUSDT", "1", again, rows(again, offset=0.5))
+
+    store.compact("BTCUSDT", "1")
+
+    columns = store.read("BTCUSDT", "1")
+    np.testing.assert_array_equal(columns["start"], [base - MINUTE] + starts)
+    expected_open = [s / MINUTE + (0.5 if s in again else 0.0) for s in columns["start"]]
+    np.testing.assert_array_equal(columns["open"], expected_open)
+    assert not os.path.exists(os.path.join(store.root, "BTCUSDT", "1.compact"))
+    assert store.partitions() == [("BTCUSDT", "1")]
+
+    # Appends after compaction go to the rewritten files
+    store.append_many("BTCUSDT", "1", [base + 5 * MINUTE], rows([base + 5 * MINUTE]))
+    assert store.read("BTCUSDT", "1")["start"][-1] == base + 5 * MINUTE
+
+
+def test_compaction_applies_retention(tmp_path):
+    store = CandleStore(str(tmp_path / "candles"), retention_days=1)
+    base = now_ms()
+    starts = [base - 3 * 86_400_000, base - 2 * 86_400_000, base - MINUTE, base]
+    store.append_many("BTCUSDT", "1", starts, rows(starts))
+
+    store.compact("BTCUSDT", "1")
+
+    np.testing.assert_array_equal(store.read("BTCUSDT", "1")["start"], starts[2:])
+    store.close()
@@ -0,0 +1,99 @@
+import glob
+import json
+import os
+
+import numpy as np
+import pytest
+
+from gru_numpy import NumpyGRUModel, check_parity, export_weights
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+KERAS_MODELS = sorted(glob.glob(os.path.join(MODEL_DIR, "*.keras")) + glob.glob(os.path.join(MODEL_DIR, "*.h5")))
+
+# Largest difference to Keras accepted for a scaled output
+TOLERANCE = 1e-4
+
+
+@pytest.mark.parametrize("path", KERAS_MODELS, ids=os.path.basename)
+def test_numpy_backend_matches_keras(path, tmp_path):
+    keras = pytest.importorskip("tensorflow.keras")
+    keras_model = keras.models.load_model(path)
+    exported = str(tmp_path / "weights.npz")
+    export_weights(keras_model, exported)
+
+    assert check_parity(keras_model, NumpyGRUModel.load(exported)) < TOLERANCE
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def reference_gru(x, kernel, recurrent_kernel, bias, reset_after):
+    """
+    One GRU layer written step by step from the Keras equations, gate order z, r, h.
+    """
+    units = recurrent_kernel.shape[0]
+    W = np.split(kernel, 3, axis=1)
+    U = np.split(recurrent_kernel, 3, axis=1)
+    if reset_after:
+        b_in, b_rec = np.split(bias[0], 3), np.split(bias[1], 3)
+    else:
+        b_in, b_rec = np.split(bias, 3), [np.zeros(units)] * 3
+
+    h = np.zeros((x.shape[0], units))
+    outputs = []
+    for t in range(x.shape[1]):
+        x_t = x[:, t]
+        z = sigmoid(x_t @ W[0] + b_in[0] + h @ U[0] + b_rec[0])
+        r = sigmoid(x_t @ W[1] + b_in[1] + h @ U[1] + b_rec[1])
+        if reset_after:
+            candidate = np.tanh(x_t @ W[2] + b_in[2] + r * (h @ U[2] + b_rec[2]))
+        else:
+            candidate = np.tanh(x_t @ W[2] + b_in[2] + (r * h) @ U[2])
+        h = z * h + (1.0 - z) * candidate
+        outputs.append(h)
+    return np.stack(outputs, axis=1)
+
+
+def random_gru_weights(rng, features, units, reset_after):
+    bias_shape = (2, 3 * units) if reset_after else (3 * units,)
+    return (rng.normal(0, 0.5, (features, 3 * units)), rng.normal(0, 0.5, (units, 3 * units)),
+            rng.normal(0, 0.5, bias_shape))
+
+
+def gru_spec(units, reset_after, return_sequences):
+    return {"type": "gru", "units": units, "reset_after": reset_after, "activation": "tanh",
+            "recurrent_activation": "sigmoid", "return_sequences": return_sequences}
+
+
+@pytest.mark.parametrize("reset_after", [True, False])
+def test_numpy_gru_matches_reference_step(reset_after):
+    rng = np.random.default_rng(0)
+    X = rng.random((8, 14, 1))
+    first = random_gru_weights(rng, 1, 6, reset_after)
+    second = random_gru_weights(rng, 6, 4, reset_after)
+    dense_kernel, dense_bias = rng.normal(0, 0.5, (4, 1)), rng.normal(0, 0.5, 1)
+    layers = [gru_spec(6, reset_after, True), gru_spec(4, reset_after, False),
+              {"type": "dense", "activation": "linear"}]
+    arrays = {}
+    for index, (kernel, recurrent_kernel, bias) in enumerate((first, second)):
+        arrays.update({f"{index}_kernel": kernel, f"{index}_recurrent_kernel": recurrent_kernel, f"{index}_bias": bias})
+    arrays.update({"2_kernel": dense_kernel, "2_bias": dense_bias})
+
+    sequences = reference_gru(X, *first, reset_after)
+    expected = reference_gru(sequences, *second, reset_after)[:, -1] @ dense_kernel + dense_bias
+
+    np.testing.assert_allclose(NumpyGRUModel(layers, arrays, dtype=np.float64).predict(X), expected, rtol=1e-12)
+    np.testing.assert_allclose(NumpyGRUModel(layers, arrays).predict(X, batch_size=3), expected, atol=1e-5)
+
+
+def test_exported_weights_round_trip(tmp_path):
+    rng = np.random.default_rng(1)
+    kernel, recurrent_kernel, bias = random_gru_weights(rng, 1, 3, True)
+    path = str(tmp_path / "model.npz")
+    np.savez(path, layers=np.array(json.dumps([gru_spec(3, True, False)])),
+             **{"0_kernel": kernel, "0_recurrent_kernel": recurrent_kernel, "0_bias": bias})
+
+    X = rng.random((2, 5, 1))
+    expected = reference_gru(X, kernel, recurrent_kernel, bias, True)[:, -1]
+    np.testing.assert_allclose(NumpyGRUModel.load(path, dtype=np.float64).predict(X), expected, rtol=1e-12)
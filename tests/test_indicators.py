@@ -0,0 +1,246 @@
+import math
+
+import numpy as np
+import pytest
+
+from indicators import (
+    ATR,
+    EMA,
+    MACD,
+    RMA,
+    RSI,
+    SMA,
+    WARMUP_CANDLES,
+    BollingerBands,
+    IndicatorSet,
+    Momentum,
+    RollingMinMax,
+    RollingStd,
+    Stochastic,
+    recommendation,
+)
+
+N = 300
+
+
+@pytest.fixture(scope="module")
+def candles():
+    rng = np.random.default_rng(7)
+    close = 30000.0 + np.cumsum(rng.normal(0.0, 50.0, N))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) + rng.uniform(0.0, 30.0, N)
+    low = np.minimum(open_, close) - rng.uniform(0.0, 30.0, N)
+    volume = rng.uniform(1.0, 100.0, N)
+    return open_, high, low, close, volume
+
+
+# Batch reference implementations over whole arrays, NaN until a value is defined
+
+def sma_ref(x, period):
+    out = np.full(len(x), np.nan)
+    for i in range(period - 1, len(x)):
+        out[i] = x[i - period + 1:i + 1].mean()
+    return out
+
+
+def ema_ref(x, period, alpha=None):
+    alpha = 2.0 / (period + 1) if alpha is None else alpha
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < period:
+        return out
+    first = valid[0]
+    seed = first + period - 1
+    out[seed] = x[first:seed + 1].mean()
+    for i in range(seed + 1, len(x)):
+        out[i] = out[i - 1] + alpha * (x[i] - out[i - 1])
+    return out
+
+
+def rma_ref(x, period):
+    return ema_ref(x, period, alpha=1.0 / period)
+
+
+def rsi_ref(close, period):
+    change = np.concatenate([[np.nan], np.diff(close)])
+    gain = rma_ref(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), period)
+    loss = rma_ref(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0)), period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+
+
+def true_range_ref(high, low, close):
+    previous = np.concatenate([[np.nan], close[:-1]])
+    ranges = np.vstack([high - low, np.abs(high - previous), np.abs(low - previous)])
+    result = np.nanmax(ranges, axis=0)
+    result[0] = high[0] - low[0]
+    return result
+
+
+def rolling_ref(x, period, reduce):
+    out = np.full(len(x), np.nan)
+    for i in range(period - 1, len(x)):
+        out[i] = reduce(x[i - period + 1:i + 1])
+    return out
+
+
+def stream(indicator, *columns):
+    values = []
+    for row in zip(*columns):
+        result = indicator.update(*row)
+        values.append(np.nan if result is None else result)
+    return np.array(values)
+
+
+def assert_matches(actual, expected):
+    np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected))
+    np.testing.assert_allclose(actual[~np.isnan(actual)], expected[~np.isnan(expected)], rtol=1e-9, atol=1e-8)
+
+
+@pytest.mark.parametrize("period", [1, 10, 50])
+def test_sma(candles, period):
+    close = candles[3]
+    assert_matches(stream(SMA(period), close), sma_ref(close, period))
+
+
+@pytest.mark.parametrize("period", [10, 26, 200])
+def test_ema_seeded_with_sma(candles, period):
+    close = candles[3]
+    assert_matches(stream(EMA(period), close), ema_ref(close, period))
+
+
+def test_rma(candles):
+    close = candles[3]
+    assert_matches(stream(RMA(14), close), rma_ref(close, 14))
+
+
+def test_rsi(candles):
+    close = candles[3]
+    assert_matches(stream(RSI(14), close), rsi_ref(close, 14))
+
+
+def test_rsi_without_losses_is_100():
+    rsi = RSI(3)
+    for close in range(10):
+        rsi.update(float(close))
+    assert rsi.value == 100.0
+
+
+def test_macd(candles):
+    close = candles[3]
+    macd = MACD(12, 26, 9)
+    values, signals, histograms = [], [], []
+    for x in close:
+        macd.update(x)
+        values.append(np.nan if macd.value is None else macd.value)
+        signals.append(np.nan if macd.signal is None else macd.signal)
+        histograms.append(np.nan if macd.histogram is None else macd.histogram)
+
+    line = ema_ref(close, 12) - ema_ref(close, 26)
+    signal = ema_ref(line, 9)
+    assert_matches(np.array(values), line)
+    assert_matches(np.array(signals), signal)
+    assert_matches(np.array(histograms), line - signal)
+
+
+def test_atr(candles):
+    _, high, low, close, _ = candles
+    assert_matches(stream(ATR(14), high, low, close), rma_ref(true_range_ref(high, low, close), 14))
+
+
+def test_rolling_std_far_from_zero(candles):
+    close = candles[3] + 1e9
+    assert_matches(stream(RollingStd(20), close), rolling_ref(close, 20, np.std))
+
+
+def test_bollinger_bands(candles):
+    close = candles[3]
+    bands = BollingerBands(20, 2.0)
+    upper, lower = [], []
+    for x in close:
+        bands.update(x)
+        upper.append(np.nan if bands.upper is None else bands.upper)
+        lower.append(np.nan if bands.lower is None else bands.lower)
+
+    middle = sma_ref(close, 20)
+    std = rolling_ref(close, 20, np.std)
+    assert_matches(np.array(upper), middle + 2.0 * std)
+    assert_matches(np.array(lower), middle - 2.0 * std)
+
+
+@pytest.mark.parametrize("period", [1, 5, 14])
+def test_rolling_min_max(candles, period):
+    close = candles[3]
+    window = RollingMinMax(period)
+    minima, maxima = [], []
+    for x in close:
+        window.update(x)
+        minima.append(window.min if window.ready else np.nan)
+        maxima.append(window.max if window.ready else np.nan)
+
+    assert_matches(np.array(minima), rolling_ref(close, period, np.min))
+    assert_matches(np.array(maxima), rolling_ref(close, period, np.max))
+
+
+def test_stochastic_and_williams_r(candles):
+    _, high, low, close, _ = candles
+    stochastic = Stochastic(14, 3, 3)
+    k, d, williams_r = [], [], []
+    for row in zip(high, low, close):
+        stochastic.update(*row)
+        k.append(np.nan if stochastic.k is None else stochastic.k)
+        d.append(np.nan if stochastic.d is None else stochastic.d)
+        williams_r.append(np.nan if stochastic.williams_r is None else stochastic.williams_r)
+
+    highest = rolling_ref(high, 14, np.max)
+    lowest = rolling_ref(low, 14, np.min)
+    raw_k = 100.0 * (close - lowest) / (highest - lowest)
+    expected_k = np.full(N, np.nan)
+    expected_k[13:] = sma_ref(raw_k[13:], 3)
+    expected_d = np.full(N, np.nan)
+    expected_d[15:] = sma_ref(expected_k[15:], 3)
+    assert_matches(np.array(k), expected_k)
+    assert_matches(np.array(d), expected_d)
+    assert_matches(np.array(williams_r), raw_k - 100.0)
+
+
+def test_momentum(candles):
+    close = candles[3]
+    expected = np.full(N, np.nan)
+    expected[10:] = close[10:] - close[:-10]
+    assert_matches(stream(Momentum(10), close), expected)
+
+
+def test_indicator_set_values_and_features(candles):
+    open_, high, low, close, volume = candles
+    indicators = IndicatorSet()
+    for row in zip(open_, high, low, close, volume):
+        indicators.update(*row)
+
+    values = indicators.values()
+    assert values["ema_50"] == pytest.approx(ema_ref(close, 50)[-1])
+    assert values["sma_200"] == pytest.approx(close[-200:].mean())
+    assert values["rsi"] == pytest.approx(rsi_ref(close, 14)[-1])
+    assert values["relative_volume"] == pytest.approx(volume[-1] / volume[-20:].mean())
+    assert all(value is not None for value in values.values())
+    assert not any(math.isnan(value) for value in indicators.features())
+
+
+def test_summary_withheld_until_warm(candles):
+    open_, high, low, close, volume = candles
+    indicators = IndicatorSet()
+    for i, row in enumerate(zip(open_, high, low, close, volume)):
+        indicators.update(*row)
+        if i + 1 < WARMUP_CANDLES:
+            assert indicators.summary() is None
+
+    summary = indicators.summary()
+    assert summary["BUY"] + summary["SELL"] + summary["NEUTRAL"] == 17
+    assert summary["RECOMMENDATION"] in ("STRONG_SELL", "SELL", "NEUTRAL", "BUY", "STRONG_BUY")
+
+
+@pytest.mark.parametrize("rating, label", [
+    (-1.0, "STRONG_SELL"), (-0.3, "SELL"), (0.0, "NEUTRAL"), (0.1, "NEUTRAL"), (0.5, "BUY"), (0.8, "STRONG_BUY"),
+])
+def test_recommendation_thresholds(rating, label):
+    assert recommendation(rating) == label
@@ -0,0 +1,174 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from ledger import (
+    LATE_SCORING_CANDLES,
+    MAX_STREAM_LENGTH,
+    RECORD_DTYPE,
+    RETENTION_MS,
+    PredictionLedger,
+    directional_hit,
+)
+
+STREAM = "kline.5.BTCUSDT"
+STEP = 300_000
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "ledger.bin")
+
+
+@pytest.fixture
+def ledger(path):
+    ledger = PredictionLedger(path)
+    yield ledger
+    ledger.close()
+
+
+def totals(ledger, model, window="all", stream=STREAM):
+    return ledger.stats(stream)[model][window]
+
+
+def test_record_then_score(ledger):
+    start = now_ms() // STEP * STEP
+    ledger.record(STREAM, "gru", start, reference=100.0, predicted=101.0)
+    ledger.record(STREAM, "arima", start, reference=100.0, predicted=99.0)
+
+    assert ledger.score(STREAM, start, 102.0) == {"gru": 1, "arima": 0}
+    # Scored predictions are not scored again
+    assert ledger.score(STREAM, start, 90.0) == {}
+
+    gru = totals(ledger, "gru")
+    assert gru["count"] == 1 and gru["hits"] == 1 and gru["hit_rate"] == 1.0
+    assert gru["mae"] == pytest.approx(1.0)
+    assert totals(ledger, "arima", "1h")["hit_rate"] == 0.0
+
+
+def test_score_drops_predictions_made_before_a_lost_candle(ledger):
+    start = now_ms() // STEP * STEP
+    ledger.record(STREAM, "gru", start, reference=100.0, predicted=101.0)
+    ledger.record(STREAM, "gru", start + STEP, reference=100.0, predicted=101.0)
+    ledger.record(STREAM, "gru", start + 2 * STEP, reference=100.0, predicted=101.0)
+
+    # The candle after the first reference was never seen
+    assert ledger.score(STREAM, start + STEP, 102.0) == {"gru": 1}
+    assert ledger._pending[STREAM] == [("gru", ledger._pending[STREAM][0][1], start + 2 * STEP, 101.0, 100.0)]
+    assert totals(ledger, "gru")["count"] == 1
+
+
+def test_late_prediction_is_scored_on_record(ledger):
+    start = now_ms() // STEP * STEP
+    ledger.score(STREAM, start, 99.0)
+
+    # A slow model answers after the candle it is scored against has closed
+    ledger.record(STREAM, "arima", start, reference=100.0, predicted=98.0)
+
+    assert STREAM not in ledger._pending or not ledger._pending[STREAM]
+    assert totals(ledger, "arima")["hits"] == 1
+
+
+def test_late_scoring_window_is_bounded(ledger):
+    start = now_ms() // STEP * STEP
+    for i in range(LATE_SCORING_CANDLES + 1):
+        ledger.score(STREAM, start + i * STEP, 100.0 + i)
+
+    assert len(ledger._closes[STREAM]) == LATE_SCORING_CANDLES
+    ledger.record(STREAM, "arima", start, reference=100.0, predicted=101.0)
+    assert STREAM not in ledger._stats
+    ledger.record(STREAM, "arima", start + STEP, reference=100.0, predicted=101.0)
+    assert totals(ledger, "arima")["count"] == 1
+
+
+def test_flat_candle_is_a_miss(ledger):
+    start = now_ms() // STEP * STEP
+    ledger.record(STREAM, "gru", start, reference=100.0, predicted=100.0)
+    ledger.record(STREAM, "arima", start, reference=100.0, predicted=101.0)
+
+    assert ledger.score(STREAM, start, 100.0) == {"gru": 0, "arima": 0}
+
+
+def test_directional_hit():
+    predicted = np.array([101.0, 99.0, 100.0, 101.0, 100.0])
+    actual = np.array([102.0, 102.0, 101.0, 100.0, 100.0])
+    np.testing.assert_array_equal(directional_hit(predicted, 100.0, actual), [True, False, False, False, False])
+
+
+def test_replay_after_restart(path):
+    start = now_ms() // STEP * STEP
+    ledger = PredictionLedger(path)
+    ledger.record(STREAM, "gru", start, reference=100.0, predicted=101.0)
+    ledger.score(STREAM, start, 102.0)
+    ledger.record(STREAM, "gru", start + STEP, reference=102.0, predicted=101.0)
+    ledger.record(STREAM, "arima", start + STEP, reference=102.0, predicted=103.0)
+    ledger.close()
+
+    ledger = PredictionLedger(path)
+    assert totals(ledger, "gru")["count"] == 1
+    assert sorted(entry[0] for entry in ledger._pending[STREAM]) == ["arima", "gru"]
+    # Pending predictions survive the restart and are scored as usual
+    assert ledger.score(STREAM, start + STEP, 100.0) == {"gru": 1, "arima": 0}
+    assert totals(ledger, "gru")["count"] == 2
+    ledger.close()
+
+
+def test_compaction_keeps_all_time_totals(path):
+    old = now_ms() - RETENTION_MS - 3_600_000
+    recent = now_ms() // STEP * STEP
+    ledger = PredictionLedger(path)
+    for i in range(3):
+        ledger.record(STREAM, "gru", old + i * STEP, reference=100.0, predicted=101.0, timestamp=old + i * STEP)
+        ledger.score(STREAM, old + i * STEP, 102.0 if i else 98.0, timestamp=old + i * STEP + STEP)
+    # Expired and never scored, so it is dropped without counting
+    ledger.record(STREAM, "gru", old - 10 * STEP, reference=100.0, predicted=101.0, timestamp=old)
+    ledger.record(STREAM, "gru", recent, reference=100.0, predicted=101.0)
+    ledger.score(STREAM, recent, 102.0)
+    ledger.record(STREAM, "gru", recent + STEP, reference=102.0, predicted=103.0)
+
+    ledger.compact()
+
+    # The recent scored record and the prediction still waiting for its candle
+    records = np.fromfile(path, dtype=RECORD_DTYPE)
+    assert len(records) == 2
+    assert (records["timestamp"] >= recent - STEP).all()
+    with open(ledger.checkpoint_path) as file:
+        checkpoint = json.load(file)
+    assert checkpoint["all"] == {STREAM: {"gru": {"count": 3, "hits": 2, "error_sum": pytest.approx(5.0)}}}
+    # The running aggregates are not changed by compaction
+    assert totals(ledger, "gru")["count"] == 4
+    ledger.close()
+
+    # After a restart the folded records count through the checkpoint only
+    ledger = PredictionLedger(path)
+    all_time = totals(ledger, "gru")
+    assert all_time["count"] == 4 and all_time["hits"] == 3
+    assert totals(ledger, "gru", "7d")["count"] == 1
+    assert ledger.score(STREAM, recent + STEP, 104.0) == {"gru": 1}
+
+    # Compacting again never counts the folded records twice
+    ledger.compact()
+    ledger.close()
+    ledger = PredictionLedger(path)
+    assert totals(ledger, "gru")["count"] == 5
+    ledger.close()
+
+
+def test_rejects_keys_that_do_not_fit(ledger):
+    long_stream = "kline.240." + "1" * MAX_STREAM_LENGTH + "USDT"
+    with pytest.raises(ValueError):
+        ledger.record(long_stream, "gru", 0, reference=1.0, predicted=1.0)
+    with pytest.raises(ValueError):
+        ledger.record(STREAM, "g" * 17, 0, reference=1.0, predicted=1.0)
+
+    # Keys that fill the field exactly are accepted
+    stream = "kline.240." + "X" * (MAX_STREAM_LENGTH - 10)
+    ledger.record(stream, "m" * 16, 0, reference=1.0, predicted=2.0)
+    ledger.score(stream, 0, 3.0)
+    assert totals(ledger, "m" * 16, stream=stream)["hits"] == 1
@@ -0,0 +1,189 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference import InferenceScheduler
+from model_registry import ModelRegistry
+
+WINDOW = 4
+
+
+class StubModel:
+    """
+    Predicts a constant; ``on_predict`` runs inside ``predict``, to race a batch.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.on_predict = None
+
+    def predict(self, X, batch_size=None, verbose=0):
+        if self.on_predict is not None:
+            self.on_predict()
+        return np.full((len(X), 1), self.value)
+
+
+class StubLoader:
+    """
+    Loads a ``StubModel`` per file; loads of ``held`` files wait until released.
+
+    The model loaded from "<name>.npz" predicts the name's position in ``names``.
+    """
+
+    def __init__(self, names, held=(), broken=()):
+        self.names = list(names)
+        self.broken = set(broken)
+        self.gates = {name: threading.Event() for name in held}
+        self.loaded = {}
+
+    def __call__(self, path):
+        name = path[:-len(".npz")]
+        gate = self.gates.get(name)
+        if gate is not None:
+            assert gate.wait(5)
+        if name in self.broken:
+            raise OSError(f"cannot read {path}")
+        model = self.loaded[name] = StubModel(float(self.names.index(name)))
+        return model
+
+    def release(self, name):
+        self.gates[name].set()
+
+
+def make_registry(loader, state_path=None):
+    registry = ModelRegistry({name: f"{name}.npz" for name in loader.names}, WINDOW,
+                             state_path=state_path, warmup_batch=2, loader=loader)
+    registry.start("a")
+    return registry
+
+
+def settled(registry):
+    deadline = time.monotonic() + 5
+    while registry.loading:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return registry.status()
+
+
+def test_promote_while_loading_activates_once_warm(tmp_path):
+    loader = StubLoader("abc", held="b")
+    registry = make_registry(loader, str(tmp_path / "models.json"))
+
+    registry.load("b")
+    registry.promote("b")
+    assert registry.status()["loading"] == ["b"]
+    assert registry.active_name == "a"
+
+    loader.release("b")
+    status = settled(registry)
+
+    assert status["active"] == "b" and status["shadows"] == ["a"]
+    assert registry.active[1] is loader.loaded["b"]
+    assert registry._activate_on_load == set()
+    # A restarted registry comes back with the promoted model
+    assert make_registry(StubLoader("abc"), str(tmp_path / "models.json")).active_name == "b"
+
+
+def test_promote_of_a_shadow_swaps_at_once():
+    loader = StubLoader("abc")
+    registry = make_registry(loader)
+    registry.load("b")
+    settled(registry)
+    a = registry.active[1]
+
+    registry.promote("b")
+
+    assert registry.active == ("b", loader.loaded["b"])
+    assert registry.shadows == {"a": a}
+    # Promoting the active model changes nothing
+    registry.promote("b")
+    assert registry.status()["shadows"] == ["a"]
+
+
+def test_unload_racing_with_a_load_cancels_it():
+    loader = StubLoader("abc", held="bc")
+    registry = make_registry(loader)
+    registry.load("b")
+    registry.promote("c")
+
+    assert registry.unload("b")
+    # A pending promotion is not cancelled
+    assert not registry.unload("c")
+    assert registry.status()["loading"] == ["c"]
+    loader.release("b")
+    loader.release("c")
+    status = settled(registry)
+
+    assert status["active"] == "c" and status["shadows"] == ["a"]
+    assert not registry.unload("b")
+
+
+def test_unload_then_load_again_keeps_the_load():
+    loader = StubLoader("ab", held="b")
+    registry = make_registry(loader)
+    registry.load("b")
+    registry.unload("b")
+    registry.load("b")
+
+    loader.release("b")
+
+    assert settled(registry)["shadows"] == ["b"]
+
+
+def test_failed_load_clears_the_pending_promotion():
+    loader = StubLoader("abc", held="b", broken="b")
+    registry = make_registry(loader)
+    registry.promote("b")
+    loader.release("b")
+    status = settled(registry)
+
+    assert status["active"] == "a"
+    assert "cannot read" in status["errors"]["b"]
+    assert registry._activate_on_load == set()
+
+    # Loading it as a shadow later does not promote it
+    loader.broken.clear()
+    registry.load("b")
+    status = settled(registry)
+    assert status["active"] == "a" and status["shadows"] == ["b"]
+    assert status["errors"] == {}
+
+
+def test_unknown_model_is_rejected():
+    registry = make_registry(StubLoader("ab"))
+    with pytest.raises(KeyError):
+        registry.promote("z")
+    with pytest.raises(KeyError):
+        registry.load("z")
+
+
+def test_batch_is_recorded_under_the_model_that_ran_it():
+    loader = StubLoader("abc")
+    registry = make_registry(loader)
+    registry.load("b")
+    registry.load("c")
+    settled(registry)
+    # The active model is replaced while it answers the batch
+    loader.loaded["a"].on_predict = lambda: registry.promote("b")
+    scheduler = InferenceScheduler(registry)
+    answered, recorded = [], []
+
+    windows = [np.array([1.0, 2.0, 3.0, 5.0]), np.array([10.0, 20.0, 30.0, 50.0])]
+    batch = [(key, window, lambda key, price: answered.append((key, price))) for key, window in enumerate(windows)]
+    scheduler.run_batch(batch, record_callbacks=[lambda *record: recorded.append(record)] * 2)
+
+    assert registry.active_name == "b"
+    # Model "a" predicts 0, the minimum of the window
+    assert answered == [(0, 1.0), (1, 10.0)]
+    by_model = {}
+    for key, name, price in recorded:
+        by_model.setdefault(name, []).append((key, price))
+    # "a" ran the batch and is recorded once, although it is a shadow by the time shadows run;
+    # "b" answers from the next batch on
+    assert by_model == {"a": [(0, 1.0), (1, 10.0)], "c": [(0, 9.0), (1, 90.0)]}
+
+    scheduler.run_batch(batch[:1], record_callbacks=[lambda *record: recorded.append(record)])
+    assert answered[-1] == (0, 5.0)
+    assert sorted(name for _, name, _ in recorded[-3:]) == ["a", "b", "c"]
@@ -0,0 +1,123 @@
+import os
+import signal
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from pipeline import ArimaPool, LatestWindowQueue
+
+HISTORY = 100.0 + np.cumsum(np.random.default_rng(3).normal(0.0, 1.0, 60))
+
+
+class Forecasts:
+    def __init__(self):
+        self.values = {}
+        self.event = threading.Event()
+
+    def __call__(self, key, forecast):
+        self.values[key] = forecast
+        self.event.set()
+
+    def wait(self, timeout=120):
+        received = self.event.wait(timeout)
+        self.event.clear()
+        return received
+
+
+def wait_until(condition, timeout=120):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def pool():
+    pool = ArimaPool(workers=1, mode="incremental")
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def test_latest_window_queue_keeps_newest_per_key():
+    queue = LatestWindowQueue(maxsize=2)
+    queue.put("a", 1)
+    queue.put("a", 2)
+    queue.put("b", 3)
+    queue.put("c", 4)
+
+    assert queue.get_batch(10) == [("b", 3), ("c", 4)]
+    assert queue.dropped == 2
+    queue.close()
+    assert not queue.wait()
+
+
+def test_forecast_and_pending_window_replaced(pool):
+    forecasts = Forecasts()
+    pool.submit("s", HISTORY, 1, forecasts)
+    pool.submit("s", HISTORY, 2, forecasts)
+    pool.submit("s", HISTORY, 3, forecasts)
+
+    assert wait_until(lambda: not pool._in_flight)
+    assert np.isfinite(forecasts.values["s"])
+    assert pool.dropped == 1
+
+
+def test_killed_worker_is_restarted(pool):
+    forecasts = Forecasts()
+    pool.submit("s", HISTORY, 1, forecasts)
+    assert forecasts.wait()
+    assert wait_until(lambda: not pool._in_flight)
+
+    for pid in pool.pids():
+        os.kill(pid, signal.SIGKILL)
+    # The executor notices the dead worker asynchronously; until then a submitted fit fails with it
+    assert wait_until(lambda: pool._executors[0]._broken)
+
+    pool.submit("s", HISTORY, 2, forecasts)
+    assert forecasts.wait()
+    assert not pool._executors[0]._broken
+    assert wait_until(lambda: not pool._in_flight)
+
+
+def test_worker_killed_during_fit_frees_the_stream(pool):
+    forecasts = Forecasts()
+    pool.submit("warmup", HISTORY, 1, forecasts)
+    assert forecasts.wait()
+
+    pool.submit("s", HISTORY, 1, forecasts)
+    for pid in pool.pids():
+        os.kill(pid, signal.SIGKILL)
+
+    assert wait_until(lambda: not pool._in_flight)
+    pool.submit("s", HISTORY, 2, forecasts)
+    assert forecasts.wait()
+    assert np.isfinite(forecasts.values["s"])
+
+
+def test_submit_after_shutdown_does_not_leak_in_flight(pool):
+    pool.shutdown(wait=True)
+
+    pool.submit("s", HISTORY, 1, Forecasts())
+
+    assert not pool._in_flight
+    assert not pool._pending
+
+
+def test_broken_pool_after_shutdown_is_not_restarted(pool):
+    forecasts = Forecasts()
+    pool.submit("s", HISTORY, 1, forecasts)
+    assert forecasts.wait()
+    executor = pool._executors[0]
+    for pid in pool.pids():
+        os.kill(pid, signal.SIGKILL)
+    assert wait_until(lambda: executor._broken)
+    pool.shutdown(wait=True)
+
+    pool.submit("s", HISTORY, 2, forecasts)
+
+    assert pool._executors[0] is executor
+    assert not pool._in_flight
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from ring_buffer import CANDLE_COLUMNS, CandleRingBuffer
+
+
+def candle(i):
+    return [i, i + 0.5, i - 0.5, i + 0.25, 10.0 * i, 100.0 * i]
+
+
+def test_rejects_non_positive_capacity():
+    with pytest.raises(ValueError):
+        CandleRingBuffer(0)
+
+
+def test_window_before_full():
+    buffer = CandleRingBuffer(5)
+    for i in range(3):
+        buffer.append(candle(i))
+
+    assert len(buffer) == 3
+    assert not buffer.full
+    np.testing.assert_array_equal(buffer.window("open"), [0, 1, 2])
+    np.testing.assert_array_equal(buffer.window("open", n=10), [0, 1, 2])
+
+
+@pytest.mark.parametrize("appended", [5, 6, 12, 17])
+def test_wraparound_keeps_latest_rows_in_order(appended):
+    capacity = 5
+    buffer = CandleRingBuffer(capacity)
+    for i in range(appended):
+        buffer.append(candle(i))
+
+    assert len(buffer) == capacity
+    assert buffer.full
+    expected = np.arange(appended - capacity, appended, dtype=np.float64)
+    np.testing.assert_array_equal(buffer.window("open"), expected)
+    np.testing.assert_array_equal(buffer.window("volume", n=2), 10.0 * expected[-2:])
+    np.testing.assert_array_equal(buffer.windows(), np.array([candle(i) for i in expected]).T)
+    assert buffer.latest("close") == appended - 1 + 0.25
+
+
+def test_views_are_zero_copy_and_read_only():
+    buffer = CandleRingBuffer(4)
+    for i in range(6):
+        buffer.append(candle(i))
+
+    for view in (buffer.window("close"), buffer.windows(), buffer.windows(("high", "low", "close"))):
+        assert not view.flags.writeable
+        assert np.shares_memory(view, buffer._data)
+        with pytest.raises(ValueError):
+            view[..., 0] = -1.0
+    assert buffer.window("close").flags.c_contiguous
+
+
+def test_non_adjacent_columns_are_read_only_copies():
+    buffer = CandleRingBuffer(4)
+    buffer.append(candle(1))
+
+    view = buffer.windows(("open", "close"))
+
+    np.testing.assert_array_equal(view[:, -1], [1, 1.25])
+    assert not view.flags.writeable
+    assert not np.shares_memory(view, buffer._data)
+
+
+def test_append_mapping_with_strings_and_missing_columns():
+    buffer = CandleRingBuffer(2)
+    buffer.append({"open": "1.5", "high": "2", "low": "1", "close": "1.75", "volume": "3"})
+
+    assert buffer.latest("open") == 1.5
+    assert np.isnan(buffer.latest("turnover"))
+    assert buffer.columns == CANDLE_COLUMNS
+
+
+def test_latest_of_empty_buffer():
+    assert CandleRingBuffer(2).latest() is None
@@ -1,24 +1,154 @@
+import asyncio
+import functools
 import logging
+import time
 from datetime import datetime
 
-from pmdarima import auto_arima
-from pmdarima.arima import ARIMA
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
-import websocketBybit
+from broadcast import Broadcaster
 from config import Config
-from tradingview import get_technical_analysis
+from ipc import EngineUnavailable
+from sharding import ShardedEngineClient
+from subscriptions import SubscriptionRegistry
+from tradingview import TechnicalAnalysisCache
 from logging_config import setup_logging
+from metrics import REGISTRY, LatencyTracker, MetricsServer
 
 # Load configuration
 config = Config()
 token = config.get("telegram_bot_token")
 
+# Client for the prediction engine processes, routing each symbol to its shard
+engine = ShardedEngineClient(
+    config.ipc_socket_path,
+    config.symbols,
+    shards=config.get("engine_shards", 1),
+    timeout=config.get("ipc_timeout", 2.0),
+)
+
+# Shared TradingView cache for /recommend
+analysis_cache = TechnicalAnalysisCache(
+    ttl_fraction=config.get("tradingview_ttl_fraction", 0.2),
+    batch_window=config.get("tradingview_batch_window_ms", 50) / 1000,
+)
+
 # Set up logging
-setup_logging("app.log")
+setup_logging("bot.log", config)
+
+# Chats receiving every forecast of a stream, and the rate-limited queue delivering them
+subscriptions = SubscriptionRegistry(config.subscriptions_path)
+broadcaster = Broadcaster(
+    rate=config.get("push_rate_limit", 25),
+    chat_interval=config.get("push_chat_interval", 1.0),
+    group_interval=config.get("push_group_interval", 3.0),
+    max_concurrent=config.get("push_concurrency", 16),
+    max_retries=config.get("push_max_retries", 3),
+    on_forbidden=lambda chat_id: subscriptions.unsubscribe(chat_id),
+)
+
+def parse_stream_args(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Extract the optional symbol and interval arguments of a command.
+
+    Args:
+        context (ContextTypes.DEFAULT_TYPE): The handler context with the command arguments.
+
+    Returns:
+        tuple: (symbol, interval); missing values are None and resolve to the default stream.
+    """
+    args = context.args if context.args else []
+    symbol = args[0].upper() if len(args) > 0 else None
+    interval = args[1] if len(args) > 1 else None
+    return symbol, interval
+
+
+async def query_engine(message, context: ContextTypes.DEFAULT_TYPE, op):
+    """
+    Request a stream snapshot from the engine and report failures to the user.
+
+    Args:
+        message: The Telegram message to reply to on failure.
+        context (ContextTypes.DEFAULT_TYPE): The handler context with the command arguments.
+        op (str): The engine operation.
+
+    Returns:
+        dict: The engine response, or None if the user has already been answered.
+    """
+    symbol, interval = parse_stream_args(context)
+    try:
+        with engine_latency.time(op):
+            response = await engine.request(op, symbol=symbol, interval=interval)
+    except EngineUnavailable as e:
+        engine_errors.inc()
+        await message.reply_text("Сервис прогнозов недоступен. Попробуйте позже.")
+        logging.error(f"Engine request failed: {e}")
+        return None
+
+    if response.get("error") == "unknown_stream":
+        await message.reply_text(f"Поток {response['symbol']} / {response['interval']} не отслеживается.")
+        return None
+    if "error" in response:
+        await message.reply_text(f"Ошибка при получении данных: {response['error']}")
+        logging.error(f"Engine error: {response['error']}")
+        return None
+    return response
+
+
+# Per-command latency histograms, queried with /latency and exported on /metrics
+command_latency = LatencyTracker(
+    registry=REGISTRY, metric="bot_command_seconds", help_text="Time to handle a bot command", label="command"
+)
+engine_latency = LatencyTracker(
+    registry=REGISTRY, metric="bot_engine_request_seconds", help_text="Round trip of an engine request", label="op"
+)
+engine_errors = REGISTRY.counter("bot_engine_errors_total", "Engine requests that failed to connect or timed out")
+command_timeouts = REGISTRY.counter("bot_command_timeouts_total", "Bot commands that hit command_timeout")
+for result in ("sent", "retried", "failed", "dropped"):
+    REGISTRY.counter_func("bot_push_messages_total", "Pushed forecast messages by outcome",
+                          functools.partial(getattr, broadcaster, result), result=result)
+
+# Bounds the number of commands handled at once and how long each may take
+command_slots = asyncio.Semaphore(config.get("max_concurrent_commands", 32))
+command_timeout = config.get("command_timeout", 10.0)
+admin_user_ids = set(config.get("admin_user_ids", []))
+
+
+def command(name):
+    """
+    Wrap a command handler with bounded concurrency, a timeout and latency tracking.
+
+    Args:
+        name (str): The command name used for the latency histogram.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            started = time.perf_counter()
+            try:
+                async with command_slots:
+                    await asyncio.wait_for(handler(update, context), command_timeout)
+            except asyncio.TimeoutError:
+                command_timeouts.inc()
+                logging.warning(f"/{name} timed out after {command_timeout} s")
+                if update.message:
+                    await update.message.reply_text("Превышено время ожидания. Попробуйте позже.")
+            finally:
+                command_latency.observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+# Rolling windows shown by /stats
+STATS_WINDOWS = (("1h", "1 час"), ("24h", "24 часа"), ("7d", "7 дней"), ("all", "Всего"))
+
 
 # Function for /start command
+@command("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.message
     logging.info("Received /start command")
@@ -26,25 +156,27 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await message.reply_text("Привет! Я готов отправлять прогнозы цен.")
     logging.info("Sent start response")
 
-# Function for /predict command
-async def send_prediction(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    message = update.message
-    logging.info("Received /predict command")
-    if message:
-        predicted_price_gru, predicted_price_arima = websocketBybit.get_last_predicted_price()
-        last_closing_prices = websocketBybit.last_closing_prices
-        if predicted_price_gru is not None and predicted_price_arima is not None and last_closing_prices:
-            current_price = last_closing_prices[-1]
-
-            difference_gru = predicted_price_gru - current_price
-            difference_percentage_gru = (difference_gru / current_price) * 100
-            prediction_gru = "вырастет 📈" if difference_gru > 0 else "упадет 📉"
-            
-            difference_arima = predicted_price_arima - current_price
-            difference_percentage_arima = (difference_arima / current_price) * 100
-            prediction_arima = "вырастет 📈" if difference_arima > 0 else "упадет 📉"
+def format_prediction(predicted_price_gru, predicted_price_arima, current_price):
+    """
+    Render the forecasts of both models, as sent by /predict and pushed to subscribers.
 
-            response = f"""
+    Args:
+        predicted_price_gru (float): The GRU forecast.
+        predicted_price_arima (float): The ARIMA forecast.
+        current_price (float): The close the forecasts were made from.
+
+    Returns:
+        str: The message text.
+    """
+    difference_gru = predicted_price_gru - current_price
+    difference_percentage_gru = (difference_gru / current_price) * 100
+    prediction_gru = "вырастет 📈" if difference_gru > 0 else "упадет 📉"
+
+    difference_arima = predicted_price_arima - current_price
+    difference_percentage_arima = (difference_arima / current_price) * 100
+    prediction_arima = "вырастет 📈" if difference_arima > 0 else "упадет 📉"
+
+    return f"""
                 GRU:
                 Прогнозируемая следующая цена закрытия: {predicted_price_gru}
                 Текущая цена: {current_price}
@@ -59,6 +191,21 @@ async def send_prediction(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 Разница в процентах: {difference_percentage_arima:.2f}%
                 Прогноз: Цена {prediction_arima}
             """
+
+# Function for /predict command
+@command("predict")
+async def send_prediction(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    message = update.message
+    logging.info("Received /predict command")
+    if message:
+        snapshot = await query_engine(message, context, "predict")
+        if snapshot is None:
+            return
+        predicted_price_gru = snapshot["gru"]
+        predicted_price_arima = snapshot["arima"]
+        current_price = snapshot["current_price"]
+        if predicted_price_gru is not None and predicted_price_arima is not None and current_price is not None:
+            response = format_prediction(predicted_price_gru, predicted_price_arima, current_price)
             await message.reply_text(response)
             logging.info("Sent prediction response")
         else:
@@ -66,17 +213,22 @@ async def send_prediction(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             logging.info("Prediction not available")
 
 # Function for /current command
+@command("current")
 async def send_current_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.message
     logging.info("Received /current command")
     if message:
-        candle_data = websocketBybit.get_last_candle_data()
+        snapshot = await query_engine(message, context, "current")
+        if snapshot is None:
+            return
+        candle_data = snapshot["candle"]
         if candle_data:
             start_timestamp = candle_data["start"]
             end_timestamp = candle_data["end"]
             start_str = datetime.fromtimestamp(start_timestamp / 1000).strftime("%Y-%m-%d %H:%M:%S")
             end_str = datetime.fromtimestamp(end_timestamp / 1000).strftime("%Y-%m-%d %H:%M:%S")
             response = f"""
+                Symbol: {snapshot['symbol']}
                 Interval: {candle_data['interval']} min
                 Start: {start_str}, End: {end_str}
                 Open: {candle_data['open']}, Close: {candle_data['close']}
@@ -90,40 +242,81 @@ async def send_current_info(update: Update, context: ContextTypes.DEFAULT_TYPE)
             logging.info("Current candle data not available")
 
 # Function for /stats command
+@command("stats")
 async def send_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.message
     logging.info("Received /stats command")
     if message:
-        successful_gru, unsuccessful_gru, successful_arima, unsuccessful_arima = websocketBybit.get_prediction_statistics()
-        response = f"""
-            Статистика прогнозов:
-
-            GRU:
-            Удачных прогнозов: {successful_gru}
-            Неудачных прогнозов: {unsuccessful_gru}
-            
-            ARIMA:
-            Удачных прогнозов: {successful_arima}
-            Неудачных прогнозов: {unsuccessful_arima}
-        """
+        snapshot = await query_engine(message, context, "stats")
+        if snapshot is None:
+            return
+        lines = [f"Статистика прогнозов {snapshot['symbol']} / {snapshot['interval']}:"]
+        active_model = snapshot.get("active_model")
+        for model_name, windows in snapshot["models"].items():
+            lines.append("")
+            # GRU forecasts are scored under the registry name of the model that made them
+            lines.append(f"GRU ({model_name}):" if model_name == active_model else f"{model_name.upper()}:")
+            for window_name, label in STATS_WINDOWS:
+                stats = windows[window_name]
+                if not stats["count"]:
+                    lines.append(f"{label}: нет оцененных прогнозов")
+                    continue
+                lines.append(
+                    f"{label}: удачных {stats['hits']} из {stats['count']} "
+                    f"({stats['hit_rate'] * 100:.1f}%), MAE {stats['mae']:.4f}"
+                )
+        if not snapshot["models"]:
+            lines.append("Оцененных прогнозов пока нет.")
+        response = "\n".join(lines)
         await message.reply_text(response)
         logging.info("Sent stats response")
 
+async def local_summary(symbol, interval):
+    """
+    Ask the engine for its indicator summary of a streamed symbol.
+
+    Args:
+        symbol (str): The trading pair symbol.
+        interval (str): The kline interval.
+
+    Returns:
+        dict: The TradingView-style summary, or None if the engine does not stream the
+            symbol, is still warming up its indicators or is unavailable.
+    """
+    try:
+        with engine_latency.time("analysis"):
+            response = await engine.request("analysis", symbol=symbol, interval=interval)
+    except EngineUnavailable:
+        return None
+    return response.get("summary")
+
+
 # Function for /recommend command
+@command("recommend")
 async def send_recommendation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     message = update.message
     logging.info("Received /recommend command")
     if message:
         args = context.args if context.args else []
 
-        symbol = args[0] if len(args) > 0 else "BTCUSDT"
+        symbol = args[0].upper() if len(args) > 0 else "BTCUSDT"
         interval = args[1] if len(args) > 1 else "5"
         screener = args[2] if len(args) > 2 else "crypto"
         exchange = args[3] if len(args) > 3 else "Bybit"
 
         try:
-            analysis = get_technical_analysis(symbol, interval, screener, exchange)
-            summary = analysis.summary
+            # Streamed Bybit symbols are rated from the engine's own indicators, without a network call
+            summary = None
+            if screener.lower() == "crypto" and exchange.lower() == "bybit":
+                summary = await local_summary(symbol, interval)
+            source = "локальные индикаторы"
+            if summary is None:
+                # Shielded so a timed-out command does not cancel a fetch shared with other chats
+                analysis = await asyncio.shield(asyncio.wrap_future(
+                    analysis_cache.get_future(symbol, interval, screener, exchange)
+                ))
+                summary = analysis.summary
+                source = "TradingView"
 
             response = f"""
                 Рекомендация для {symbol} на {interval} интервале:
@@ -131,6 +324,7 @@ async def send_recommendation(update: Update, context: ContextTypes.DEFAULT_TYPE
                 Продавать: {summary['SELL']}
                 Держать: {summary['NEUTRAL']}
                 Итог: {summary['RECOMMENDATION']}
+                Источник: {source}
             """
             await message.reply_text(response)
             logging.info("Sent recommendation response")
@@ -138,8 +332,217 @@ async def send_recommendation(update: Update, context: ContextTypes.DEFAULT_TYPE
             await message.reply_text(f"Ошибка при получении данных: {e}")
             logging.error(f"Error getting recommendation: {e}")
 
-# Create an Application instance
-app = Application.builder().token(token).build()
+# Function for /subscribe command
+@command("subscribe")
+async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    message = update.message
+    logging.info("Received /subscribe command")
+    if message:
+        # Resolves the default stream and checks that the engine streams it
+        snapshot = await query_engine(message, context, "predict")
+        if snapshot is None:
+            return
+        topic = f"kline.{snapshot['interval']}.{snapshot['symbol']}"
+        if subscriptions.subscribe(message.chat_id, topic):
+            await message.reply_text(
+                f"Подписка оформлена: прогнозы {snapshot['symbol']} / {snapshot['interval']} "
+                f"будут приходить после закрытия каждой свечи."
+            )
+            logging.info(f"Chat {message.chat_id} subscribed to {topic}")
+        else:
+            await message.reply_text(f"Вы уже подписаны на {snapshot['symbol']} / {snapshot['interval']}.")
+
+# Function for /unsubscribe command
+@command("unsubscribe")
+async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    message = update.message
+    logging.info("Received /unsubscribe command")
+    if message:
+        # Without arguments every subscription of the chat is cancelled
+        symbol, interval = parse_stream_args(context)
+        topics = [
+            topic for topic in subscriptions.topics(message.chat_id)
+            if (symbol is None or topic.endswith(f".{symbol}"))
+            and (interval is None or topic.startswith(f"kline.{interval}."))
+        ]
+        removed = subscriptions.unsubscribe(message.chat_id, topics)
+        if removed:
+            streams = ", ".join(" / ".join(reversed(topic.split(".")[1:])) for topic in removed)
+            await message.reply_text(f"Подписка отменена: {streams}.")
+            logging.info(f"Chat {message.chat_id} unsubscribed from {', '.join(removed)}")
+        else:
+            await message.reply_text("Активных подписок не найдено.")
+
+
+async def push_predictions():
+    """
+    Forward the engine's forecasts to the subscribed chats.
+
+    Each forecast is rendered once and the same text is queued for every
+    subscriber of its stream; delivery pacing is left to the broadcaster.
+    """
+    async for event in engine.watch():
+        if event.get("event") != "prediction":
+            continue
+        chat_ids = subscriptions.chats(event["topic"])
+        if not chat_ids:
+            continue
+        text = f"Прогноз {event['symbol']} / {event['interval']}:" + format_prediction(
+            event["gru"], event["arima"], event["current_price"]
+        )
+        broadcaster.publish(chat_ids, event["topic"], text)
+        logging.debug("Queued %s forecast for %d chats", event["topic"], len(chat_ids))
+
+
+async def start_push(application: Application) -> None:
+    broadcaster.start(application.bot)
+    application.bot_data["push_task"] = asyncio.create_task(push_predictions())
+
+
+async def stop_push(application: Application) -> None:
+    task = application.bot_data.pop("push_task", None)
+    if task is not None:
+        task.cancel()
+    await broadcaster.stop()
+
+# Function for /cachestats command
+@command("cachestats")
+async def send_cache_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    message = update.message
+    logging.info("Received /cachestats command")
+    if message:
+        stats = analysis_cache.stats()
+        response = f"""
+            Кэш TradingView:
+            Попаданий: {stats['hits']}
+            Промахов: {stats['misses']}
+            Объединенных запросов: {stats['coalesced']}
+            Пакетных запросов: {stats['batches']}
+            Записей в кэше: {stats['entries']}
+        """
+        await message.reply_text(response)
+        logging.info("Sent cache stats response")
+
+async def check_admin(update: Update):
+    """
+    Answer non-admins that the command is restricted.
+
+    Args:
+        update (Update): The command update.
+
+    Returns:
+        bool: True if the sender is listed in admin_user_ids.
+    """
+    if update.effective_user is not None and update.effective_user.id in admin_user_ids:
+        return True
+    await update.message.reply_text("Команда доступна только администраторам.")
+    return False
+
+
+def format_model_status(responses):
+    """
+    Render the model registry status of every engine shard.
+
+    Args:
+        responses (dict): Shard index to the engine's registry status or error.
+
+    Returns:
+        str: The message text.
+    """
+    lines = []
+    for shard, status in responses.items():
+        if len(responses) > 1:
+            lines.append(f"Шард {shard}:")
+        if "error" in status:
+            lines.append(f"Ошибка: {status['error']}")
+            continue
+        lines.append(f"Активная модель: {status['active']}")
+        lines.append(f"Теневые модели: {', '.join(status['shadows']) or 'нет'}")
+        if status["loading"]:
+            lines.append(f"Загружаются: {', '.join(status['loading'])}")
+        for name, error in status["errors"].items():
+            lines.append(f"Ошибка загрузки {name}: {error}")
+        lines.append(f"Доступны: {', '.join(status['available'])}")
+    return "\n".join(lines)
+
+
+async def change_models(update: Update, context: ContextTypes.DEFAULT_TYPE, op, usage):
+    """
+    Run a model registry operation on every engine shard and reply with the new status.
+
+    Args:
+        update (Update): The command update.
+        context (ContextTypes.DEFAULT_TYPE): The handler context with the model name argument.
+        op (str): The engine operation.
+        usage (str): Reply when the model name is missing.
+    """
+    message = update.message
+    if not await check_admin(update):
+        return
+    name = context.args[0] if context.args else None
+    if op != "models" and name is None:
+        await message.reply_text(usage)
+        return
+    with engine_latency.time(op):
+        responses = await engine.request_all(op, name=name)
+    await message.reply_text(format_model_status(responses))
+    logging.info(f"Sent {op} response")
+
+# Function for /models command (admins only)
+@command("models")
+async def send_models(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    logging.info("Received /models command")
+    if update.message:
+        await change_models(update, context, "models", None)
+
+# Function for /shadow command (admins only): run a model alongside the active one
+@command("shadow")
+async def shadow_model(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    logging.info("Received /shadow command")
+    if update.message:
+        await change_models(update, context, "load_model", "Использование: /shadow <модель>")
+
+# Function for /unshadow command (admins only)
+@command("unshadow")
+async def unshadow_model(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    logging.info("Received /unshadow command")
+    if update.message:
+        await change_models(update, context, "unload_model", "Использование: /unshadow <модель>")
+
+# Function for /promote command (admins only): make a model active
+@command("promote")
+async def promote_model(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    logging.info("Received /promote command")
+    if update.message:
+        await change_models(update, context, "promote_model", "Использование: /promote <модель>")
+
+# Function for /latency command (admins only)
+@command("latency")
+async def send_latency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    message = update.message
+    logging.info("Received /latency command")
+    if message:
+        if not await check_admin(update):
+            return
+        lines = ["Задержка команд (p50 / p95 / p99, мс):"]
+        for name, stats in command_latency.percentiles().items():
+            lines.append(
+                f"/{name}: {stats['p50'] * 1000:.0f} / {stats['p95'] * 1000:.0f} / {stats['p99'] * 1000:.0f} "
+                f"({stats['count']} вызовов)"
+            )
+        await message.reply_text("\n".join(lines))
+        logging.info("Sent latency response")
+
+# Create an Application instance; updates are handled concurrently so one slow command
+# does not hold up the others
+app = (
+    Application.builder()
+    .token(token)
+    .concurrent_updates(config.get("max_concurrent_commands", 32))
+    .post_init(start_push)
+    .post_shutdown(stop_push)
+    .build()
+)
 
 # Register command handlers
 app.add_handler(CommandHandler("start", start))
@@ -147,8 +550,21 @@ app.add_handler(CommandHandler("predict", send_prediction))
 app.add_handler(CommandHandler("current", send_current_info))
 app.add_handler(CommandHandler("stats", send_stats))
 app.add_handler(CommandHandler("recommend", send_recommendation))
+app.add_handler(CommandHandler("subscribe", subscribe))
+app.add_handler(CommandHandler("unsubscribe", unsubscribe))
+app.add_handler(CommandHandler("cachestats", send_cache_stats))
+app.add_handler(CommandHandler("latency", send_latency))
+app.add_handler(CommandHandler("models", send_models))
+app.add_handler(CommandHandler("shadow", shadow_model))
+app.add_handler(CommandHandler("unshadow", unshadow_model))
+app.add_handler(CommandHandler("promote", promote_model))
+
+if __name__ == "__main__":
+    metrics_port = config.get("bot_metrics_port", 9102)
+    if metrics_port:
+        MetricsServer(REGISTRY, config.get("metrics_host", "127.0.0.1"), metrics_port).start()
 
-# Start polling
-logging.info("Starting bot polling")
-app.run_polling()
-logging.info("Bot polling started")
+    # Start polling
+    logging.info("Starting bot polling")
+    app.run_polling()
+    logging.info("Bot polling started")
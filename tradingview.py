@@ -1,4 +1,9 @@
-from tradingview_ta import Interval, TA_Handler
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from tradingview_ta import Interval, TA_Handler, get_multiple_analysis
 
 # Mapping of interval strings to TradingView TA intervals
 interval_map = {
@@ -14,6 +19,27 @@ interval_map = {
     "M": Interval.INTERVAL_1_MONTH,
 }
 
+# Interval lengths in seconds, used to derive cache TTLs
+interval_seconds = {
+    "1": 60,
+    "5": 300,
+    "15": 900,
+    "30": 1800,
+    "60": 3600,
+    "120": 7200,
+    "240": 14400,
+    "D": 86400,
+    "W": 604800,
+    "M": 2592000,
+}
+
+
+def validate_interval(interval):
+    if interval not in interval_map:
+        raise ValueError(
+            "Invalid interval. Allowed values: 1, 5, 15, 30, 60, 120, 240, D, W, M."
+        )
+
 
 def get_technical_analysis(symbol="BTCUSDT", interval="D", screener="crypto", exchange="Bybit"):
     """
@@ -33,10 +59,7 @@ def get_technical_analysis(symbol="BTCUSDT", interval="D", screener="crypto", ex
     """
 
     # Validate the interval
-    if interval not in interval_map:
-        raise ValueError(
-            "Invalid interval. Allowed values: 1, 5, 15, 30, 60, 120, 240, D, W, M."
-        )
+    validate_interval(interval)
 
     # Create a TA_Handler instance with the provided parameters
     handler = TA_Handler(
@@ -54,6 +77,160 @@ def get_technical_analysis(symbol="BTCUSDT", interval="D", screener="crypto", ex
         raise RuntimeError(f"Error retrieving technical analysis: {e}")
 
 
+class TechnicalAnalysisCache:
+    """
+    TTL cache in front of TradingView with request coalescing and batching.
+
+    Entries are keyed by (symbol, interval, screener, exchange) and live for a
+    fraction of the interval length. Concurrent requests for the same key share
+    one in-flight fetch, and misses arriving within ``batch_window`` seconds are
+    fetched together with one multi-symbol call per (screener, interval).
+    """
+
+    def __init__(self, ttl_fraction=0.2, min_ttl=15.0, batch_window=0.05, max_workers=4, timeout=10.0):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_fraction (float): Entry lifetime as a fraction of the interval length.
+            min_ttl (float): The minimum entry lifetime in seconds.
+            batch_window (float): Seconds to collect misses before fetching them together.
+            max_workers (int): The maximum number of concurrent TradingView requests.
+            timeout (float): The TradingView request timeout in seconds.
+        """
+        self.ttl_fraction = ttl_fraction
+        self.min_ttl = min_ttl
+        self.batch_window = batch_window
+        self.timeout = timeout
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+
+        self._entries = {}
+        self._in_flight = {}
+        self._queued = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="TradingView")
+
+    def ttl(self, interval):
+        return max(self.min_ttl, interval_seconds[interval] * self.ttl_fraction)
+
+    def get_future(self, symbol="BTCUSDT", interval="D", screener="crypto", exchange="Bybit"):
+        """
+        Request the technical analysis of a symbol without blocking.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The time interval for the analysis.
+            screener (str): The screener type.
+            exchange (str): The exchange name.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the Analysis object.
+
+        Raises:
+            ValueError: If the provided interval is not valid.
+        """
+        validate_interval(interval)
+        key = (symbol.upper(), interval, screener.lower(), exchange.upper())
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                future = Future()
+                future.set_result(entry[1])
+                return future
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            self.misses += 1
+            future = self._in_flight[key] = Future()
+            self._queued.append(key)
+            if self._timer is None:
+                self._timer = threading.Timer(self.batch_window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return future
+
+    def get(self, symbol="BTCUSDT", interval="D", screener="crypto", exchange="Bybit"):
+        """
+        Blocking variant of ``get_future``.
+
+        Returns:
+            Analysis: An analysis object containing the technical analysis data.
+        """
+        return self.get_future(symbol, interval, screener, exchange).result()
+
+    def _flush(self):
+        now = time.monotonic()
+        with self._lock:
+            queued, self._queued, self._timer = self._queued, [], None
+            # Drop expired entries so the cache does not grow with every symbol ever asked for
+            self._entries = {key: entry for key, entry in self._entries.items() if entry[0] > now}
+
+        groups = {}
+        for key in queued:
+            symbol, interval, screener, exchange = key
+            groups.setdefault((screener, interval), []).append(key)
+        for (screener, interval), keys in groups.items():
+            self._executor.submit(self._fetch, screener, interval, keys)
+
+    def _fetch(self, screener, interval, keys):
+        self.batches += 1
+        try:
+            analyses = get_multiple_analysis(
+                screener,
+                interval_map[interval],
+                [f"{exchange}:{symbol}" for symbol, _, _, exchange in keys],
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            logging.error(f"Error retrieving technical analysis batch: {e}")
+            analyses = {}
+            error = RuntimeError(f"Error retrieving technical analysis: {e}")
+        else:
+            error = None
+
+        expires = time.monotonic() + self.ttl(interval)
+        for key in keys:
+            symbol, _, _, exchange = key
+            analysis = analyses.get(f"{exchange}:{symbol}")
+            with self._lock:
+                future = self._in_flight.pop(key)
+                if analysis is not None:
+                    self._entries[key] = (expires, analysis)
+            if future.cancelled():
+                continue
+            if analysis is not None:
+                future.set_result(analysis)
+            else:
+                future.set_exception(error or RuntimeError(f"No technical analysis for {exchange}:{symbol}"))
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: hits, misses, coalesced requests, batches and cached entries.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "entries": len(self._entries),
+            }
+
+
 # Example usage
 if __name__ == "__main__":
     try:
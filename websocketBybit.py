@@ -1,220 +1,851 @@
-import _thread
-import json
+import asyncio
 import logging
+import math
 import os
+import signal
 import threading
+import time
 from datetime import datetime
 
-import numpy as np
-from pmdarima import auto_arima
-from pmdarima.arima import ARIMA
-import websocket
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import load_model
-
+from backfill import KlineBackfiller, find_gap, find_holes, interval_ms
+from bybit_client import BybitStream
+from candle_store import CandleStore
 from config import Config
 from logging_config import setup_logging
+from indicators import FEATURE_NAMES, WARMUP_CANDLES, IndicatorSet, RollingMinMax
+from inference import InferenceScheduler
+from ledger import MAX_STREAM_LENGTH, PredictionLedger
+from ipc import SnapshotServer
+from kline_parser import is_confirmed, loads, parse_klines, peek_timestamp, peek_topic
+from metrics import FAST_BUCKETS, REGISTRY, MetricsServer
+from model_registry import ModelRegistry, discover_models, model_name
+from pipeline import ArimaPool
+from ring_buffer import CANDLE_COLUMNS, CandleRingBuffer
+from sharding import assign_shards, shard_path
 
 # Set environment variable to turn off oneDNN optimizations
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 
-setup_logging("app.log")
-
 # Load configuration
 config = Config()
 
-# Load the GRU model
-model = load_model(config.model_path)
-scaler = MinMaxScaler(feature_range=(0, 1))
+# Share of the symbols this process streams; main.py starts one engine per shard
+shards = config.get("engine_shards", 1)
+shard = int(os.environ.get("ENGINE_SHARD", 0))
 
-# Initialize variables
-last_closing_prices = []
-last_predicted_price_gru = None
-last_predicted_price_arima = None
-last_candle_data = None
+setup_logging(shard_path("engine.log", shard, shards), config)
 
-successful_predictions_gru = 71
-unsuccessful_predictions_gru = 236
+window_size = config.get("window_size", 14)
 
-successful_predictions_arima = 20
-unsuccessful_predictions_arima = 112
+# Closed candles replayed into the indicators on warm start
+indicator_history = config.get("indicator_history", WARMUP_CANDLES + 100)
 
-window_size = config.get("window_size", 14)
+# Engine metrics, served on /metrics
+tick_messages = REGISTRY.counter("engine_messages_total", "Kline frames received", kind="tick")
+closed_messages = REGISTRY.counter("engine_messages_total", "Kline frames received", kind="closed")
+exchange_lag = REGISTRY.histogram(
+    "engine_exchange_lag_seconds", "Delay from the exchange timestamp of a frame to its receipt"
+)
+parse_time = REGISTRY.histogram("engine_parse_seconds", "Time to decode a confirmed kline frame", FAST_BUCKETS)
+prediction_time = {
+    model_name: REGISTRY.histogram(
+        "engine_prediction_seconds", "Time from a closing kline arriving to its forecast being available",
+        model=model_name.lower(),
+    )
+    for model_name in ("GRU", "ARIMA")
+}
+
+# "incremental" keeps a fitted ARIMA per stream, "full" re-runs the order search every candle
+arima_mode = config.get("arima_mode", "incremental")
+
+# Prediction workers, created by start()
+socket_conn = None
+model_registry = None
+scheduler = None
+arima_pool = None
+snapshot_server = None
+candle_store = None
+backfiller = None
+ledger = None
+
+# Last time the event loop ran the ticker of main(), reported to the supervisor's heartbeats
+loop_tick = None
+
+
+class StreamState:
+    """
+    Per-stream state for a single kline topic (symbol + interval).
+
+    Holds the OHLCV candle window, the streaming indicators and the latest
+    predictions that used to live in module globals; accuracy is tracked by
+    the prediction ledger.
+    """
+
+    def __init__(self, symbol, interval):
+        self.symbol = symbol
+        self.interval = interval
+        self.topic = f"kline.{interval}.{symbol}"
+        # Predictions are recorded in the ledger under the topic
+        if len(self.topic.encode()) > MAX_STREAM_LENGTH:
+            raise ValueError(f"Stream {self.topic} is longer than {MAX_STREAM_LENGTH} bytes")
+        self.candles = CandleRingBuffer(window_size)
+        self.indicators = IndicatorSet()
+        # Indicator values of the candles in the window, served by the "features" op
+        self.features = CandleRingBuffer(window_size, columns=FEATURE_NAMES)
+        # Running min/max of the window's closes, so scaling needs no pass over it
+        self.close_range = RollingMinMax(window_size)
+        self.last_predicted_price_gru = None
+        self.last_predicted_price_arima = None
+        self.last_candle_data = None
+        # Raw frame of the latest in-progress tick, decoded only when someone asks for it
+        self.current_frame = None
+        self.last_kline_start = None
+        self.closed_candles = 0
+
+    def current_candle(self):
+        """
+        Return the latest candle snapshot, decoding the pending in-progress frame if any.
+
+        Returns:
+            dict: The kline data of the latest tick, or None if nothing was received yet.
+        """
+        frame = self.current_frame
+        if frame is not None:
+            klines = parse_klines(frame)
+            if klines:
+                self.last_candle_data = klines[-1]
+            if self.current_frame is frame:
+                self.current_frame = None
+        return self.last_candle_data
+
+    def append_candle(self, values):
+        """
+        Append a closed candle to the window and update the indicators.
+
+        Args:
+            values: A sequence ordered like ``CANDLE_COLUMNS`` or a kline mapping.
+        """
+        self.candles.append(values)
+        candles = self.candles
+        close = candles.latest("close")
+        self.indicators.update(
+            candles.latest("open"), candles.latest("high"), candles.latest("low"), close, candles.latest("volume")
+        )
+        self.close_range.update(close)
+        self.features.append(self.indicators.features())
+
+    def warm_start(self, store):
+        """
+        Rehydrate the candle window and the indicators from the on-disk store.
+
+        Args:
+            store (CandleStore): The candle store.
+
+        Returns:
+            int: The number of candles loaded.
+        """
+        stored = store.tail(self.symbol, self.interval, max(window_size, indicator_history))
+        count = len(stored["start"])
+        for i in range(count):
+            self.append_candle([stored[name][i] for name in CANDLE_COLUMNS])
+        self.closed_candles = count
+        if count:
+            self.last_kline_start = int(stored["start"][-1])
+        return count
+
+    def backfill(self, store, backfiller, days):
+        """
+        Fetch the candles of the last ``days`` that are missing from the store.
+
+        Every hole is filled: history older than the oldest stored candle,
+        candles missed between two runs and those closed since the last run.
+
+        Args:
+            store (CandleStore): The candle store.
+            backfiller (KlineBackfiller): The REST client.
+            days (float): How far back to fetch.
+
+        Returns:
+            int: The number of candles fetched.
+        """
+        step = interval_ms(self.interval)
+        last_closed = (int(time.time() * 1000) // step - 1) * step
+        first = last_closed - int(days * 86_400_000) + step
+        stored = store.read(self.symbol, self.interval, first, last_closed)["start"]
+
+        fetched = 0
+        for hole_start, hole_end in find_holes(stored, first, last_closed, self.interval):
+            starts, rows = backfiller.fetch_range(self.symbol, self.interval, hole_start, hole_end)
+            store.append_many(self.symbol, self.interval, starts, rows)
+            fetched += len(starts)
+        if fetched:
+            store.compact(self.symbol, self.interval)
+        return fetched
+
+
+# Symbols of this shard and the configured intervals; every combination is one stream
+symbols = assign_shards(config.symbols, shards).get(shard, [])
+intervals = config.intervals
+
+# Stream states keyed by kline topic
+streams = {}
+for _symbol in symbols:
+    for _interval in intervals:
+        try:
+            _stream = StreamState(_symbol, _interval)
+        except ValueError as e:
+            logging.warning(f"Ignoring stream: {e}")
+            continue
+        streams[_stream.topic] = _stream
 
-logging.info("Initialization complete.")
+# Defaults of the whole deployment, so every shard resolves a bare command the same way
+default_symbol = config.symbols[0]
+default_interval = intervals[0]
 
+logging.info(f"Initialization complete. Shard {shard + 1}/{shards}, streams: {', '.join(streams)}")
 
-class SocketConn(websocket.WebSocketApp):
-    def __init__(self, url, params=[]):
-        super().__init__(url=url, on_open=self.on_open)
-        self.params = params
-        self.on_message = self.message
-        self.on_error = self.error
-        self.on_close = self.close
-        self.last_kline_timestamp = None
-        self.thread = threading.Thread(target=self.run_forever)
-        self.thread.start()
 
-    def on_open(self, ws):
-        logging.info("WebSocket connection opened.")
+def get_stream(symbol=None, interval=None):
+    """
+    Look up the state of a stream by symbol and interval.
+
+    Args:
+        symbol (str): The trading pair symbol (defaults to the first configured symbol).
+        interval (str): The kline interval (defaults to the first configured interval).
 
-        def run(*args):
-            trade_str = {"op": "subscribe", "args": self.params}
-            ws.send(json.dumps(trade_str))
+    Returns:
+        StreamState: The stream state, or None if the stream is not subscribed.
+    """
+    symbol = (symbol or default_symbol).upper()
+    interval = str(interval or default_interval)
+    return streams.get(f"kline.{interval}.{symbol}")
 
-        _thread.start_new_thread(run, ())
 
-    def message(self, ws, msg):
-        global last_candle_data, successful_predictions_gru, unsuccessful_predictions_gru
+class SocketConn:
+    """
+    Routes Bybit kline frames to their streams and triggers predictions.
 
+    The connection itself is a ``BybitStream``, so ``run`` is a coroutine that
+    can share an event loop with other components (e.g. the Telegram bot).
+    """
+
+    def __init__(self, url, params=[]):
+        self.params = params
+        self.client = BybitStream(
+            url,
+            params,
+            on_message=self.message,
+            ping_interval=config.get("ws_ping_interval", 20),
+            backoff_max=config.get("ws_backoff_max", 60),
+        )
+        # Forecasts of the latest candle per topic, pushed to watchers once every model has answered
+        self.pending_pushes = {}
+        self.push_lock = threading.Lock()
+
+    async def run(self):
+        await self.client.run()
+
+    async def stop(self):
+        await self.client.stop()
+
+    async def add_stream(self, symbol, interval):
+        """
+        Start streaming a symbol/interval pair at runtime.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+
+        Returns:
+            StreamState: The new (or already existing) stream.
+
+        Raises:
+            ValueError: If the topic is too long to be recorded in the prediction ledger.
+        """
+        stream = StreamState(symbol.upper(), str(interval))
+        if stream.topic in streams:
+            return streams[stream.topic]
+        if candle_store is not None:
+            stream.warm_start(candle_store)
+        streams[stream.topic] = stream
+        await self.client.subscribe([stream.topic])
+        logging.info(f"[{stream.topic}] Stream added")
+        return stream
+
+    async def remove_stream(self, symbol, interval):
+        """
+        Stop streaming a symbol/interval pair at runtime.
+
+        Args:
+            symbol (str): The trading pair symbol.
+            interval (str): The kline interval.
+        """
+        topic = f"kline.{interval}.{symbol.upper()}"
+        await self.client.unsubscribe([topic])
+        if streams.pop(topic, None) is not None:
+            logging.info(f"[{topic}] Stream removed")
+
+    async def message(self, msg):
+        received = time.perf_counter()
         try:
-            data = json.loads(msg)
-            if "topic" in data and data["topic"].startswith("kline"):
-                kline_info = data["data"][0]
-                close_price = float(kline_info["close"])
-                end_timestamp = kline_info["end"]
-
-                last_candle_data = kline_info  # Save last candle data
-
-                if self.last_kline_timestamp != end_timestamp:
-                    self.last_kline_timestamp = end_timestamp
-
-                    last_closing_prices.append(close_price)
-
-                    if len(last_closing_prices) > window_size:
-                        last_closing_prices.pop(0)
-
-                    logging.info(f"Accumulated closing prices: {len(last_closing_prices)}/{window_size}")
-
-                    if len(last_closing_prices) == window_size:
-                        self.predict_next_candle()
-
-                    start_timestamp = kline_info["start"]
-                    start_str = datetime.fromtimestamp(start_timestamp / 1000).strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    )
-                    end_str = datetime.fromtimestamp(end_timestamp / 1000).strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    )
-                    logging.info(
-                        f"""Криптовалюта: {symbol}, Интервал: {kline_info['interval']} min
-                    Данные свечи:
-                    Start: {start_str}, End: {end_str}
-                    Open: {kline_info['open']}, Close: {close_price}
-                    High: {kline_info['high']}, Low: {kline_info['low']}
-                    Volume: {kline_info['volume']}, Turnover: {kline_info['turnover']}
-                    """
-                    )
+            exchange_ts = peek_timestamp(msg)
+            if exchange_ts is not None:
+                exchange_lag.observe(max(0.0, time.time() - exchange_ts / 1000))
+
+            # Fast path: in-progress ticks only replace the raw "current candle" frame
+            topic = peek_topic(msg)
+            if topic is not None and not is_confirmed(msg):
+                stream = streams.get(topic)
+                if stream is not None:
+                    tick_messages.inc()
+                    stream.current_frame = msg
+                    return
+
+            data = loads(msg)
+            parse_time.observe(time.perf_counter() - received)
+            topic = data.get("topic", "")
+            if not topic.startswith("kline"):
+                return
+
+            stream = streams.get(topic)
+            if stream is None:
+                logging.warning(f"Received message for unknown topic: {topic}")
+                return
+
+            closed_messages.inc()
+            for kline_info in data["data"]:
+                if kline_info.get("confirm"):
+                    await self.on_closed_candle(stream, kline_info, received)
+            stream.last_candle_data = data["data"][-1]  # Save last candle data
+            stream.current_frame = None
         except Exception as e:
             logging.error(f"Error in message processing: {e}")
 
-    def error(self, ws, e):
-        logging.error(f"WebSocket error: {e}")
-
-    def close(self, ws):
-        logging.info("WebSocket connection closed.")
-
-    def predict_next_candle(self):
-        global last_predicted_price_gru, last_predicted_price_arima
-        global successful_predictions_gru, unsuccessful_predictions_gru
-        global successful_predictions_arima, unsuccessful_predictions_arima
+    async def on_closed_candle(self, stream, kline_info, received):
+        start_timestamp = kline_info["start"]
+        # Bybit may resend a confirmed candle; every candle is processed once
+        if stream.last_kline_start is not None and start_timestamp <= stream.last_kline_start:
+            return
+        close_price = float(kline_info["close"])
+        previous_start = stream.last_kline_start
+
+        # Candles closed while the socket was down are fetched over REST first
+        gap = find_gap(stream.last_kline_start, start_timestamp, stream.interval)
+        if gap is not None:
+            # Frames are handled on their own task and the REST calls run off the event loop,
+            # so the connection keeps reading heartbeat replies while the gap is repaired; the
+            # repair is not counted as handler time, so a slow one does not fail the heartbeat
+            previous_start = await self.client.run_in_thread(self.repair_gap, stream, *gap)
+
+        # Persist closed candles for warm starts and analysis
+        if candle_store is not None:
+            candle_store.append(stream.symbol, stream.interval, start_timestamp, kline_info)
+
+        stream.append_candle(kline_info)
+        stream.last_kline_start = start_timestamp
+        stream.closed_candles += 1
+
+        # Predictions made on the previous candle are scored against this close
+        if previous_start is not None:
+            self.score_predictions(stream, previous_start, close_price)
+
+        logging.debug("[%s] Accumulated closing prices: %d/%d", stream.topic, len(stream.candles), window_size)
+
+        if stream.candles.full:
+            self.predict_next_candle(stream, received)
+
+        # The full candle dump is debug output; skip the timestamp formatting unless it is enabled
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            start_str = datetime.fromtimestamp(start_timestamp / 1000).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            end_str = datetime.fromtimestamp(kline_info["end"] / 1000).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            logging.debug(
+                f"""Криптовалюта: {stream.symbol}, Интервал: {kline_info['interval']} min
+        Данные свечи:
+        Start: {start_str}, End: {end_str}
+        Open: {kline_info['open']}, Close: {close_price}
+        High: {kline_info['high']}, Low: {kline_info['low']}
+        Volume: {kline_info['volume']}, Turnover: {kline_info['turnover']}
+        """
+            )
+        else:
+            logging.info("[%s] Candle closed at %s", stream.topic, kline_info["close"])
+
+    def repair_gap(self, stream, first_start, last_start):
+        """
+        Fetch the candles missed between the last closed candle and a new one.
+
+        Returns:
+            int: The start of the last missing candle if the gap was repaired up to it,
+                otherwise None as the new candle does not follow a known one.
+        """
+        logging.warning(
+            f"[{stream.topic}] Gap detected: {(last_start - first_start) // interval_ms(stream.interval) + 1} candles missing"
+        )
         try:
-            # GRU Prediction
-            last_prices = np.array(last_closing_prices).reshape(-1, 1)
-            scaled_data = scaler.fit_transform(last_prices)
-            X_test = np.reshape(scaled_data, (1, scaled_data.shape[0], 1))
-            predicted_price_gru = model.predict(X_test)
-            last_predicted_price_gru = scaler.inverse_transform(predicted_price_gru)[0][0]
-            logging.info(f"Прогнозируемая цена (GRU): {last_predicted_price_gru}")
-
-            # ARIMA Prediction
-            history = list(last_closing_prices)
-            model_arima = auto_arima(history, start_p=1, start_q=1, max_p=3, max_q=3, d=1,
-                                     trace=False, error_action='ignore', suppress_warnings=True)
-            forecast_arima = model_arima.predict(n_periods=1)[0]
-            last_predicted_price_arima = forecast_arima
-            logging.info(f"Прогнозируемая цена (ARIMA): {last_predicted_price_arima}")
-
-
-            if last_predicted_price_gru and last_closing_prices:
-                current_price = last_closing_prices[-1]
-                previous_price = last_closing_prices[-2]
-
-                # GRU Evaluation
-                difference_gru = last_predicted_price_gru - current_price
-                difference_percentage_gru = (difference_gru / current_price) * 100
-                prediction_gru = "вырастет 📈" if difference_gru > 0 else "упадет 📉"
-                logging.info(
-                    f"GRU - Текущая цена: {current_price}, Прогнозируемая цена: {last_predicted_price_gru}"
-                )
-                logging.info(
-                    f"GRU - Разница: {difference_gru}, Разница в процентах: {difference_percentage_gru:.2f}%, Прогноз: Цена {prediction_gru}"
-                )
-
-                # ARIMA Evaluation
-                difference_arima = last_predicted_price_arima - current_price
-                difference_percentage_arima = (difference_arima / current_price) * 100
-                prediction_arima = "вырастет 📈" if difference_arima > 0 else "упадет 📉"
-                logging.info(
-                    f"ARIMA - Текущая цена: {current_price}, Прогнозируемая цена: {last_predicted_price_arima}"
-                )
-                logging.info(
-                    f"ARIMA - Разница: {difference_arima}, Разница в процентах: {difference_percentage_arima:.2f}%, Прогноз: Цена {prediction_arima}"
-                )
-
-                # Update statistics for GRU
-                if (difference_gru > 0 and current_price > previous_price) or (
-                    difference_gru < 0 and current_price < previous_price
-                ):
-                    successful_predictions_gru += 1
-                else:
-                    unsuccessful_predictions_gru += 1
-
-                # Update statistics for ARIMA
-                if (difference_arima > 0 and current_price > previous_price) or (
-                    difference_arima < 0 and current_price < previous_price
-                ):
-                    successful_predictions_arima += 1
-                else:
-                    unsuccessful_predictions_arima += 1
-
-                logging.info(
-                    f"Updated statistics - GRU Successful: {successful_predictions_gru}, Unsuccessful: {unsuccessful_predictions_gru}"
-                )
-                logging.info(
-                    f"Updated statistics - ARIMA Successful: {successful_predictions_arima}, Unsuccessful: {unsuccessful_predictions_arima}"
-                )
+            starts, rows = backfiller.fetch_range(stream.symbol, stream.interval, first_start, last_start)
         except Exception as e:
-            logging.error(f"Error in prediction: {e}")
-
-
-def get_last_predicted_price():
-    logging.info(f"Last predicted price (GRU): {last_predicted_price_gru}")
-    logging.info(f"Last predicted price (ARIMA): {last_predicted_price_arima}")
-    return last_predicted_price_gru, last_predicted_price_arima
-
-def get_last_candle_data():
-    logging.info(f"Last candle data: {last_candle_data}")
-    return last_candle_data  # Returns the last candle information
-
-
-def get_prediction_statistics():
-    logging.info(
-            f"""Prediction statistics GRU:
-                    Successful: {successful_predictions_gru}, 
-                    Unsuccessful: {unsuccessful_predictions_gru}
-                    Prediction statistics ARIMA:
-                    Successful: {successful_predictions_arima}, 
-                    Unsuccessful: {unsuccessful_predictions_arima}"""
+            logging.error(f"[{stream.topic}] Gap repair failed: {e}")
+            return None
+
+        candle_store.append_many(stream.symbol, stream.interval, starts, rows)
+        for row in rows:
+            stream.append_candle(row)
+        stream.closed_candles += len(starts)
+        # Predictions made before the gap are scored against the first missing candle only
+        if len(starts) and starts[0] == first_start:
+            self.score_predictions(stream, stream.last_kline_start, rows[0][CANDLE_COLUMNS.index("close")])
+        logging.info(f"[{stream.topic}] Gap repaired with {len(starts)} candles")
+        return last_start if len(starts) and starts[-1] == last_start else None
+
+    def predict_next_candle(self, stream, received=None):
+        # Only hands the window to the workers; nothing here blocks the socket thread
+        try:
+            # Reference for scoring, captured before the workers run
+            current_price = stream.candles.latest("close")
+            reference_start = stream.last_kline_start
+            history = stream.candles.window("close")
+            received = received if received is not None else time.perf_counter()
+
+            # GRU Prediction: queued for the next batched forward pass
+            scheduler.submit(
+                stream.topic,
+                history,
+                lambda topic, price: self.on_prediction(topic, "GRU", price, current_price, reference_start, received),
+                bounds=(stream.close_range.min, stream.close_range.max),
+                # Scored under the name of the model that made it, active or shadow
+                record_callback=lambda topic, name, price: ledger.record(
+                    topic, name, reference_start, current_price, price
+                ),
             )
-    return successful_predictions_gru, unsuccessful_predictions_gru, successful_predictions_arima, unsuccessful_predictions_arima
 
+            # ARIMA Prediction: fitted in a worker process
+            arima_pool.submit(
+                stream.topic,
+                history.copy(),
+                stream.closed_candles,
+                lambda topic, price: self.on_prediction(topic, "ARIMA", price, current_price, reference_start, received),
+            )
+        except Exception as e:
+            logging.error(f"Error in prediction: {e}")
 
-symbol = config.get("symbol", "BTCUSDT")
-interval = config.get("interval", "5")
-subscription_string = f"kline.{interval}.{symbol}"
-socket_thread = threading.Thread(
-    target=SocketConn,
-    args=("wss://stream.bybit.com/v5/public/linear", [subscription_string]),
-)
-socket_thread.start()
+    def on_prediction(self, topic, model_name, predicted_price, current_price, reference_start, received):
+        prediction_time[model_name].observe(time.perf_counter() - received)
+        stream = streams[topic]
+        setattr(stream, f"last_predicted_price_{model_name.lower()}", predicted_price)
+        logging.info("[%s] Прогнозируемая цена (%s): %s", topic, model_name, predicted_price)
+        # Scored later, when the candle after the reference closes; GRU forecasts are recorded
+        # by the scheduler under the registry name of the model that made them
+        if model_name == "ARIMA":
+            ledger.record(topic, "arima", reference_start, current_price, predicted_price)
+        self.evaluate_prediction(stream, model_name, predicted_price, current_price)
+        self.publish_prediction(stream, model_name, predicted_price, current_price, reference_start)
+
+    def publish_prediction(self, stream, model_name, predicted_price, current_price, reference_start):
+        """
+        Push the forecasts of a candle to watching front-ends once both models have answered.
+
+        Called from the GRU and ARIMA worker threads. A candle whose forecast was
+        dropped by one of the models is superseded by the next one unpublished.
+        """
+        if snapshot_server is None:
+            return
+        with self.push_lock:
+            pending = self.pending_pushes.get(stream.topic)
+            if pending is None or pending["reference_start"] != reference_start:
+                if pending is not None and pending["reference_start"] > reference_start:
+                    return  # A forecast for an older candle finishing late
+                pending = {"reference_start": reference_start, "current_price": current_price}
+                self.pending_pushes[stream.topic] = pending
+            pending[model_name.lower()] = predicted_price
+            if "gru" not in pending or "arima" not in pending:
+                return
+            del self.pending_pushes[stream.topic]
+
+        snapshot_server.publish({
+            "event": "prediction",
+            "topic": stream.topic,
+            "symbol": stream.symbol,
+            "interval": stream.interval,
+            **pending,
+        })
+
+    def score_predictions(self, stream, reference_start, close_price):
+        results = ledger.score(stream.topic, reference_start, close_price)
+        for model_name, hit in results.items():
+            logging.info("[%s] %s prediction scored: %s", stream.topic, model_name.upper(), "hit" if hit else "miss")
+
+    def evaluate_prediction(self, stream, model_name, predicted_price, current_price):
+        if not predicted_price:
+            return
+
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
+
+        difference = predicted_price - current_price
+        difference_percentage = (difference / current_price) * 100
+        prediction = "вырастет 📈" if difference > 0 else "упадет 📉"
+        logging.debug(
+            "[%s] %s - Текущая цена: %s, Прогнозируемая цена: %s",
+            stream.topic, model_name, current_price, predicted_price,
+        )
+        logging.debug(
+            "[%s] %s - Разница: %s, Разница в процентах: %.2f%%, Прогноз: Цена %s",
+            stream.topic, model_name, difference, difference_percentage, prediction,
+        )
+
+
+def get_last_predicted_price(symbol=None, interval=None):
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return None, None
+    logging.debug("[%s] Last predicted price (GRU): %s", stream.topic, stream.last_predicted_price_gru)
+    logging.debug("[%s] Last predicted price (ARIMA): %s", stream.topic, stream.last_predicted_price_arima)
+    return stream.last_predicted_price_gru, stream.last_predicted_price_arima
+
+
+def get_last_closing_price(symbol=None, interval=None):
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return None
+    return stream.candles.latest("close")
+
+
+def get_last_candle_data(symbol=None, interval=None):
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return None
+    candle_data = stream.current_candle()
+    logging.debug("[%s] Last candle data: %s", stream.topic, candle_data)
+    return candle_data  # Returns the last candle information
+
+
+def get_prediction_statistics(symbol=None, interval=None):
+    """
+    Return the rolling accuracy of every model of a stream.
+
+    Args:
+        symbol (str): The trading pair symbol.
+        interval (str): The kline interval.
+
+    Returns:
+        dict: Model name to {"1h", "24h", "7d", "all": {count, hits, hit_rate, mae}}, or None
+            if the stream is not subscribed.
+    """
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return None
+    return ledger.stats(stream.topic)
+
+
+def get_analysis(symbol=None, interval=None):
+    """
+    Return the local technical analysis of a stream.
+
+    Args:
+        symbol (str): The trading pair symbol.
+        interval (str): The kline interval.
+
+    Returns:
+        tuple: (TradingView-style summary or None while warming up, indicator values),
+            or None if the stream is not subscribed.
+    """
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return None
+    return stream.indicators.summary(), stream.indicators.values()
+
+
+def get_features(symbol=None, interval=None):
+    """
+    Return the indicator features of the candles in a stream's window.
+
+    Args:
+        symbol (str): The trading pair symbol.
+        interval (str): The kline interval.
+
+    Returns:
+        tuple: (feature names, one row per candle from oldest to newest with None for
+            indicators not ready yet), or None if the stream is not subscribed.
+    """
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return None
+    rows = stream.features.windows().T.tolist()
+    return list(stream.features.columns), [[None if math.isnan(v) else v for v in row] for row in rows]
+
+
+def liveness():
+    """
+    Report how long the event loop and the frame handler have been stuck.
+
+    The snapshot server answers from its own thread, so pings alone would not
+    notice a wedged event loop; the supervisor restarts an engine whose ages grow.
+
+    Returns:
+        dict: "loop_age", seconds since the event loop last ran the ticker, and
+            "handler_age", seconds the handler has been working on the current frame.
+    """
+    loop_age = 0.0 if loop_tick is None else time.monotonic() - loop_tick
+    handler_age = 0.0 if socket_conn is None else socket_conn.client.handler_age()
+    return {"loop_age": round(loop_age, 3), "handler_age": round(handler_age, 3)}
+
+
+def handle_request(request):
+    """
+    Answer a snapshot request from a front-end.
+
+    Args:
+        request (dict): The request with "op" and optional "symbol" and "interval".
+
+    Returns:
+        dict: The JSON-serializable response.
+    """
+    op = request.get("op")
+    if op == "ping":
+        return {"ok": True, "shard": shard, "streams": len(streams), **liveness()}
+    if op in ("models", "load_model", "promote_model", "unload_model"):
+        return handle_model_request(op, request.get("name"))
+
+    symbol = request.get("symbol")
+    interval = request.get("interval")
+    stream = get_stream(symbol, interval)
+    if stream is None:
+        return {
+            "error": "unknown_stream",
+            "symbol": (symbol or default_symbol).upper(),
+            "interval": str(interval or default_interval),
+        }
+
+    response = {"symbol": stream.symbol, "interval": stream.interval}
+    if op == "predict":
+        response["gru"], response["arima"] = get_last_predicted_price(symbol, interval)
+        response["current_price"] = get_last_closing_price(symbol, interval)
+    elif op == "current":
+        response["candle"] = get_last_candle_data(symbol, interval)
+    elif op == "stats":
+        response["models"] = get_prediction_statistics(symbol, interval)
+        # The model answering as "GRU"
+        response["active_model"] = model_registry.active_name
+    elif op == "analysis":
+        response["summary"], response["indicators"] = get_analysis(symbol, interval)
+    elif op == "features":
+        response["names"], response["rows"] = get_features(symbol, interval)
+    else:
+        return {"error": f"unknown_op: {op}"}
+    return response
+
+
+def handle_model_request(op, name=None):
+    """
+    List, load, promote or unload GRU models.
+
+    Args:
+        op (str): "models", "load_model" (start shadowing), "promote_model" or "unload_model".
+        name (str): The model name, for every op but "models".
+
+    Returns:
+        dict: The registry status after the change, or an error.
+    """
+    try:
+        if op == "load_model":
+            model_registry.load(name)
+        elif op == "promote_model":
+            model_registry.promote(name)
+        elif op == "unload_model" and not model_registry.unload(name):
+            return {"error": f"not_shadowing: {name}"}
+    except KeyError:
+        return {"error": f"unknown_model: {name}"}
+    return model_registry.status()
+
+
+def create_model_registry():
+    """
+    Create the GRU model registry from the model directory and the configured backend.
+
+    With the "numpy" backend only the weights exported by ``gru_numpy.py`` are
+    listed, so loading or promoting a model never imports TensorFlow.
+
+    Returns:
+        tuple: (ModelRegistry, name of the model to activate when no promotion was saved).
+
+    Raises:
+        FileNotFoundError: If the "numpy" backend is selected and the weights have not been exported.
+    """
+    backend = config.get("gru_backend", "keras")
+    if backend not in ("keras", "numpy"):
+        raise ValueError(f"Unknown gru_backend: {backend}")
+    default_path = config.gru_weights_path if backend == "numpy" else config.model_path
+    # No weights are shipped, they are exported from the Keras model once
+    if backend == "numpy" and not os.path.exists(default_path):
+        raise FileNotFoundError(
+            f"GRU weights {default_path} not found; export them with "
+            f"'python gru_numpy.py {config.model_path} {default_path} --check' or set gru_weights_path"
+        )
+
+    models = discover_models(config.model_dir, backend)
+    models[model_name(default_path)] = default_path
+    return ModelRegistry(
+        models,
+        window_size,
+        state_path=config.model_registry_path,
+        warmup_batch=config.get("max_batch_size", 256),
+    ), model_name(default_path)
+
+
+def start():
+    """
+    Load the GRU model, start the prediction workers and the snapshot server.
+
+    Returns:
+        SocketConn: The Bybit connection for every configured stream; await its
+            ``run`` coroutine to start streaming.
+    """
+    global socket_conn, model_registry, scheduler, arima_pool, snapshot_server, candle_store, backfiller, ledger
+
+    # Fails before the slow backfill when the configured model is missing
+    model_registry, default_model = create_model_registry()
+
+    # Each shard scores only its own streams, so it keeps its own ledger
+    ledger = PredictionLedger(shard_path(config.ledger_path, shard, shards))
+    ledger.start_maintenance(config.get("ledger_compact_every_s", 3600))
+
+    # Compaction must not drop the history that backfill keeps complete, or every
+    # restart would fetch the same candles again
+    backfill_days = config.get("backfill_days", 0)
+    retention_days = config.get("candle_retention_days", 30)
+    if retention_days is not None and retention_days < backfill_days:
+        logging.warning(
+            f"candle_retention_days ({retention_days}) is shorter than backfill_days ({backfill_days}), "
+            f"keeping candles for {backfill_days} days"
+        )
+        retention_days = backfill_days
+    candle_store = CandleStore(config.candle_store_path, retention_days=retention_days)
+    backfiller = KlineBackfiller(
+        base_url=config.get("bybit_rest_url", "https://api.bybit.com"),
+        rate_limit=config.get("backfill_rate_limit", 10),
+        max_workers=config.get("backfill_workers", 4),
+    )
+
+    # Fill the store with recent history before the windows are rehydrated from it
+    for stream in streams.values():
+        if backfill_days:
+            try:
+                fetched = stream.backfill(candle_store, backfiller, backfill_days)
+                logging.info(f"[{stream.topic}] Backfilled {fetched} candles")
+            except Exception as e:
+                logging.error(f"[{stream.topic}] Backfill failed: {e}")
+
+    # Rehydrate the windows so predictions resume on the first new candle
+    for stream in streams.values():
+        loaded = stream.warm_start(candle_store)
+        logging.info(f"[{stream.topic}] Warm start: {loaded}/{window_size} candles loaded from store")
+    # Shards share the store directory, so each one compacts only its own partitions
+    candle_store.start_maintenance(
+        config.get("candle_compact_every_s", 3600),
+        partitions=(lambda: [(stream.symbol, stream.interval) for stream in streams.values()]) if shards > 1 else None,
+    )
+
+    # Load the active GRU model now and the shadow models in the background
+    model_registry.start(default_model)
+    for name in config.get("shadow_models", []):
+        if name != model_registry.active_name and name not in model_registry.shadows:
+            model_registry.load(name)
+
+    # Batches GRU requests of streams closing on the same boundary into one forward pass
+    scheduler = InferenceScheduler(
+        model_registry,
+        batch_window=config.get("batch_window_ms", 50) / 1000,
+        max_batch_size=config.get("max_batch_size", 256),
+        max_pending=config.get("max_pending_windows", 1024),
+    )
+    scheduler.start()
+
+    # CPU-bound ARIMA fits run in worker processes
+    arima_pool = ArimaPool(
+        workers=config.get("arima_workers", max(1, min(4, (os.cpu_count() or 1) // shards))),
+        mode=arima_mode,
+        options={
+            "update_every": config.get("arima_update_every", 1),
+            "research_every": config.get("arima_research_every", 288),
+            "ljung_box_pvalue": config.get("arima_ljung_box_pvalue", 0.01),
+        },
+    )
+
+    # Front-ends read state over a local socket instead of importing this module
+    snapshot_server = SnapshotServer(
+        shard_path(config.ipc_socket_path, shard, shards), handle_request, watch_queue_size=config.get("push_queue_size", 1024)
+    )
+    snapshot_server.start()
+
+    # Subscribe to every configured stream on a single connection
+    socket_conn = SocketConn(
+        config.get("bybit_ws_url", "wss://stream.bybit.com/v5/public/linear"),
+        list(streams),
+    )
+
+    # Counters the components keep themselves are read when /metrics is scraped
+    REGISTRY.counter_func("engine_dropped_windows_total", "Pending windows replaced or evicted before a model ran",
+                          lambda: scheduler.dropped, model="gru")
+    REGISTRY.counter_func("engine_dropped_windows_total", "Pending windows replaced or evicted before a model ran",
+                          lambda: arima_pool.dropped, model="arima")
+    REGISTRY.counter_func("engine_reconnects_total", "WebSocket reconnects", lambda: socket_conn.client.reconnects)
+    REGISTRY.counter_func("engine_coalesced_ticks_total", "In-progress ticks replaced by a newer frame before being handled",
+                          lambda: socket_conn.client.coalesced)
+    REGISTRY.counter_func("engine_dropped_events_total", "Pushed events discarded because a watcher fell behind",
+                          lambda: snapshot_server.dropped_events)
+    # Shards serve metrics on consecutive ports
+    metrics_port = config.get("engine_metrics_port", 9101)
+    if metrics_port:
+        MetricsServer(REGISTRY, config.get("metrics_host", "127.0.0.1"), metrics_port + shard).start()
+
+    return socket_conn
+
+
+def shutdown():
+    """
+    Drain the prediction workers and close the stores.
+
+    Windows already queued for the GRU are still predicted and running ARIMA
+    fits finish, so their forecasts reach the ledger before the files are closed.
+    """
+    if scheduler is not None:
+        scheduler.stop()
+    if arima_pool is not None:
+        arima_pool.shutdown(wait=True)
+    if snapshot_server is not None:
+        snapshot_server.stop()
+    if ledger is not None:
+        ledger.close()
+    if candle_store is not None:
+        candle_store.close()
+    logging.info("Engine stopped")
+
+
+async def tick(every_seconds=1.0):
+    global loop_tick
+    while True:
+        loop_tick = time.monotonic()
+        await asyncio.sleep(every_seconds)
+
+
+async def main():
+    socket_conn = start()
+
+    # The supervisor stops engines with SIGTERM: stop taking candles, then drain
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, lambda: asyncio.ensure_future(socket_conn.stop()))
+    ticker = asyncio.create_task(tick())
+    try:
+        await socket_conn.run()
+    finally:
+        ticker.cancel()
+        shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())